@@ -0,0 +1,4 @@
+"""
+Benchmarks del sitio. Cada módulo se ejecuta con ``python -m benchmarks.<modulo>`` desde la
+raíz del proyecto y trabaja sobre su propia base de datos (``--db``), nunca sobre la del sitio.
+"""
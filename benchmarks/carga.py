@@ -0,0 +1,344 @@
+"""
+Prueba de carga de las vistas del catálogo.
+
+Cada escenario hace peticiones repetidas a una vista y registra peticiones por segundo,
+percentiles de latencia y consultas por petición en un JSON que sirve de línea base:
+
+    python -m benchmarks.carga --db /tmp/bench.sqlite3 --copias 2000000 --salida base.json
+    python -m benchmarks.carga --db /tmp/bench.sqlite3 --comparar base.json
+
+Sin ``--url`` las peticiones pasan por el cliente de pruebas de Django en este proceso (mide
+las vistas sin el servidor). Con ``--url`` se envían por HTTP a un servidor local que usa la
+misma base de datos, con ``--concurrencia`` hilos:
+
+    CATALOGO_METRICAS_MUESTREO=1 DATABASE_URL=sqlite:////tmp/bench.sqlite3 gunicorn -w 4 bibliotecalocal.wsgi
+    python -m benchmarks.carga --db /tmp/bench.sqlite3 --url http://127.0.0.1:8000 --concurrencia 8
+
+Las consultas por petición se leen de la cabecera ``Server-Timing`` de MetricasRendimientoMiddleware,
+así que el servidor debe arrancar con ``CATALOGO_METRICAS_MUESTREO=1``.
+"""
+import argparse
+import datetime
+import http.cookiejar
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from benchmarks import datos
+from benchmarks.entorno import preparar
+
+CLAVE = 'carga-benchmark'
+BIBLIOTECARIO = 'bibliotecario'
+MUESTRA = 500
+
+CONSULTAS = re.compile(r'(\d+) consultas')
+
+
+def _renovacion(azar):
+    return {'fecha_renovacion': datetime.date.today() + datetime.timedelta(days=azar.randint(1, 27))}
+
+
+# nombre: (usuario, función (ids, azar) -> (método, nombre de URL, argumentos, datos POST), status esperado)
+ESCENARIOS = {
+    'index': ('anonimo', lambda ids, azar: ('GET', 'index', [], None), 200),
+    'libros': ('anonimo', lambda ids, azar: ('GET', 'libros', [], None), 200),
+    'libro_detail': ('anonimo', lambda ids, azar: ('GET', 'libro_detail', [azar.choice(ids['libros'])], None), 200),
+    'autores': ('anonimo', lambda ids, azar: ('GET', 'autores', [], None), 200),
+    'autor_detail': ('anonimo', lambda ids, azar: ('GET', 'autor_detail', [azar.choice(ids['autores'])], None), 200),
+    'mis-prestamos': ('lector', lambda ids, azar: ('GET', 'mis-prestamos', [], None), 200),
+    'lista-prestamos': (BIBLIOTECARIO, lambda ids, azar: ('GET', 'lista-prestamos', [], None), 200),
+    'renovar (formulario)': (
+        BIBLIOTECARIO, lambda ids, azar: ('GET', 'renovar-libro-bibliotecario', [azar.choice(ids['prestamos'])], None), 200,
+    ),
+    'renovar (POST)': (
+        BIBLIOTECARIO,
+        lambda ids, azar: ('POST', 'renovar-libro-bibliotecario', [azar.choice(ids['prestamos'])], _renovacion(azar)),
+        302,
+    ),
+}
+
+# Muestra de ids que necesita cada escenario; sin ella el escenario se informa vacío
+REQUIERE = {
+    'libro_detail': 'libros',
+    'autor_detail': 'autores',
+    'renovar (formulario)': 'prestamos',
+    'renovar (POST)': 'prestamos',
+}
+
+
+def preparar_datos(args):
+    """
+    Puebla la base si hace falta, crea las cuentas del benchmark y devuelve muestras de ids.
+    """
+    preparar(args.db)
+
+    from django.contrib.auth.models import Permission, User
+    from django.db.models import Count
+    from catalogo.models import Autor, Libro, PeticionesLibro
+
+    datos.poblar_si_vacia(**datos.opciones_poblar(args))
+
+    bibliotecario, creado = User.objects.get_or_create(username=BIBLIOTECARIO)
+    if creado:
+        bibliotecario.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+    usuarios = {BIBLIOTECARIO: BIBLIOTECARIO}
+    # El lector es el prestatario con más préstamos, para que mis-prestamos tenga varias páginas
+    # (sin préstamos no hay lector y ese escenario queda vacío)
+    prestatario = (
+        PeticionesLibro.objects.filter(status='p', prestatario__isnull=False).values('prestatario')
+        .annotate(n=Count('id')).order_by('-n').values_list('prestatario', flat=True).first()
+    )
+    cuentas = [bibliotecario]
+    if prestatario is not None:
+        lector = User.objects.get(pk=prestatario)
+        usuarios['lector'] = lector.username
+        cuentas.append(lector)
+    for usuario in cuentas:
+        usuario.set_password(CLAVE)
+        usuario.save(update_fields=['password'])
+
+    azar = random.Random(0)
+    return {
+        'usuarios': usuarios,
+        'libros': datos.muestra_por_entero(Libro.objects.all(), MUESTRA, azar),
+        'autores': datos.muestra_por_entero(Autor.objects.all(), MUESTRA, azar),
+        'prestamos': [str(pk) for pk in datos.muestra_por_uuid(PeticionesLibro.objects.filter(status='p'), MUESTRA, azar)],
+        'filas': {
+            'libros': Libro.objects.count(), 'autores': Autor.objects.count(),
+            'copias': PeticionesLibro.objects.count(), 'usuarios': User.objects.count(),
+        },
+    }
+
+
+class SesionCliente:
+    """
+    Peticiones a través del cliente de pruebas de Django, en este proceso.
+    """
+
+    def __init__(self, username):
+        from django.contrib.auth.models import User
+        from django.test import Client
+
+        self.cliente = Client()
+        if username:
+            self.cliente.force_login(User.objects.get(username=username))
+
+    def pedir(self, metodo, ruta, datos_post):
+        if metodo == 'POST':
+            respuesta = self.cliente.post(ruta, datos_post)
+        else:
+            respuesta = self.cliente.get(ruta)
+        return respuesta.status_code, respuesta.get('Server-Timing', '')
+
+
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class SesionHTTP:
+    """
+    Peticiones HTTP a un servidor en marcha, con su propia cookie de sesión.
+    """
+
+    def __init__(self, url, username):
+        self.url = url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.abridor = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _SinRedirecciones(),
+        )
+        if username:
+            from django.urls import reverse
+
+            self.pedir('GET', reverse('login'), None)
+            status, _ = self.pedir('POST', reverse('login'), {'username': username, 'password': CLAVE})
+            if status != 302:
+                raise SystemExit('No se pudo iniciar sesión como %s en %s (status %d).' % (username, self.url, status))
+
+    def _csrf(self):
+        return next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+
+    def pedir(self, metodo, ruta, datos_post):
+        cuerpo = None
+        cabeceras = {}
+        if metodo == 'POST':
+            datos_post = dict(datos_post, csrfmiddlewaretoken=self._csrf())
+            cuerpo = urllib.parse.urlencode(datos_post).encode()
+            cabeceras['Referer'] = self.url + ruta
+        peticion = urllib.request.Request(self.url + ruta, data=cuerpo, headers=cabeceras, method=metodo)
+        try:
+            with self.abridor.open(peticion) as respuesta:
+                respuesta.read()
+                return respuesta.status, respuesta.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code, error.headers.get('Server-Timing', '')
+
+
+def _percentil(latencias, p):
+    if len(latencias) < 2:
+        return latencias[0] if latencias else None
+    return statistics.quantiles(latencias, n=100, method='inclusive')[p - 1]
+
+
+def _redondear(valor, decimales=2):
+    return None if valor is None else round(valor, decimales)
+
+
+def _vacio():
+    return {
+        'peticiones': 0, 'errores': 0, 'req_s': 0.0,
+        'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'consultas': None,
+    }
+
+
+def correr_escenario(nombre, ids, args):
+    from django.urls import reverse
+
+    usuario, generar, esperado = ESCENARIOS[nombre]
+    username = ids['usuarios'].get(usuario)
+    if (usuario != 'anonimo' and username is None) or (nombre in REQUIERE and not ids[REQUIERE[nombre]]):
+        return _vacio()
+    hilos = args.concurrencia if args.url else 1
+
+    latencias, consultas = [], []
+    errores = 0
+    lock = threading.Lock()
+
+    def trabajador(semilla, cantidad):
+        nonlocal errores
+        azar = random.Random(semilla)
+        sesion = SesionHTTP(args.url, username) if args.url else SesionCliente(username)
+        propias, propias_consultas, propios_errores = [], [], 0
+        for numero in range(args.calentamiento + cantidad):
+            metodo, url_name, argumentos, datos_post = generar(ids, azar)
+            inicio = time.perf_counter()
+            status, tiempos = sesion.pedir(metodo, reverse(url_name, args=argumentos), datos_post)
+            duracion = (time.perf_counter() - inicio) * 1000
+            if numero < args.calentamiento:
+                continue
+            propias.append(duracion)
+            propios_errores += status != esperado
+            encontrado = CONSULTAS.search(tiempos)
+            if encontrado:
+                propias_consultas.append(int(encontrado.group(1)))
+        with lock:
+            latencias.extend(propias)
+            consultas.extend(propias_consultas)
+            errores += propios_errores
+
+    por_hilo = max(1, args.peticiones // hilos)
+    if hilos == 1:
+        inicio = time.perf_counter()
+        trabajador(0, por_hilo)
+    else:
+        trabajadores = [threading.Thread(target=trabajador, args=(semilla, por_hilo)) for semilla in range(hilos)]
+        inicio = time.perf_counter()
+        for hilo in trabajadores:
+            hilo.start()
+        for hilo in trabajadores:
+            hilo.join()
+    # El calentamiento y el inicio de sesión quedan dentro del tiempo total; con pocas peticiones
+    # el rendimiento se subestima un poco.
+    transcurrido = time.perf_counter() - inicio
+    if not latencias:
+        return dict(_vacio(), errores=errores)
+
+    return {
+        'peticiones': len(latencias),
+        'errores': errores,
+        'req_s': round(len(latencias) / transcurrido, 1),
+        'p50_ms': _redondear(_percentil(latencias, 50)),
+        'p95_ms': _redondear(_percentil(latencias, 95)),
+        'p99_ms': _redondear(_percentil(latencias, 99)),
+        'consultas': max(consultas) if consultas else None,
+    }
+
+
+def comparar(base, actual, tolerancia):
+    """
+    Imprime las diferencias con la línea base y devuelve cuántos escenarios empeoraron.
+    """
+    regresiones = 0
+    for nombre, medido in actual['escenarios'].items():
+        anterior = base['escenarios'].get(nombre)
+        if anterior is None:
+            continue
+        if not medido['peticiones'] or not anterior.get('peticiones'):
+            print('vacío      %-22s sin peticiones medidas en alguna de las corridas' % nombre)
+            continue
+        problemas = []
+        if medido['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia):
+            problemas.append('p95 %.2f -> %.2f ms' % (anterior['p95_ms'], medido['p95_ms']))
+        if medido['req_s'] < anterior['req_s'] * (1 - tolerancia):
+            problemas.append('req/s %.1f -> %.1f' % (anterior['req_s'], medido['req_s']))
+        if None not in (medido['consultas'], anterior['consultas']) and medido['consultas'] > anterior['consultas']:
+            problemas.append('consultas %d -> %d' % (anterior['consultas'], medido['consultas']))
+        if problemas:
+            regresiones += 1
+            print('REGRESIÓN  %-22s %s' % (nombre, '; '.join(problemas)))
+        else:
+            print('ok         %-22s p95 %.2f -> %.2f ms' % (nombre, anterior['p95_ms'], medido['p95_ms']))
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    datos.argumentos(parser)
+    parser.add_argument('--url', help='URL base de un servidor en marcha (por omisión, cliente de pruebas en proceso).')
+    parser.add_argument('--concurrencia', type=int, default=4, help='Hilos con --url.')
+    parser.add_argument('--peticiones', type=int, default=200, help='Peticiones medidas por escenario.')
+    parser.add_argument('--calentamiento', type=int, default=5, help='Peticiones descartadas al inicio de cada hilo.')
+    parser.add_argument('--escenario', choices=ESCENARIOS, action='append', help='Escenarios a correr (por omisión todos).')
+    parser.add_argument('--salida', help='Guarda los resultados en este JSON.')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior contra el que comparar.')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='Empeoramiento relativo aceptado al comparar.')
+    args = parser.parse_args()
+
+    if not args.url:
+        # Las consultas por petición salen de la cabecera Server-Timing
+        os.environ['CATALOGO_METRICAS_MUESTREO'] = '1'
+        os.environ.setdefault('DJANGO_CACHE', 'memoria')
+    ids = preparar_datos(args)
+    if not args.url:
+        from django.test.utils import setup_test_environment
+        setup_test_environment()
+
+    resultados = {
+        'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+        'modo': args.url or 'cliente',
+        'concurrencia': args.concurrencia if args.url else 1,
+        'filas': ids['filas'],
+        'escenarios': {},
+    }
+    print('%-22s %8s %8s %9s %9s %9s %9s' % ('escenario', 'req/s', 'errores', 'p50 ms', 'p95 ms', 'p99 ms', 'consultas'))
+    for nombre in args.escenario or ESCENARIOS:
+        medido = resultados['escenarios'][nombre] = correr_escenario(nombre, ids, args)
+        if not medido['peticiones']:
+            print('%-22s %8s %8d   (vacío: faltan datos para el escenario)' % (nombre, '-', medido['errores']))
+            continue
+        print('%-22s %8.1f %8d %9.2f %9.2f %9.2f %9s' % (
+            nombre, medido['req_s'], medido['errores'], medido['p50_ms'], medido['p95_ms'], medido['p99_ms'],
+            '-' if medido['consultas'] is None else medido['consultas'],
+        ))
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, ensure_ascii=False, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+        if comparar(base, resultados, args.tolerancia):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
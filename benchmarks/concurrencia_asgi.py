@@ -0,0 +1,155 @@
+"""
+Concurrencia con muchas conexiones simultáneas: gunicorn con workers síncronos (WSGI) frente
+a workers de uvicorn (ASGI), sirviendo las vistas asíncronas de ``catalogo.api``.
+
+Arranca cada servidor con ``gunicorn.conf.py`` sobre la misma base de datos y, para cada nivel
+de ``--conexiones``, mantiene ese número de clientes abiertos durante ``--segundos``. Cada
+petición usa una conexión nueva (los workers síncronos no mantienen keep-alive).
+
+    python -m benchmarks.concurrencia_asgi --db /tmp/bench.sqlite3 --workers 2 --conexiones 10 --conexiones 200
+
+Con SQLite el ORM asíncrono sigue pasando cada consulta a un hilo; la ventaja de ASGI se nota
+sobre todo en conexiones concurrentes y esperas de red, no en el costo de cada consulta.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks import datos
+from benchmarks.entorno import preparar
+
+SERVIDORES = ('wsgi', 'asgi')
+HOST = '127.0.0.1'
+MUESTRA = 200
+
+
+def preparar_rutas(args):
+    preparar(args.db)
+
+    from django.db import connection
+    from django.urls import reverse
+    from catalogo.models import Autor, Libro
+
+    datos.poblar_si_vacia(**datos.opciones_poblar(args))
+    azar = random.Random(0)
+    libros = datos.muestra_por_entero(Libro.objects.all(), MUESTRA, azar)
+    autores = datos.muestra_por_entero(Autor.objects.all(), MUESTRA, azar)
+    connection.close()
+
+    rutas = [reverse('api-libros')]
+    # Sin libros o sin autores se piden solo las rutas que tienen ids
+    for _ in range(100):
+        if libros:
+            rutas.append(reverse('api-libro', args=[azar.choice(libros)]))
+            rutas.append(reverse('api-disponibilidad', args=[azar.choice(libros)]))
+        if autores:
+            rutas.append(reverse('api-autor', args=[azar.choice(autores)]))
+    return rutas
+
+
+def _puerto_libre():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def arrancar(servidor, workers):
+    puerto = _puerto_libre()
+    # preparar() ya dejó DATABASE_URL en el entorno que heredan los servidores
+    entorno = dict(os.environ, DJANGO_SERVIDOR=servidor, DJANGO_DEBUG='', WEB_CONCURRENCY=str(workers))
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', '%s:%d' % (HOST, puerto), '--log-level', 'warning'],
+        env=entorno, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            socket.create_connection((HOST, puerto), timeout=1).close()
+            return proceso, puerto
+        except OSError:
+            time.sleep(0.2)
+    proceso.terminate()
+    raise SystemExit('El servidor %s no arrancó en el puerto %d.' % (servidor, puerto))
+
+
+async def _pedir(puerto, ruta, timeout):
+    lector, escritor = await asyncio.wait_for(asyncio.open_connection(HOST, puerto), timeout)
+    try:
+        escritor.write(('GET %s HTTP/1.1\r\nHost: %s\r\nConnection: close\r\n\r\n' % (ruta, HOST)).encode())
+        await escritor.drain()
+        respuesta = await asyncio.wait_for(lector.read(), timeout)
+    finally:
+        escritor.close()
+    return int(respuesta.split(b' ', 2)[1]) if respuesta else 0
+
+
+async def _carga(puerto, rutas, conexiones, segundos, timeout):
+    latencias = []
+    errores = 0
+    fin = time.monotonic() + segundos
+
+    async def cliente(semilla):
+        nonlocal errores
+        azar = random.Random(semilla)
+        while time.monotonic() < fin:
+            inicio = time.perf_counter()
+            try:
+                status = await _pedir(puerto, azar.choice(rutas), timeout)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                status = 0
+            if status == 200:
+                latencias.append((time.perf_counter() - inicio) * 1000)
+            else:
+                errores += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(semilla) for semilla in range(conexiones)))
+    transcurrido = time.perf_counter() - inicio
+    return latencias, errores, transcurrido
+
+
+def medir(puerto, rutas, conexiones, segundos, timeout):
+    latencias, errores, transcurrido = asyncio.run(_carga(puerto, rutas, conexiones, segundos, timeout))
+    percentiles = statistics.quantiles(latencias, n=100) if len(latencias) > 1 else [float('nan')] * 99
+    return {
+        'req_s': len(latencias) / transcurrido,
+        'p50': percentiles[49],
+        'p99': percentiles[98],
+        'errores': errores,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    datos.argumentos(parser)
+    parser.add_argument('--servidor', choices=SERVIDORES, action='append', help='Servidores a medir (por omisión ambos).')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--conexiones', type=int, action='append', help='Niveles de conexiones simultáneas (por omisión 10, 100 y 500).')
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--timeout', type=float, default=30, help='Segundos antes de contar una petición como error.')
+    args = parser.parse_args()
+
+    rutas = preparar_rutas(args)
+    print('%-6s %11s %9s %9s %9s %8s' % ('', 'conexiones', 'req/s', 'p50 ms', 'p99 ms', 'errores'))
+    for servidor in args.servidor or SERVIDORES:
+        proceso, puerto = arrancar(servidor, args.workers)
+        try:
+            medir(puerto, rutas, 4, 1, args.timeout)  # calentamiento
+            for conexiones in args.conexiones or (10, 100, 500):
+                resultado = medir(puerto, rutas, conexiones, args.segundos, args.timeout)
+                print('%-6s %11d %9.1f %9.1f %9.1f %8d' % (
+                    servidor, conexiones, resultado['req_s'], resultado['p50'], resultado['p99'], resultado['errores'],
+                ))
+        finally:
+            proceso.terminate()
+            proceso.wait()
+
+
+if __name__ == '__main__':
+    main()
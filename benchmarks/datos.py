@@ -0,0 +1,203 @@
+"""
+Generador de datos sintéticos para los benchmarks.
+
+Inserta con ``bulk_create`` en lotes, así que no dispara señales: después de poblar se
+reconstruyen los índices y contadores derivados con ``finalizar()``.
+
+    python -m benchmarks.datos --db /tmp/bench.sqlite3 --libros 100000 --copias 1000000
+"""
+import argparse
+import datetime
+import random
+import time
+import uuid
+
+IDIOMAS = ['Español', 'Inglés', 'Francés', 'Alemán', 'Portugués', 'Italiano', 'Japonés']
+GENEROS = [
+    'Novela', 'Cuento', 'Poesía', 'Ensayo', 'Teatro', 'Ciencia Ficción', 'Fantasía', 'Policiaca',
+    'Terror', 'Histórica', 'Biografía', 'Infantil', 'Juvenil', 'Filosofía', 'Ciencia', 'Viajes',
+    'Humor', 'Romance', 'Crónica', 'Cómic',
+]
+PALABRAS = [
+    'sombra', 'río', 'ciudad', 'noche', 'anillo', 'tiempo', 'memoria', 'mar', 'camino', 'fuego',
+    'casa', 'viento', 'silencio', 'jardín', 'espejo', 'laberinto', 'guerra', 'luz', 'isla', 'reino',
+]
+NOMBRES = ['Ana', 'Luis', 'María', 'Jorge', 'Elena', 'Pablo', 'Rosa', 'Carlos', 'Julia', 'Octavio', 'Laura', 'Juan']
+APELLIDOS = ['García', 'López', 'Martínez', 'Paz', 'Rulfo', 'Borges', 'Castellanos', 'Fuentes', 'Mistral', 'Neruda', 'Vargas', 'Cortázar']
+
+# Proporción de copias por status (m, p, d, r)
+STATUS = (('m', 5), ('p', 35), ('d', 55), ('r', 5))
+
+# Tramos contiguos de cada muestra de ids
+TRAMOS = 10
+
+
+def _lotes(total, tamano):
+    inicio = 0
+    while inicio < total:
+        yield inicio, min(tamano, total - inicio)
+        inicio += tamano
+
+
+def poblar(libros=10000, autores=2000, copias=100000, usuarios=1000, lote=5000, semilla=0, salida=print):
+    """
+    Inserta el catálogo sintético y devuelve un dict con el número de filas por modelo.
+    """
+    from django.contrib.auth.models import User
+    from django.db import transaction
+    from catalogo.models import Autor, Genero, Idioma, Libro, PeticionesLibro
+
+    azar = random.Random(semilla)
+    hoy = datetime.date.today()
+    inicio = time.perf_counter()
+
+    with transaction.atomic():
+        idiomas = [Idioma.objects.create(nombre=nombre).pk for nombre in IDIOMAS]
+        generos = [Genero.objects.create(nombre=nombre).pk for nombre in GENEROS]
+
+    for desde, cantidad in _lotes(usuarios, lote):
+        User.objects.bulk_create(
+            User(username='lector%07d' % numero, password='!') for numero in range(desde, desde + cantidad)
+        )
+    ids_usuarios = list(User.objects.filter(username__startswith='lector').values_list('pk', flat=True))
+
+    for desde, cantidad in _lotes(autores, lote):
+        Autor.objects.bulk_create(
+            Autor(
+                nombre=azar.choice(NOMBRES),
+                apellido='%s %d' % (azar.choice(APELLIDOS), numero),
+                fecha_de_nacimiento=datetime.date(1850, 1, 1) + datetime.timedelta(days=azar.randrange(50000)),
+            )
+            for numero in range(desde, desde + cantidad)
+        )
+    ids_autores = list(Autor.objects.values_list('pk', flat=True))
+
+    Generos = Libro.genero.through
+    for desde, cantidad in _lotes(libros, lote):
+        with transaction.atomic():
+            Libro.objects.bulk_create(
+                Libro(
+                    titulo=' '.join(azar.choice(PALABRAS) for _ in range(azar.randint(1, 4))).capitalize(),
+                    descripcion=' '.join(azar.choice(PALABRAS) for _ in range(30)),
+                    isbn='978%010d' % numero,
+                    autor_id=azar.choice(ids_autores),
+                    idioma_id=azar.choice(idiomas),
+                )
+                for numero in range(desde, desde + cantidad)
+            )
+            nuevos = Libro.objects.order_by('-pk').values_list('pk', flat=True)[:cantidad]
+            Generos.objects.bulk_create(
+                Generos(libro_id=libro_id, genero_id=genero_id)
+                for libro_id in nuevos
+                for genero_id in azar.sample(generos, azar.randint(1, 3))
+            )
+    ids_libros = list(Libro.objects.values_list('pk', flat=True))
+
+    estados = [status for status, peso in STATUS for _ in range(peso)]
+    for desde, cantidad in _lotes(copias, lote):
+        filas = []
+        for _ in range(cantidad):
+            status = azar.choice(estados)
+            prestada = status in ('p', 'r')
+            filas.append(PeticionesLibro(
+                libro_id=azar.choice(ids_libros),
+                editorial='Editorial %d' % azar.randrange(200),
+                status=status,
+                devolucion=hoy + datetime.timedelta(days=azar.randint(-60, 30)) if prestada else None,
+                prestatario_id=azar.choice(ids_usuarios) if prestada else None,
+            ))
+        PeticionesLibro.objects.bulk_create(filas)
+        salida('  %d/%d copias (%.0f s)' % (desde + cantidad, copias, time.perf_counter() - inicio))
+
+    return {'usuarios': usuarios, 'autores': autores, 'libros': libros, 'copias': copias}
+
+
+def finalizar():
+    """
+    Reconstruye lo que mantienen las señales y que bulk_create no actualiza.
+    """
+    from django.core.management import call_command
+    from django.db import connection
+
+    call_command('reindexar_busqueda', verbosity=0)
+    call_command('recount_copies', verbosity=0)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM ANALYZE')
+
+
+def poblar_si_vacia(**opciones):
+    """
+    Puebla la base de datos solo si no tiene libros todavía; así varias corridas reutilizan los datos.
+    """
+    from catalogo.models import Libro
+
+    if Libro.objects.exists():
+        return False
+    poblar(**opciones)
+    finalizar()
+    return True
+
+
+def _muestra(queryset, cantidad, desde_al_azar):
+    # Tramos contiguos por el índice de la clave primaria desde puntos al azar, en lugar de
+    # ORDER BY RANDOM(), que ordena la tabla completa
+    pks = {}
+    for _ in range(TRAMOS):
+        tramo = queryset.filter(pk__gte=desde_al_azar()).order_by('pk').values_list('pk', flat=True)
+        pks.update(dict.fromkeys(tramo[:-(-cantidad // TRAMOS)]))
+    return list(pks)[:cantidad]
+
+
+def muestra_por_entero(queryset, cantidad, azar):
+    """
+    Hasta ``cantidad`` pks enteros de ``queryset`` elegidos con ``azar``; [] si está vacío.
+    """
+    from django.db.models import Max, Min
+
+    limites = queryset.aggregate(menor=Min('pk'), mayor=Max('pk'))
+    if limites['menor'] is None:
+        return []
+    return _muestra(queryset, cantidad, lambda: azar.randint(limites['menor'], limites['mayor']))
+
+
+def muestra_por_uuid(queryset, cantidad, azar):
+    """
+    Como ``muestra_por_entero`` para claves UUID.
+    """
+    return _muestra(queryset, cantidad, lambda: uuid.UUID(int=azar.getrandbits(128)))
+
+
+def argumentos(parser):
+    parser.add_argument('--db', default='bench.sqlite3', help='Archivo SQLite o URL de la base de datos del benchmark.')
+    parser.add_argument('--libros', type=int, default=10000)
+    parser.add_argument('--autores', type=int, default=2000)
+    parser.add_argument('--copias', type=int, default=100000)
+    parser.add_argument('--usuarios', type=int, default=1000)
+    parser.add_argument('--lote', type=int, default=5000)
+    parser.add_argument('--semilla', type=int, default=0)
+
+
+def opciones_poblar(args):
+    return {
+        'libros': args.libros, 'autores': args.autores, 'copias': args.copias,
+        'usuarios': args.usuarios, 'lote': args.lote, 'semilla': args.semilla,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Puebla una base de datos con un catálogo sintético.')
+    argumentos(parser)
+    args = parser.parse_args()
+
+    from benchmarks.entorno import preparar
+    preparar(args.db)
+    poblar(**opciones_poblar(args))
+    finalizar()
+
+
+if __name__ == '__main__':
+    main()
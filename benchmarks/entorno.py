@@ -0,0 +1,36 @@
+"""
+Preparación de Django para los benchmarks.
+"""
+import os
+import statistics
+import time
+
+
+def preparar(db, migrar=True):
+    """
+    Configura Django para usar la base de datos ``db`` (ruta a un archivo SQLite o URL de base de datos)
+    y aplica las migraciones. Debe llamarse antes de importar los modelos.
+    """
+    if '://' not in db:
+        db = 'sqlite:///%s' % os.path.abspath(db)
+    os.environ['DATABASE_URL'] = db
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bibliotecalocal.settings')
+
+    import django
+    django.setup()
+
+    if migrar:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+
+
+def medir(funcion, repeticiones=20):
+    """
+    Ejecuta ``funcion`` ``repeticiones`` veces y devuelve la mediana en milisegundos.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
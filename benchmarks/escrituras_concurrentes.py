@@ -0,0 +1,121 @@
+"""
+Renovaciones concurrentes de préstamos sobre SQLite con cada perfil de base de datos.
+
+Lanza varios procesos (como los workers de gunicorn) que renuevan préstamos a la vez con
+POST a ``renovar-libro-bibliotecario``, opcionalmente junto con procesos que leen
+``lista-prestamos``, y cuenta cuántas peticiones fallan con "database is locked".
+
+    python -m benchmarks.escrituras_concurrentes --db /tmp/concurrencia.sqlite3 --procesos 8 --lectores 8
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import random
+import time
+
+from benchmarks.entorno import preparar
+
+PERFILES = ('basico', 'optimizado')
+
+
+def _trabajador(db, perfil, segundos, semilla, resultados, lector=False):
+    os.environ['DJANGO_DB_PERFIL'] = perfil
+    preparar(db, migrar=False)
+
+    from django.contrib.auth.models import User
+    from django.db import OperationalError
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+    from catalogo.models import PeticionesLibro
+
+    setup_test_environment()
+    azar = random.Random(semilla)
+    cliente = Client()
+    cliente.force_login(User.objects.get(username='bibliotecario'))
+    copias = list(PeticionesLibro.objects.filter(status='p').values_list('pk', flat=True)[:200])
+
+    exitos = bloqueos = 0
+    fin = time.monotonic() + segundos
+    while time.monotonic() < fin:
+        fecha = datetime.date.today() + datetime.timedelta(days=azar.randint(1, 27))
+        try:
+            if lector:
+                exitos += cliente.get(reverse('lista-prestamos')).status_code == 200
+                continue
+            respuesta = cliente.post(
+                reverse('renovar-libro-bibliotecario', args=[azar.choice(copias)]), {'fecha_renovacion': fecha},
+            )
+            exitos += respuesta.status_code == 302
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            bloqueos += 1
+    resultados.put((lector, exitos, bloqueos))
+
+
+def preparar_datos(db):
+    preparar(db)
+
+    from django.contrib.auth.models import Permission, User
+    from django.db import connection
+    from benchmarks import datos
+
+    datos.poblar_si_vacia(libros=500, autores=100, copias=2000, usuarios=50, salida=lambda *a: None)
+    if not User.objects.filter(username='bibliotecario').exists():
+        usuario = User.objects.create_user(username='bibliotecario', password='bibliotecario')
+        usuario.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+    connection.close()
+
+
+def correr(db, perfil, procesos, lectores, segundos):
+    import sqlite3
+
+    # WAL persiste en el archivo: se vuelve al modo por omisión antes de cada corrida
+    conexion = sqlite3.connect(db)
+    conexion.execute('PRAGMA journal_mode = DELETE')
+    conexion.close()
+
+    contexto = multiprocessing.get_context('spawn')
+    resultados = contexto.Queue()
+    trabajadores = [
+        contexto.Process(target=_trabajador, args=(db, perfil, segundos, semilla, resultados, semilla >= procesos))
+        for semilla in range(procesos + lectores)
+    ]
+    for trabajador in trabajadores:
+        trabajador.start()
+    totales = [resultados.get() for _ in trabajadores]
+    for trabajador in trabajadores:
+        trabajador.join()
+
+    exitos = sum(exitos for lector, exitos, _ in totales if not lector)
+    lecturas = sum(exitos for lector, exitos, _ in totales if lector)
+    bloqueos = sum(bloqueos for _, _, bloqueos in totales)
+    return {
+        'perfil': perfil, 'renovaciones': exitos, 'lecturas': lecturas, 'bloqueos': bloqueos,
+        'por_segundo': exitos / segundos, 'lecturas_por_segundo': lecturas / segundos,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='bench_concurrencia.sqlite3', help='Archivo SQLite del benchmark.')
+    parser.add_argument('--procesos', type=int, default=8, help='Procesos que renuevan préstamos.')
+    parser.add_argument('--lectores', type=int, default=0, help='Procesos que solo leen la lista de préstamos.')
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--perfil', choices=PERFILES, action='append', help='Perfiles a medir (por omisión ambos).')
+    args = parser.parse_args()
+
+    db = os.path.abspath(args.db)
+    preparar_datos(db)
+    for perfil in args.perfil or PERFILES:
+        resultado = correr(db, perfil, args.procesos, args.lectores, args.segundos)
+        print(
+            '%(perfil)-11s %(renovaciones)7d renovaciones (%(por_segundo)6.1f/s)  %(lecturas)7d lecturas '
+            '(%(lecturas_por_segundo)6.1f/s)  %(bloqueos)5d "database is locked"' % resultado
+        )
+
+
+if __name__ == '__main__':
+    main()
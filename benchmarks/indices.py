@@ -0,0 +1,137 @@
+"""
+Planes de consulta y tiempos de las consultas de préstamos con y sin los índices de la migración 0008.
+
+    python -m benchmarks.indices --db /tmp/bench.sqlite3 --copias 1000000
+
+La base se puebla la primera vez. Las mediciones "antes" se hacen quitando temporalmente
+los índices declarados en los modelos; al terminar se restauran.
+"""
+import argparse
+import copy
+import datetime
+import json
+
+from benchmarks import datos
+from benchmarks.entorno import preparar, medir
+
+
+def consultas():
+    from catalogo.models import Autor, Libro, PeticionesLibro
+
+    prestatario = PeticionesLibro.objects.filter(status='p').values_list('prestatario_id', flat=True).first()
+    isbn = Libro.objects.order_by('-pk').values_list('isbn', flat=True).first()
+    hoy = datetime.date.today()
+    return {
+        'lista-prestamos (primera página)':
+            PeticionesLibro.objects.filter(status='p').order_by('devolucion', 'id')[:10],
+        'lista-prestamos (página profunda, cursor)':
+            PeticionesLibro.objects.filter(status='p', devolucion__gt=hoy + datetime.timedelta(days=20)).order_by('devolucion', 'id')[:10],
+        'mis-prestamos':
+            PeticionesLibro.objects.filter(prestatario_id=prestatario, status='p').order_by('devolucion', 'id')[:10],
+        'copias disponibles (conteo)':
+            PeticionesLibro.objects.filter(status='d'),
+        'préstamos vencidos (conteo)':
+            PeticionesLibro.objects.filter(status='p', devolucion__lt=hoy),
+        'autores ordenados':
+            Autor.objects.order_by('apellido', 'nombre', 'id')[:10],
+        'libro por ISBN':
+            Libro.objects.filter(isbn=isbn)[:1],
+    }
+
+
+def ejecutar(queryset):
+    if queryset.query.is_sliced:
+        return list(queryset)
+    return queryset.count()
+
+
+def plan(queryset):
+    if not queryset.query.is_sliced:
+        # El plan de un conteo es el de la consulta sin columnas
+        queryset = queryset.order_by().values('pk')
+    return queryset.explain()
+
+
+def medir_todo(repeticiones):
+    resultados = {}
+    for nombre, queryset in consultas().items():
+        resultados[nombre] = {
+            'ms': round(medir(lambda: ejecutar(queryset._chain()), repeticiones), 3),
+            'plan': plan(queryset._chain()),
+        }
+    return resultados
+
+
+def _campo_isbn_sin_indice():
+    from catalogo.models import Libro
+
+    campo = Libro._meta.get_field('isbn')
+    sin_indice = copy.copy(campo)
+    sin_indice.db_index = False
+    return campo, sin_indice
+
+
+def quitar_indices():
+    from django.db import connection
+    from catalogo.models import Autor, Libro, PeticionesLibro
+
+    with connection.schema_editor() as editor:
+        for modelo in (Autor, PeticionesLibro):
+            for indice in modelo._meta.indexes:
+                editor.remove_index(modelo, indice)
+        editor.alter_field(Libro, *_campo_isbn_sin_indice())
+
+
+def restaurar_indices():
+    from django.db import connection
+    from catalogo.models import Autor, Libro, PeticionesLibro
+
+    with connection.schema_editor() as editor:
+        for modelo in (Autor, PeticionesLibro):
+            for indice in modelo._meta.indexes:
+                editor.add_index(modelo, indice)
+        campo, sin_indice = _campo_isbn_sin_indice()
+        editor.alter_field(Libro, sin_indice, campo)
+
+
+def analizar():
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    datos.argumentos(parser)
+    parser.set_defaults(copias=1000000, libros=100000, autores=20000, usuarios=20000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--json', help='Guarda los resultados en este archivo.')
+    args = parser.parse_args()
+
+    preparar(args.db)
+    if datos.poblar_si_vacia(**datos.opciones_poblar(args)):
+        print('Base de datos poblada.')
+
+    despues = medir_todo(args.repeticiones)
+    quitar_indices()
+    try:
+        analizar()
+        antes = medir_todo(args.repeticiones)
+    finally:
+        restaurar_indices()
+        analizar()
+
+    for nombre in despues:
+        print('\n== %s ==' % nombre)
+        print('  sin índices: %9.3f ms   con índices: %9.3f ms' % (antes[nombre]['ms'], despues[nombre]['ms']))
+        print('  plan sin índices:\n    %s' % antes[nombre]['plan'].replace('\n', '\n    '))
+        print('  plan con índices:\n    %s' % despues[nombre]['plan'].replace('\n', '\n    '))
+
+    if args.json:
+        with open(args.json, 'w') as archivo:
+            json.dump({'antes': antes, 'despues': despues}, archivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Escrituras de sesión de la página de inicio con cada motor de sesiones y lote de visitas.
+
+Simula ``--visitantes`` visitantes que abren la página de inicio ``--visitas`` veces cada uno
+y cuenta los INSERT/UPDATE de ``django_session`` y el tiempo por petición, con el contador de
+visitas guardado en cada visita (lote 1, el comportamiento anterior) y por lotes
+(``CATALOGO_VISITAS_LOTE``, ver catalogo.visitas):
+
+    DJANGO_CACHE=redis python -m benchmarks.sesiones --db /tmp/sesiones.sqlite3 --visitantes 50 --visitas 20
+
+Los lotes solo se aplican con una caché de incr atómico (``DJANGO_CACHE=redis`` o ``memoria``);
+con la caché en archivos ambas filas de cada motor escriben la sesión en cada visita.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks.entorno import preparar
+
+MOTORES = ('db', 'cached_db', 'cache', 'signed_cookies')
+
+
+def correr(motor, lote, visitantes, visitas):
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.urls import reverse
+
+    escrituras = []
+
+    def contar(execute, sql, params, many, context):
+        if sql.startswith(('INSERT', 'UPDATE')) and 'django_session' in sql:
+            escrituras.append(sql)
+        return execute(sql, params, many, context)
+
+    tiempos = []
+    with override_settings(SESSION_ENGINE='django.contrib.sessions.backends.%s' % motor, CATALOGO_VISITAS_LOTE=lote):
+        # Cada cliente es un visitante nuevo: su sesión no tiene contadores pendientes anteriores
+        clientes = [Client() for _ in range(visitantes)]
+        url = reverse('index')
+        with connection.execute_wrapper(contar):
+            for _ in range(visitas):
+                for cliente in clientes:
+                    inicio = time.perf_counter()
+                    cliente.get(url)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+    total = visitantes * visitas
+    return {
+        'motor': motor, 'lote': lote, 'escrituras': len(escrituras), 'por_visita': len(escrituras) / total,
+        'mediana_ms': statistics.median(tiempos),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='bench_sesiones.sqlite3', help='Archivo SQLite del benchmark.')
+    parser.add_argument('--visitantes', type=int, default=50)
+    parser.add_argument('--visitas', type=int, default=20, help='Visitas de cada visitante.')
+    parser.add_argument('--lote', type=int, default=10, help='Visitas por escritura de la sesión.')
+    parser.add_argument('--motor', choices=MOTORES, action='append', help='Motores a medir (por omisión todos).')
+    args = parser.parse_args()
+
+    preparar(os.path.abspath(args.db))
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+
+    for motor in args.motor or MOTORES:
+        for lote in (1, args.lote):
+            resultado = correr(motor, lote, args.visitantes, args.visitas)
+            print(
+                '%(motor)-15s lote %(lote)3d  %(escrituras)6d escrituras en django_session '
+                '(%(por_visita)5.2f por visita)  %(mediana_ms)6.2f ms por petición' % resultado
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'catalogo.middleware.MetricasRendimientoMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,6 +90,41 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+# Compartida por todos los workers de gunicorn ($DJANGO_CACHE):
+#   'archivos' (predeterminado): un archivo por clave en $DJANGO_CACHE_DIR. Al pasar de
+#       $DJANGO_CACHE_MAX_ENTRADAS claves, cada escritura recorre el directorio y borra
+#       1/$DJANGO_CACHE_CULL de ellas: el límite debe quedar holgado para los fragmentos,
+#       versiones y estadísticas de todo el catálogo.
+#   'redis': Redis en $DJANGO_REDIS_URL (requiere el paquete redis). Recomendado en producción:
+#       incr atómico (ver catalogo.visitas) y expulsión LRU del propio servidor.
+#   'memoria': en la memoria de cada proceso, solo para desarrollo con un proceso.
+# Las pruebas usan bibliotecalocal.settings_pruebas, con la caché en memoria.
+CACHE_TIPO = os.environ.get('DJANGO_CACHE', 'archivos')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('DJANGO_CACHE_MAX_ENTRADAS', 100000)),
+            'CULL_FREQUENCY': int(os.environ.get('DJANGO_CACHE_CULL', 3)),
+        },
+    }
+}
+if CACHE_TIPO == 'redis':
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('DJANGO_REDIS_URL', 'redis://127.0.0.1:6379/0'),
+    }
+elif CACHE_TIPO == 'memoria':
+    CACHES['default'] = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+
+# Segundos que un fragmento de plantilla permanece en caché; se invalida antes si cambia su versión
+CATALOGO_FRAGMENTOS_TTL = 60 * 60 * 24
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -135,11 +171,64 @@ LOGIN_REDIRECT_URL = '/'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Segundos que los contadores de la página de inicio permanecen en caché antes de un recálculo completo
+CATALOGO_ESTADISTICAS_TTL = int(os.environ.get('CATALOGO_ESTADISTICAS_TTL', 600))
+
+# Fracción de peticiones medidas por MetricasRendimientoMiddleware (0 la desactiva, 1 mide todas)
+CATALOGO_METRICAS_MUESTREO = float(os.environ.get('CATALOGO_METRICAS_MUESTREO', 0))
+
+# Almacenamiento de las sesiones ($DJANGO_SESSION_ENGINE):
+#   'db' (predeterminado): tabla django_session.
+#   'cached_db': lee de la caché y solo va a la base de datos si no la encuentra; escribe en ambas.
+#   'cache': solo en la caché (se pierden si la caché se vacía).
+#   'signed_cookies': en la cookie firmada, sin escrituras en el servidor (el visitante puede leer sus datos).
+SESSION_ENGINE = 'django.contrib.sessions.backends.%s' % os.environ.get('DJANGO_SESSION_ENGINE', 'db')
+
+# catalogo.visitas pasa el contador de visitas a la sesión cada N visitas (1: en cada una)
+# o cuando pasaron estos segundos desde la última vez. Las visitas pendientes se cuentan en la
+# caché $CATALOGO_VISITAS_CACHE y solo si su incr es atómico (DJANGO_CACHE=redis, Memcached o
+# memoria); con la caché en archivos la sesión se escribe en cada visita.
+CATALOGO_VISITAS_CACHE = os.environ.get('CATALOGO_VISITAS_CACHE', 'default')
+CATALOGO_VISITAS_LOTE = int(os.environ.get('CATALOGO_VISITAS_LOTE', 10))
+CATALOGO_VISITAS_INTERVALO = int(os.environ.get('CATALOGO_VISITAS_INTERVALO', 300))
+
+# Directorio donde catalogo.reportes guarda los gráficos generados (se regeneran con actualizar_resumenes)
+CATALOGO_REPORTES_DIR = os.environ.get('CATALOGO_REPORTES_DIR', os.path.join(BASE_DIR, 'reportes'))
+
 # Heroku: Update database configuration from $DATABASE_URL.
 import dj_database_url
-db_from_env = dj_database_url.config(conn_max_age=500)
+
+# Perfil de rendimiento de la base de datos ($DJANGO_DB_PERFIL):
+#   'optimizado' (predeterminado): conexiones persistentes con verificación de salud y,
+#       en SQLite, modo WAL con busy_timeout para que los workers no fallen con "database is locked".
+#   'basico': la configuración por omisión de Django.
+# $DJANGO_DB_POOL=pgbouncer usa $DATABASE_CONNECTION_POOL_URL (o $DATABASE_URL) a través de
+# PgBouncer en modo transacción, que no admite cursores del lado del servidor.
+DB_PERFIL = os.environ.get('DJANGO_DB_PERFIL', 'optimizado')
+DB_POOL = os.environ.get('DJANGO_DB_POOL', '')
+
+CONN_MAX_AGE = int(os.environ.get('DJANGO_CONN_MAX_AGE', 500))
+db_url_env = 'DATABASE_CONNECTION_POOL_URL' if DB_POOL == 'pgbouncer' and 'DATABASE_CONNECTION_POOL_URL' in os.environ else 'DATABASE_URL'
+db_from_env = dj_database_url.config(env=db_url_env, conn_max_age=CONN_MAX_AGE)
 DATABASES['default'].update(db_from_env)
 
+if DB_PERFIL == 'optimizado':
+    DATABASES['default']['CONN_MAX_AGE'] = CONN_MAX_AGE
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+if DB_POOL == 'pgbouncer':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# PRAGMAs que se aplican a cada conexión SQLite nueva (ver catalogo.signals)
+CATALOGO_SQLITE_PRAGMAS = {}
+if DB_PERFIL == 'optimizado':
+    CATALOGO_SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('DJANGO_SQLITE_BUSY_TIMEOUT', 20000)),
+        'temp_store': 'MEMORY',
+    }
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/1.10/howto/static-files/
 
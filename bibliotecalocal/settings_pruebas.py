@@ -0,0 +1,10 @@
+"""
+Configuración para las pruebas: la de ``settings`` con la caché en la memoria del proceso, para
+que cada ejecución empiece vacía y no comparta estado con el directorio de caché del proyecto.
+
+``manage.py test`` la usa por omisión; con otro ejecutor (pytest) se elige con
+``DJANGO_SETTINGS_MODULE=bibliotecalocal.settings_pruebas``.
+"""
+from .settings import *  # noqa: F401,F403
+
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
@@ -1,33 +1,181 @@
-from django.contrib import admin
-from .models import Autor, Genero, Libro, PeticionesLibro, Idioma
+import datetime
+
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.db.models import Aggregate, CharField, OuterRef, Subquery
+from django.forms.models import BaseInlineFormSet
+from django.template.response import TemplateResponse
+
+from . import autocompletar, prestamos
+from .forms import RenovarLibroForm
+from .models import Autor, Genero, Libro, PeticionesLibro, Idioma, Reserva
+from .paginacion import PaginadorConteoEstimado
 
 # admin.site.register(Libro)
 # admin.site.register(Autor)
-admin.site.register(Genero)
+# admin.site.register(Genero)
 # admin.site.register(PeticionesLibro)
-admin.site.register(Idioma)
+# admin.site.register(Idioma)
+
+# Más coincidencias que estas se buscan en la base de datos: un IN tan largo no conviene
+MAX_IDS_AUTOCOMPLETADO = 1000
+
+
+class BusquedaPorPrefijoMixin:
+    """
+    Busca en el índice de prefijos en memoria (catalogo.autocompletar) del tipo ``autocompletar``,
+    tanto en la lista como en los selectores de autocomplete_fields. Cada palabra del texto buscado
+    debe ser prefijo de alguna palabra del objeto, en cualquier orden ("jorge bor" encuentra a
+    Jorge Luis Borges). Si el tipo no tiene índice, no hay coincidencias o hay demasiadas, se usa
+    la búsqueda de ``search_fields``.
+    """
+    autocompletar = None
+
+    def buscar_en_indice(self, termino):
+        return True
+
+    def get_search_results(self, request, queryset, search_term):
+        if search_term.strip() and self.buscar_en_indice(search_term):
+            ids = autocompletar.buscar_ids_por_palabras(self.autocompletar, search_term)
+            if ids and len(ids) <= MAX_IDS_AUTOCOMPLETADO:
+                return queryset.filter(pk__in=ids), False
+        return super().get_search_results(request, queryset, search_term)
+
+
+@admin.register(Genero)
+class GeneroAdmin(BusquedaPorPrefijoMixin, admin.ModelAdmin):
+    search_fields = ('^nombre',)
+    autocompletar = 'genero'
+
+
+@admin.register(Idioma)
+class IdiomaAdmin(BusquedaPorPrefijoMixin, admin.ModelAdmin):
+    search_fields = ('^nombre',)
+    autocompletar = 'idioma'
+
+
+class ConcatenarTexto(Aggregate):
+    """
+    Concatena textos separados por coma: GROUP_CONCAT en SQLite y STRING_AGG en PostgreSQL.
+    """
+    function = 'GROUP_CONCAT'
+    template = "%(function)s(%(expressions)s, ', ')"
+    output_field = CharField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='STRING_AGG', **extra_context)
+
+
+class FormsetInlinePaginado(BaseInlineFormSet):
+    """
+    Formset de un inline que muestra una página de los objetos relacionados en lugar de todos.
+    InlinePaginado.get_formset fija ``pagina``, ``por_pagina``, ``parametro`` y ``consulta``.
+    """
+    pagina = 1
+    por_pagina = 20
+    parametro = 'pagina'
+    consulta = None
 
-class LibroInline(admin.TabularInline):
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            queryset = super().get_queryset()
+            self.total = queryset.count()
+            self.paginas = max(1, -(-self.total // self.por_pagina))
+            self.pagina = min(max(1, self.pagina), self.paginas)
+            inicio = (self.pagina - 1) * self.por_pagina
+            self._queryset = queryset[inicio:inicio + self.por_pagina]
+        return self._queryset
+
+    def _url_pagina(self, numero):
+        consulta = self.consulta.copy()
+        consulta[self.parametro] = numero
+        return '?' + consulta.urlencode()
+
+    @property
+    def url_anterior(self):
+        return self._url_pagina(self.pagina - 1) if self.pagina > 1 else None
+
+    @property
+    def url_siguiente(self):
+        return self._url_pagina(self.pagina + 1) if self.pagina < self.paginas else None
+
+
+class InlinePaginado(admin.TabularInline):
+    """
+    Inline tabular paginado: con miles de objetos relacionados, la página de edición carga
+    ``por_pagina`` por vez. El número de página va en la URL (``?pagina_<modelo>=``), que el
+    formulario conserva al guardar.
+    """
+    formset = FormsetInlinePaginado
+    template = 'admin/catalogo/inline_paginado.html'
+    por_pagina = 20
+    show_change_link = True
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.parametro = 'pagina_%s' % self.model._meta.model_name
+        try:
+            formset.pagina = int(request.GET.get(formset.parametro, 1))
+        except ValueError:
+            formset.pagina = 1
+        formset.por_pagina = self.por_pagina
+        formset.consulta = request.GET
+        return formset
+
+
+class LibroInline(InlinePaginado):
     model = Libro
+    # Sin los selectores de géneros e idioma, que consultarían todas sus filas en cada fila del inline
+    fields = ('titulo', 'isbn', 'descripcion')
+    ordering = ('titulo', 'id')
 
 # Define la clase admin
-class AutorAdmin(admin.ModelAdmin):
+class AutorAdmin(BusquedaPorPrefijoMixin, admin.ModelAdmin):
     list_display = ('apellido', 'nombre', 'fecha_de_nacimiento', 'fecha_de_deceso')
     fields = ['nombre', 'apellido', ('fecha_de_nacimiento', 'fecha_de_deceso')]
     inlines = [LibroInline]
+    search_fields = ('^apellido', '^nombre')
+    autocompletar = 'autor'
+    paginator = PaginadorConteoEstimado
+    show_full_result_count = False
 
 # Registra la clase admin con el modelo asociado
 admin.site.register(Autor, AutorAdmin)
 
 # Registra las clases admin para Libro usando @
 
-class PeticionesLibroInline(admin.TabularInline):
+class PeticionesLibroInline(InlinePaginado):
     model = PeticionesLibro
+    raw_id_fields = ('prestatario',)
+    ordering = ('devolucion', 'id')
 
 @admin.register(Libro)
-class LibroAdmin(admin.ModelAdmin):
-    list_display = ('titulo', 'autor', 'mostrar_genero')
+class LibroAdmin(BusquedaPorPrefijoMixin, admin.ModelAdmin):
+    list_display = ('titulo', 'autor', 'generos', 'copias_disponibles', 'copias_total')
+    list_select_related = ('autor',)
+    search_fields = ('^titulo', '=isbn')
+    autocomplete_fields = ('autor', 'genero', 'idioma')
+    autocompletar = 'libro'
     inlines = [PeticionesLibroInline]
+    paginator = PaginadorConteoEstimado
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Los géneros de cada libro en una subconsulta de la misma consulta de la lista
+        # (count() descarta la anotación, que no se usa en filtros)
+        generos = (
+            Libro.genero.through.objects.filter(libro_id=OuterRef('pk')).order_by()
+            .values('libro_id').annotate(nombres=ConcatenarTexto('genero__nombre')).values('nombres')
+        )
+        return super().get_queryset(request).annotate(nombres_generos=Subquery(generos))
+
+    @admin.display(description='Genero')
+    def generos(self, libro):
+        return libro.nombres_generos or ''
+
+    def buscar_en_indice(self, termino):
+        # Un ISBN se busca por igualdad en la base de datos
+        return not termino.replace('-', '').strip().isdigit()
 
 # Registra las clases admin para PeticionesLibro usando @
 
@@ -35,6 +183,15 @@ class LibroAdmin(admin.ModelAdmin):
 class PeticionesLibroAdmin(admin.ModelAdmin):
     list_display = ('libro', 'status', 'prestatario', 'devolucion', 'id')
     list_filter = ('status', 'devolucion')
+    list_select_related = ('libro', 'prestatario')
+    autocomplete_fields = ('libro',)
+    raw_id_fields = ('prestatario',)
+    # Con el filtro de prestadas, el orden sigue el índice parcial prestamo_devolucion
+    ordering = ('devolucion', 'id')
+    paginator = PaginadorConteoEstimado
+    show_full_result_count = False
+    # Cada acción es un solo UPDATE sobre todas las copias elegidas (catalogo.prestamos)
+    actions = ['renovar_prestamos', 'marcar_devueltas', 'enviar_a_mantenimiento']
 
     fieldsets = (
         (None, {
@@ -43,4 +200,48 @@ class PeticionesLibroAdmin(admin.ModelAdmin):
         ('Disponibilidad', {
             'fields': ('status', 'devolucion', 'prestatario')
         }),
-    )
\ No newline at end of file
+    )
+
+    def has_can_mark_returned_permission(self, request):
+        return request.user.has_perm('catalogo.can_mark_returned')
+
+    @admin.action(description='Renovar los préstamos seleccionados', permissions=['can_mark_returned'])
+    def renovar_prestamos(self, request, queryset):
+        # Página intermedia con la fecha; al enviarla vuelve a esta acción con 'post'
+        if request.POST.get('post'):
+            form = RenovarLibroForm(request.POST)
+            if form.is_valid():
+                renovadas = prestamos.renovar_en_lote(queryset, form.cleaned_data['fecha_renovacion'])
+                self.message_user(request, '%d préstamos renovados.' % renovadas, messages.SUCCESS)
+                return None
+        else:
+            form = RenovarLibroForm(initial={'fecha_renovacion': datetime.date.today() + prestamos.PLAZO_PRESTAMO})
+        return TemplateResponse(request, 'admin/catalogo/peticioneslibro/renovar_prestamos.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Renovar préstamos',
+            'opts': self.model._meta,
+            'form': form,
+            'total': queryset.count(),
+            'seleccionadas': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'casilla_accion': helpers.ACTION_CHECKBOX_NAME,
+        })
+
+    @admin.action(description='Marcar como devueltas', permissions=['can_mark_returned'])
+    def marcar_devueltas(self, request, queryset):
+        devueltas = prestamos.devolver_en_lote(queryset)
+        self.message_user(request, '%d copias marcadas como devueltas.' % devueltas, messages.SUCCESS)
+
+    @admin.action(description='Enviar a mantenimiento', permissions=['can_mark_returned'])
+    def enviar_a_mantenimiento(self, request, queryset):
+        cambiadas = prestamos.enviar_a_mantenimiento(queryset)
+        self.message_user(request, '%d copias enviadas a mantenimiento (las prestadas o reservadas no cambian).' % cambiadas, messages.SUCCESS)
+
+@admin.register(Reserva)
+class ReservaAdmin(admin.ModelAdmin):
+    list_display = ('libro', 'usuario', 'estado', 'creada', 'asignada', 'notificada')
+    list_filter = ('estado',)
+    list_select_related = ('libro', 'usuario')
+    raw_id_fields = ('libro', 'usuario', 'copia')
+    paginator = PaginadorConteoEstimado
+    show_full_result_count = False
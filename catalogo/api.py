@@ -0,0 +1,149 @@
+"""
+Vistas asíncronas de lectura del catálogo, en JSON, bajo ``/catalogo/api/``.
+
+Usan los métodos asíncronos del ORM (``aget``, ``aaggregate``, ``async for``), de modo que con
+un servidor ASGI (``DJANGO_SERVIDOR=asgi``, ver ``gunicorn.conf.py``) cada worker atiende
+muchas conexiones a la vez sin reservar un hilo por petición. Con WSGI siguen funcionando:
+Django las ejecuta en un bucle de eventos propio por petición.
+
+La búsqueda consulta el índice con SQL propio de cada backend (FTS5, tsvector), que no tiene
+versión asíncrona, así que se ejecuta con ``sync_to_async``; igual el autocompletado, que puede
+reconstruir su índice en memoria (``catalogo.autocompletar``).
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
+
+from . import autocompletar as indice_autocompletar
+from .busqueda import buscar_libros
+from .disponibilidad import agregados
+from .models import Autor, Libro, PeticionesLibro
+from .paginacion import PaginadorCursor
+
+TAMANO_PAGINA = 20
+MAX_AUTOCOMPLETADO = 50
+
+
+def _autor_json(autor):
+    if autor is None:
+        return None
+    return {'id': autor.pk, 'nombre': autor.nombre, 'apellido': autor.apellido, 'url': autor.get_absolute_url()}
+
+
+def _libro_json(libro):
+    return {
+        'id': libro.pk,
+        'titulo': libro.titulo,
+        'isbn': libro.isbn,
+        'autor': _autor_json(libro.autor),
+        'url': libro.get_absolute_url(),
+    }
+
+
+def _pagina_json(pagina, serializar):
+    return {
+        'resultados': [serializar(objeto) for objeto in pagina],
+        'anterior': pagina.cursor_anterior,
+        'siguiente': pagina.cursor_siguiente,
+    }
+
+
+async def _obtener(queryset, pk):
+    try:
+        return await queryset.aget(pk=pk)
+    except queryset.model.DoesNotExist:
+        raise Http404('No existe %s con id %s.' % (queryset.model._meta.verbose_name, pk))
+
+
+async def disponibilidad_libro(libro_id):
+    """
+    Copias de un libro por status y la próxima fecha de devolución, en una consulta agregada.
+    """
+    copias = PeticionesLibro.objects.filter(libro_id=libro_id).order_by()
+    resultado = await copias.aaggregate(**agregados())
+    if resultado['proxima_devolucion']:
+        resultado['proxima_devolucion'] = resultado['proxima_devolucion'].isoformat()
+    return resultado
+
+
+async def libros(request):
+    paginador = PaginadorCursor(Libro.objects.select_related('autor'), TAMANO_PAGINA, ('pk',))
+    pagina = await paginador.apage(request.GET.get('cursor'))
+    return JsonResponse(_pagina_json(pagina, _libro_json))
+
+
+async def libro(request, pk):
+    libro = await _obtener(Libro.objects.select_related('autor', 'idioma'), pk)
+    datos = _libro_json(libro)
+    datos.update(
+        descripcion=libro.descripcion,
+        idioma=libro.idioma.nombre if libro.idioma else None,
+        generos=[genero.nombre async for genero in libro.genero.order_by('nombre')],
+        disponibilidad=await disponibilidad_libro(libro.pk),
+    )
+    return JsonResponse(datos)
+
+
+async def disponibilidad(request, pk):
+    if not await Libro.objects.filter(pk=pk).aexists():
+        raise Http404('No existe el libro %s.' % pk)
+    return JsonResponse(dict(await disponibilidad_libro(pk), libro=pk))
+
+
+async def autores(request):
+    paginador = PaginadorCursor(Autor.objects.all(), TAMANO_PAGINA, ('apellido', 'nombre', 'pk'))
+    pagina = await paginador.apage(request.GET.get('cursor'))
+    return JsonResponse(_pagina_json(pagina, _autor_json))
+
+
+async def autor(request, pk):
+    autor = await _obtener(Autor.objects.all(), pk)
+    datos = _autor_json(autor)
+    libros = autor.libro_set.order_by('titulo')
+    datos.update(
+        fecha_de_nacimiento=autor.fecha_de_nacimiento.isoformat() if autor.fecha_de_nacimiento else None,
+        fecha_de_deceso=autor.fecha_de_deceso.isoformat() if autor.fecha_de_deceso else None,
+        libros=[
+            {
+                'id': libro.pk, 'titulo': libro.titulo, 'num_copias': libro.copias_total,
+                'disponibles': libro.copias_disponibles, 'url': libro.get_absolute_url(),
+            }
+            async for libro in libros
+        ],
+    )
+    return JsonResponse(datos)
+
+
+async def buscar(request):
+    consulta = request.GET.get('q', '').strip()
+    try:
+        numero = max(1, int(request.GET.get('pagina', 1)))
+    except ValueError:
+        numero = 1
+    inicio = (numero - 1) * TAMANO_PAGINA
+
+    def resultados():
+        encontrados = buscar_libros(consulta)
+        return encontrados.count(), encontrados[inicio:inicio + TAMANO_PAGINA]
+
+    total, pagina = await sync_to_async(resultados)() if consulta else (0, [])
+    return JsonResponse({
+        'q': consulta,
+        'total': total,
+        'pagina': numero,
+        'resultados': [_libro_json(libro) for libro in pagina],
+    })
+
+
+async def autocompletar(request, tipo):
+    if tipo not in indice_autocompletar.TIPOS:
+        raise Http404('No se autocompleta %s.' % tipo)
+    consulta = request.GET.get('q', '')
+    try:
+        limite = min(MAX_AUTOCOMPLETADO, max(1, int(request.GET.get('limite', indice_autocompletar.LIMITE))))
+    except ValueError:
+        limite = indice_autocompletar.LIMITE
+    encontrados = await sync_to_async(indice_autocompletar.buscar)(tipo, consulta, limite)
+    return JsonResponse({
+        'q': consulta,
+        'resultados': [{'id': pk, 'texto': texto} for pk, texto in encontrados],
+    })
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CatalogoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalogo'
+
+    def ready(self):
+        # Conecta los receptores de señales del catálogo
+        from . import signals
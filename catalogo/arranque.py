@@ -0,0 +1,105 @@
+"""
+Perfil del tiempo de importación durante ``django.setup()``.
+
+Cada worker de gunicorn (y cada ``manage.py``) paga al arrancar la importación de todos los
+módulos que cargan settings, apps, modelos y admin. ``python -X importtime`` la mide, pero solo
+registra las sentencias ``import``: Django carga esos módulos con ``importlib.import_module``,
+que no pasa por el registro. Por eso el proceso medido reemplaza ``import_module`` por una
+versión basada en ``__import__`` antes de importar Django.
+"""
+import os
+import subprocess
+import sys
+from collections import namedtuple
+
+from django.conf import settings
+
+CODIGO_ARRANQUE = '''
+import importlib
+import importlib.util
+import sys
+
+def import_module(name, package=None):
+    if name.startswith('.'):
+        name = importlib.util.resolve_name(name, package)
+    __import__(name)
+    return sys.modules[name]
+
+importlib.import_module = import_module
+
+import django
+django.setup()
+'''
+
+# Paquetes que no deben cargarse al arrancar: se importan dentro de las funciones que los usan
+# (los gráficos de catalogo.reportes, por ejemplo)
+MODULOS_PESADOS = ('matplotlib', 'numpy', 'PIL', 'turtle', 'tkinter')
+
+# Milisegundos que puede sumar la importación de catalogo al arranque
+PRESUPUESTO_CATALOGO_MS = 250
+# Fracción máxima del tiempo de importación al arrancar que puede ser de catalogo (no depende
+# de la velocidad de la máquina, como el presupuesto en milisegundos)
+PRESUPUESTO_CATALOGO_FRACCION = 0.5
+
+Importacion = namedtuple('Importacion', 'modulo propio_us acumulado_us profundidad')
+
+
+def perfil_importacion(settings_module=None):
+    """
+    Ejecuta ``django.setup()`` en un proceso nuevo con ``-X importtime`` y devuelve una
+    Importacion por módulo, en el orden en que el intérprete las informa (los módulos
+    anidados antes del que los importó).
+    """
+    entorno = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module or settings.SETTINGS_MODULE)
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CODIGO_ARRANQUE],
+        cwd=settings.BASE_DIR, env=entorno, capture_output=True, text=True,
+    )
+    if proceso.returncode:
+        raise RuntimeError('django.setup() falló:\n%s' % proceso.stderr[-2000:])
+    return leer_importtime(proceso.stderr)
+
+
+def leer_importtime(texto):
+    importaciones = []
+    for linea in texto.splitlines():
+        if not linea.startswith('import time:'):
+            continue
+        propio, acumulado, nombre = linea[len('import time:'):].split('|')
+        if not propio.strip().isdigit():
+            # Encabezado "self [us] | cumulative | imported package"
+            continue
+        modulo = nombre.strip()
+        profundidad = (len(nombre.rstrip()) - len(modulo) - 1) // 2
+        importaciones.append(Importacion(modulo, int(propio), int(acumulado), profundidad))
+    return importaciones
+
+
+def costo_total(importaciones):
+    return sum(importacion.acumulado_us for importacion in importaciones if importacion.profundidad == 0)
+
+
+def costo_paquete(importaciones, paquete):
+    """
+    Microsegundos de importación atribuibles a ``paquete``: el tiempo acumulado de sus módulos
+    más externos, que incluye lo que importan por primera vez (lo anidado se cuenta una vez).
+    """
+    total = 0
+    # Recorridas al revés, cada importación aparece después de la que la contiene
+    pila = []
+    for importacion in reversed(importaciones):
+        while pila and pila[-1][0] >= importacion.profundidad:
+            pila.pop()
+        dentro = bool(pila) and pila[-1][1]
+        propio = importacion.modulo == paquete or importacion.modulo.startswith(paquete + '.')
+        if propio and not dentro:
+            total += importacion.acumulado_us
+        pila.append((importacion.profundidad, dentro or propio))
+    return total
+
+
+def modulos_pesados(importaciones):
+    return sorted({
+        importacion.modulo.partition('.')[0] for importacion in importaciones
+        if importacion.modulo.partition('.')[0] in MODULOS_PESADOS
+    })
@@ -0,0 +1,164 @@
+"""
+Autocompletado por prefijo de títulos, autores, géneros e idiomas.
+
+Cada proceso guarda, por tipo, un índice en memoria: una lista ordenada de claves normalizadas
+(minúsculas y sin acentos) con el id del objeto. Cada objeto aporta una clave por palabra, desde
+esa palabra hasta el final ("jorge luis borges", "luis borges", "borges"), así que "bor" encuentra
+a Borges. Una búsqueda es una bisección más un recorrido de las claves con ese prefijo.
+
+Las señales de ``catalogo.signals`` invalidan un tipo al guardar o borrar sus objetos
+(``invalidar``). La invalidación incrementa una versión en la caché compartida; cada proceso
+compara esa versión en cada búsqueda y reconstruye su índice cuando cambió.
+
+Las tablas de más de ``MAX_ENTRADAS`` filas no se cargan en memoria: se buscan en la base de
+datos con ``istartswith`` sobre sus campos (el mismo criterio, sin las palabras intermedias).
+"""
+import threading
+import unicodedata
+from bisect import bisect_left
+
+from django.db.models import Q
+
+from . import fragmentos
+from .models import Autor, Genero, Idioma, Libro
+
+LIMITE = 10
+MAX_ENTRADAS = 100000
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ' '.join(''.join(c for c in texto if not unicodedata.combining(c)).casefold().split())
+
+
+class Tipo:
+    """
+    Qué se indexa de un modelo: ``campos`` leídos de la base de datos, ``textos(fila)`` con los
+    textos buscables y ``etiqueta(fila)`` con el texto que se muestra.
+    """
+
+    def __init__(self, modelo, campos, textos, etiqueta):
+        self.modelo = modelo
+        self.campos = campos
+        self.textos = textos
+        self.etiqueta = etiqueta
+
+
+TIPOS = {
+    'libro': Tipo(Libro, ('titulo',), lambda fila: [fila['titulo']], lambda fila: fila['titulo']),
+    'autor': Tipo(
+        Autor, ('nombre', 'apellido'),
+        lambda fila: ['%s %s' % (fila['nombre'], fila['apellido']), fila['apellido']],
+        lambda fila: '%s, %s' % (fila['apellido'], fila['nombre']),
+    ),
+    'genero': Tipo(Genero, ('nombre',), lambda fila: [fila['nombre']], lambda fila: fila['nombre']),
+    'idioma': Tipo(Idioma, ('nombre',), lambda fila: [fila['nombre']], lambda fila: fila['nombre']),
+}
+
+
+class IndicePrefijos:
+    def __init__(self, filas, tipo):
+        entradas = set()
+        self.etiquetas = {}
+        for fila in filas:
+            self.etiquetas[fila['pk']] = tipo.etiqueta(fila)
+            for texto in tipo.textos(fila):
+                palabras = normalizar(texto).split()
+                for inicio in range(len(palabras)):
+                    entradas.add((' '.join(palabras[inicio:]), fila['pk']))
+        entradas = sorted(entradas)
+        self.claves = [clave for clave, _ in entradas]
+        self.ids = [pk for _, pk in entradas]
+
+    def buscar(self, prefijo, limite):
+        encontrados = []
+        vistos = set()
+        posicion = bisect_left(self.claves, prefijo)
+        while posicion < len(self.claves) and self.claves[posicion].startswith(prefijo):
+            pk = self.ids[posicion]
+            if pk not in vistos:
+                vistos.add(pk)
+                encontrados.append(pk)
+                if len(encontrados) == limite:
+                    break
+            posicion += 1
+        return encontrados
+
+
+# Índices de este proceso: {tipo: (versión, índice)}; el índice es None si la tabla es
+# demasiado grande para la memoria
+_indices = {}
+_bloqueo = threading.Lock()
+
+
+def _indice(nombre, using=None):
+    version = fragmentos.versiones(autocompletar=nombre)['autocompletar']
+    en_memoria = _indices.get(nombre)
+    if en_memoria is None or en_memoria[0] != version:
+        with _bloqueo:
+            en_memoria = _indices.get(nombre)
+            if en_memoria is None or en_memoria[0] != version:
+                tipo = TIPOS[nombre]
+                # El límite se comprueba leyendo una fila de más, sin un COUNT aparte
+                filas = list(tipo.modelo.objects.using(using).order_by().values('pk', *tipo.campos)[:MAX_ENTRADAS + 1])
+                en_memoria = _indices[nombre] = (version, IndicePrefijos(filas, tipo) if len(filas) <= MAX_ENTRADAS else None)
+    return en_memoria[1]
+
+
+def invalidar(*nombres):
+    fragmentos.incrementar('autocompletar', *nombres)
+    for nombre in nombres:
+        # Sin esperar a la caché: este proceso reconstruye en la siguiente búsqueda
+        _indices.pop(nombre, None)
+
+
+def buscar_ids(nombre, consulta, limite=LIMITE, using=None):
+    """
+    Ids de los objetos de ``nombre`` con alguna palabra que empieza por ``consulta``, en orden
+    alfabético de la coincidencia (``limite=None``: todos). Devuelve None si el tipo no tiene
+    índice en memoria.
+    """
+    indice = _indice(nombre, using)
+    if indice is None:
+        return None
+    prefijo = normalizar(consulta)
+    return indice.buscar(prefijo, limite) if prefijo else []
+
+
+def buscar_ids_por_palabras(nombre, consulta, using=None):
+    """
+    Conjunto de ids de los objetos de ``nombre`` en los que cada palabra de ``consulta`` es prefijo
+    de alguna de sus palabras, en cualquier orden ("jorge bor", "borges jorge"). Devuelve None si
+    el tipo no tiene índice en memoria.
+    """
+    indice = _indice(nombre, using)
+    if indice is None:
+        return None
+    ids = None
+    for palabra in normalizar(consulta).split():
+        encontrados = set(indice.buscar(palabra, None))
+        ids = encontrados if ids is None else ids & encontrados
+        if not ids:
+            break
+    return ids or set()
+
+
+def buscar(nombre, consulta, limite=LIMITE, using=None):
+    """
+    Hasta ``limite`` pares ``(id, etiqueta)`` de ``nombre`` ('libro', 'autor', 'genero' o 'idioma')
+    que empiezan por ``consulta``, del índice en memoria o, si la tabla es muy grande, de la base de datos.
+    """
+    indice = _indice(nombre, using)
+    if indice is not None:
+        prefijo = normalizar(consulta)
+        return [(pk, indice.etiquetas[pk]) for pk in indice.buscar(prefijo, limite)] if prefijo else []
+
+    tipo = TIPOS[nombre]
+    consulta = (consulta or '').strip()
+    if not consulta:
+        return []
+    filtro = Q()
+    for campo in tipo.campos:
+        filtro |= Q(**{'%s__istartswith' % campo: consulta})
+    filas = tipo.modelo.objects.using(using).filter(filtro).order_by(*tipo.campos).values('pk', *tipo.campos)[:limite]
+    return [(fila['pk'], tipo.etiqueta(fila)) for fila in filas]
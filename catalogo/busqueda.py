@@ -0,0 +1,325 @@
+"""
+Búsqueda de texto completo sobre Libro.
+
+El índice cubre título, descripción, ISBN, nombre del autor y nombres de los géneros.
+Se guarda en una tabla aparte cuya implementación depende de la base de datos:
+
+- SQLite: tabla virtual FTS5 (``catalogo_libro_fts``), ordenada por bm25.
+- PostgreSQL: tabla con una columna tsvector e índice GIN (``catalogo_libro_busqueda``),
+  ordenada por ts_rank_cd.
+
+La tabla se crea en la migración 0007 y se mantiene sincronizada con las señales de
+``catalogo.signals``. ``manage.py reindexar_busqueda`` la reconstruye completa.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+
+# Pesos relativos de las columnas del índice (titulo, descripcion, isbn, autor, generos)
+PESOS = (10.0, 1.0, 8.0, 5.0, 3.0)
+
+TAMANO_LOTE = 500
+
+
+def documentos(ids, modelo_libro=None):
+    """
+    Devuelve un dict {id: (titulo, descripcion, isbn, autor, generos)} para los libros ``ids``.
+
+    ``modelo_libro`` permite usar el modelo histórico desde una migración.
+    """
+    if modelo_libro is None:
+        from .models import Libro as modelo_libro
+
+    docs = {}
+    for fila in modelo_libro.objects.filter(pk__in=ids).values(
+            'pk', 'titulo', 'descripcion', 'isbn', 'autor__nombre', 'autor__apellido'):
+        autor = ' '.join(filter(None, [fila['autor__nombre'], fila['autor__apellido']]))
+        docs[fila['pk']] = [fila['titulo'], fila['descripcion'], fila['isbn'], autor, []]
+
+    generos = modelo_libro.genero.through.objects.filter(libro_id__in=ids).values_list('libro_id', 'genero__nombre')
+    for libro_id, nombre in generos:
+        docs[libro_id][4].append(nombre)
+
+    return {pk: tuple(doc[:4]) + (' '.join(doc[4]),) for pk, doc in docs.items()}
+
+
+def _lotes(ids, tamano=TAMANO_LOTE):
+    ids = list(ids)
+    for inicio in range(0, len(ids), tamano):
+        yield ids[inicio:inicio + tamano]
+
+
+def _palabras(consulta):
+    return re.findall(r'\w+', consulta or '')
+
+
+class BackendBusqueda:
+    """
+    Interfaz de los índices de búsqueda. Cada backend sabe crear su tabla, mantenerla y consultarla.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def crear(self):
+        raise NotImplementedError
+
+    def eliminar(self):
+        raise NotImplementedError
+
+    def indexar(self, ids, modelo_libro=None):
+        """
+        Agrega o reemplaza en el índice los libros ``ids``; los que ya no existen se quitan.
+        """
+        for lote in _lotes(ids):
+            docs = documentos(lote, modelo_libro)
+            self.quitar(lote)
+            if docs:
+                self._insertar(docs)
+
+    def quitar(self, ids):
+        raise NotImplementedError
+
+    def vaciar(self):
+        raise NotImplementedError
+
+    def buscar(self, consulta, inicio, fin):
+        """
+        Devuelve la lista de ids de libros que coinciden con ``consulta``, ordenados por relevancia.
+        """
+        raise NotImplementedError
+
+    def contar(self, consulta):
+        raise NotImplementedError
+
+    def _insertar(self, docs):
+        raise NotImplementedError
+
+
+class BackendSQLite(BackendBusqueda):
+    tabla = 'catalogo_libro_fts'
+
+    def crear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5("
+                "titulo, descripcion, isbn, autor, generos, tokenize='unicode61 remove_diacritics 2')" % self.tabla
+            )
+
+    def eliminar(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS %s' % self.tabla)
+
+    def quitar(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM %s WHERE rowid IN (%s)' % (self.tabla, ', '.join(['%s'] * len(ids))), ids
+            )
+
+    def vaciar(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s' % self.tabla)
+
+    def _insertar(self, docs):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO %s (rowid, titulo, descripcion, isbn, autor, generos) '
+                'VALUES (%%s, %%s, %%s, %%s, %%s, %%s)' % self.tabla,
+                [(pk,) + doc for pk, doc in docs.items()],
+            )
+
+    def _expresion(self, consulta):
+        # Cada palabra como frase entre comillas; la última admite prefijo (búsqueda mientras se escribe).
+        palabras = ['"%s"' % palabra for palabra in _palabras(consulta)]
+        if palabras:
+            palabras[-1] += '*'
+        return ' '.join(palabras)
+
+    def buscar(self, consulta, inicio, fin):
+        expresion = self._expresion(consulta)
+        if not expresion:
+            return []
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid FROM %s WHERE %s MATCH %%s ORDER BY bm25(%s, %s) LIMIT %%s OFFSET %%s'
+                % (self.tabla, self.tabla, self.tabla, ', '.join(str(peso) for peso in PESOS)),
+                [expresion, fin - inicio, inicio],
+            )
+            return [fila[0] for fila in cursor.fetchall()]
+
+    def contar(self, consulta):
+        expresion = self._expresion(consulta)
+        if not expresion:
+            return 0
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM %s WHERE %s MATCH %%s' % (self.tabla, self.tabla), [expresion])
+            return cursor.fetchone()[0]
+
+
+class BackendPostgres(BackendBusqueda):
+    tabla = 'catalogo_libro_busqueda'
+
+    @property
+    def configuracion(self):
+        return getattr(settings, 'CATALOGO_BUSQUEDA_CONFIGURACION', 'spanish')
+
+    def crear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE IF NOT EXISTS %s ('
+                'libro_id bigint PRIMARY KEY REFERENCES catalogo_libro (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+                'documento tsvector NOT NULL)' % self.tabla
+            )
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS %s_documento_gin ON %s USING GIN (documento)' % (self.tabla, self.tabla)
+            )
+
+    def eliminar(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS %s' % self.tabla)
+
+    def quitar(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s WHERE libro_id = ANY(%%s)' % self.tabla, [ids])
+
+    def vaciar(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('TRUNCATE %s' % self.tabla)
+
+    def _insertar(self, docs):
+        vector = (
+            "setweight(to_tsvector(%(c)s, %%s), 'A') || setweight(to_tsvector(%(c)s, %%s), 'D') || "
+            "setweight(to_tsvector('simple', %%s), 'A') || setweight(to_tsvector(%(c)s, %%s), 'B') || "
+            "setweight(to_tsvector(%(c)s, %%s), 'C')"
+        ) % {'c': "'%s'" % self.configuracion}
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO %s (libro_id, documento) VALUES (%%s, %s) '
+                'ON CONFLICT (libro_id) DO UPDATE SET documento = EXCLUDED.documento' % (self.tabla, vector),
+                [(pk,) + doc for pk, doc in docs.items()],
+            )
+
+    def buscar(self, consulta, inicio, fin):
+        if not _palabras(consulta):
+            return []
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT libro_id FROM %s, websearch_to_tsquery(%%s, %%s) AS q '
+                'WHERE documento @@ q ORDER BY ts_rank_cd(documento, q) DESC, libro_id LIMIT %%s OFFSET %%s' % self.tabla,
+                [self.configuracion, consulta, fin - inicio, inicio],
+            )
+            return [fila[0] for fila in cursor.fetchall()]
+
+    def contar(self, consulta):
+        if not _palabras(consulta):
+            return 0
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT COUNT(*) FROM %s WHERE documento @@ websearch_to_tsquery(%%s, %%s)' % self.tabla,
+                [self.configuracion, consulta],
+            )
+            return cursor.fetchone()[0]
+
+
+class BackendSimple(BackendBusqueda):
+    """
+    Respaldo sin índice para otras bases de datos: filtra con icontains sobre el modelo.
+    """
+
+    def crear(self):
+        pass
+
+    def eliminar(self):
+        pass
+
+    def indexar(self, ids, modelo_libro=None):
+        pass
+
+    def quitar(self, ids):
+        pass
+
+    def vaciar(self):
+        pass
+
+    def _queryset(self, consulta):
+        from django.db.models import Q
+        from .models import Libro
+
+        filtro = Q()
+        for palabra in _palabras(consulta):
+            filtro &= (
+                Q(titulo__icontains=palabra) | Q(descripcion__icontains=palabra) | Q(isbn__icontains=palabra)
+                | Q(autor__nombre__icontains=palabra) | Q(autor__apellido__icontains=palabra)
+                | Q(genero__nombre__icontains=palabra)
+            )
+        return Libro.objects.filter(filtro).values_list('pk', flat=True).distinct().order_by('pk')
+
+    def buscar(self, consulta, inicio, fin):
+        if not _palabras(consulta):
+            return []
+        return list(self._queryset(consulta)[inicio:fin])
+
+    def contar(self, consulta):
+        if not _palabras(consulta):
+            return 0
+        return self._queryset(consulta).count()
+
+
+BACKENDS = {
+    'sqlite': BackendSQLite,
+    'postgresql': BackendPostgres,
+}
+
+
+def obtener_backend(using=DEFAULT_DB_ALIAS, connection=None):
+    """
+    Devuelve el backend de búsqueda adecuado para la conexión indicada.
+    """
+    if connection is None:
+        connection = connections[using]
+    return BACKENDS.get(connection.vendor, BackendSimple)(connection)
+
+
+class ResultadosBusqueda:
+    """
+    Secuencia perezosa de resultados que el Paginator de Django puede contar y rebanar:
+    cada página ejecuta una consulta al índice con LIMIT/OFFSET y otra para traer esos libros.
+    """
+
+    def __init__(self, consulta, backend=None):
+        self.consulta = consulta
+        self.backend = backend or obtener_backend()
+        self._total = None
+
+    def count(self):
+        if self._total is None:
+            self._total = self.backend.contar(self.consulta)
+        return self._total
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        from .models import Libro
+
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        inicio = item.start or 0
+        fin = item.stop if item.stop is not None else self.count()
+        ids = self.backend.buscar(self.consulta, inicio, fin)
+        libros = Libro.objects.select_related('autor').in_bulk(ids)
+        return [libros[pk] for pk in ids if pk in libros]
+
+
+def buscar_libros(consulta):
+    """
+    Devuelve los libros que coinciden con ``consulta`` como ResultadosBusqueda ordenados por relevancia.
+    """
+    return ResultadosBusqueda(consulta)
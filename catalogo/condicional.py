@@ -0,0 +1,160 @@
+"""
+Respuestas condicionales (ETag y Last-Modified) de las páginas del catálogo.
+
+Se usan con ``django.views.decorators.http.condition``: si el navegador o el crawler ya tiene
+la versión actual de la página, la vista responde 304 sin ejecutar sus consultas principales
+ni renderizar la plantilla.
+
+- Last-Modified sale de los campos ``modificado`` (una consulta por índice). Los borrados no
+  dejan fila que consultar, así que se anotan en la caché (``marcar_borrado``).
+- La ETag combina esa fecha, las versiones de los fragmentos en caché (que también cambian al
+  renombrar géneros o idiomas), el usuario y la URL: la cabecera de la página depende del
+  usuario y sus permisos.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from . import fragmentos
+from .models import Autor, Libro
+
+PREFIJO_BORRADO = 'catalogo:borrado:'
+
+
+def marcar_borrado(modelo):
+    cache.set(PREFIJO_BORRADO + modelo._meta.model_name, timezone.now(), timeout=None)
+
+
+def _ultimo_borrado(*modelos):
+    """
+    Fecha del último borrado de cualquiera de ``modelos``. Si la marca no está en caché (nunca
+    se anotó o se desalojó) se crea con la hora actual: las páginas se sirven completas una
+    vez más en lugar de arriesgar un 304 con datos viejos.
+    """
+    claves = [PREFIJO_BORRADO + modelo._meta.model_name for modelo in modelos]
+    en_cache = cache.get_many(claves)
+    for clave in claves:
+        if clave not in en_cache:
+            ahora = timezone.now()
+            cache.add(clave, ahora, timeout=None)
+            en_cache[clave] = cache.get(clave, ahora)
+    return max(en_cache.values())
+
+
+def _usuario(request):
+    usuario = request.user
+    if not usuario.is_authenticated:
+        return 'anonimo'
+    return '%s:%d:%d' % (usuario.pk, usuario.is_staff, usuario.has_perm('catalogo.can_mark_returned'))
+
+
+def _etag(request, *partes):
+    contenido = '|'.join(str(parte) for parte in partes + (_usuario(request), request.get_full_path()))
+    return hashlib.md5(contenido.encode()).hexdigest()
+
+
+def _memo(funcion):
+    """
+    Calcula ``funcion`` una sola vez por petición: condition() llama por separado a la función
+    de la ETag y a la de Last-Modified, y ambas necesitan el mismo dato.
+    """
+    atributo = '_condicional_%s' % funcion.__name__
+
+    def envoltura(request, *args, **kwargs):
+        if not hasattr(request, atributo):
+            setattr(request, atributo, funcion(request, *args, **kwargs))
+        return getattr(request, atributo)
+    return envoltura
+
+
+def _maximo(*fechas):
+    fechas = [fecha for fecha in fechas if fecha is not None]
+    return max(fechas) if fechas else None
+
+
+# Detalle de libro: el libro, su autor y sus copias
+
+@_memo
+def _datos_libro(request, pk):
+    try:
+        filas = list(
+            Libro.objects.filter(pk=pk).order_by()
+            .values_list('modificado', 'autor_id', 'autor__modificado')
+            .annotate(copias=Max('peticioneslibro__modificado'))
+        )
+    except ValueError:
+        return None
+    if not filas:
+        return None
+    modificado, autor_id, autor_modificado, copias = filas[0]
+    return autor_id, _maximo(modificado, autor_modificado, copias)
+
+
+def ultima_modificacion_libro(request, pk):
+    datos = _datos_libro(request, pk)
+    return datos and datos[1]
+
+
+def etag_libro(request, pk):
+    datos = _datos_libro(request, pk)
+    if datos is None:
+        return None
+    autor_id, modificado = datos
+    versiones = fragmentos.versiones(
+        libro=pk, copias=pk, autor=autor_id, generos=fragmentos.GLOBAL, idiomas=fragmentos.GLOBAL,
+        recomendaciones=pk,
+    )
+    return _etag(request, modificado.isoformat(), sorted(versiones.items()))
+
+
+# Detalle de autor: el autor, sus libros y las copias de sus libros
+
+@_memo
+def _datos_autor(request, pk):
+    try:
+        filas = list(
+            Autor.objects.filter(pk=pk).order_by()
+            .values_list('modificado')
+            .annotate(libros=Max('libro__modificado'), copias=Max('libro__peticioneslibro__modificado'))
+        )
+    except ValueError:
+        return None
+    return filas and _maximo(*filas[0]) or None
+
+
+def ultima_modificacion_autor(request, pk):
+    return _datos_autor(request, pk)
+
+
+def etag_autor(request, pk):
+    modificado = _datos_autor(request, pk)
+    if modificado is None:
+        return None
+    versiones = fragmentos.versiones(autor=pk, bibliografia=pk)
+    return _etag(request, modificado.isoformat(), sorted(versiones.items()))
+
+
+# Listas: muestran libros con su autor, o autores
+
+@_memo
+def ultima_modificacion_libros(request):
+    return _maximo(
+        Libro.objects.aggregate(ultimo=Max('modificado'))['ultimo'],
+        Autor.objects.aggregate(ultimo=Max('modificado'))['ultimo'],
+        _ultimo_borrado(Libro, Autor),
+    )
+
+
+def etag_libros(request):
+    return _etag(request, ultima_modificacion_libros(request))
+
+
+@_memo
+def ultima_modificacion_autores(request):
+    return _maximo(Autor.objects.aggregate(ultimo=Max('modificado'))['ultimo'], _ultimo_borrado(Autor))
+
+
+def etag_autores(request):
+    return _etag(request, ultima_modificacion_autores(request))
@@ -0,0 +1,107 @@
+"""
+Contadores de copias por libro (``Libro.copias_total``, ``copias_disponibles``, etc.).
+
+Se ajustan con expresiones F() (``UPDATE ... SET copias_prestadas = copias_prestadas + 1``)
+dentro de la transacción que crea, borra o cambia de status la copia, así que dos préstamos
+simultáneos del mismo libro no se pisan y las listas muestran la disponibilidad sin consultar
+las copias. Las escrituras masivas que no pasan por señales (``bulk_create``, ``update()``)
+deben llamar a ``recontar_copias`` con los libros afectados; ``manage.py recount_copies``
+repara todo el catálogo.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Libro, PeticionesLibro
+
+# Contador de cada status de PeticionesLibro
+CONTADOR_POR_STATUS = {
+    'd': 'copias_disponibles',
+    'p': 'copias_prestadas',
+    'r': 'copias_reservadas',
+    'm': 'copias_mantenimiento',
+}
+
+TAMANO_LOTE = 2000
+
+
+def ajustar_contadores(libro_id, anterior=None, nuevo=None, using=None):
+    """
+    Aplica a los contadores de ``libro_id`` el paso de una copia del status ``anterior`` a ``nuevo``.
+    ``anterior`` es None si la copia se acaba de crear y ``nuevo`` es None si se eliminó.
+    """
+    if libro_id is None or anterior == nuevo:
+        return
+    cambios = Counter()
+    if anterior is None:
+        cambios['copias_total'] += 1
+    elif anterior in CONTADOR_POR_STATUS:
+        cambios[CONTADOR_POR_STATUS[anterior]] -= 1
+    if nuevo is None:
+        cambios['copias_total'] -= 1
+    elif nuevo in CONTADOR_POR_STATUS:
+        cambios[CONTADOR_POR_STATUS[nuevo]] += 1
+    valores = {campo: F(campo) + delta for campo, delta in cambios.items() if delta}
+    if valores:
+        Libro.objects.using(using).filter(pk=libro_id).update(modificado=timezone.now(), **valores)
+
+
+def conteos_reales(libro_ids, using=None):
+    """
+    Contadores calculados desde las copias para ``libro_ids``, en una consulta agrupada por libro.
+    Los libros sin copias no aparecen.
+    """
+    conteos = {
+        campo: Count('pk', filter=Q(status=status)) for status, campo in CONTADOR_POR_STATUS.items()
+    }
+    filas = (
+        PeticionesLibro.objects.using(using).filter(libro_id__in=libro_ids).order_by()
+        .values('libro_id').annotate(copias_total=Count('pk'), **conteos)
+    )
+    return {fila.pop('libro_id'): fila for fila in filas}
+
+
+def recontar_copias(libro_ids=None, using=None, lote=TAMANO_LOTE):
+    """
+    Recalcula los contadores de ``libro_ids`` (todos los libros si es None) y corrige solo los que
+    no coinciden. Trabaja por lotes de ``lote`` libros, cada uno en su transacción con dos lecturas
+    y un ``bulk_update``. Devuelve los ids de los libros corregidos.
+    """
+    libros = Libro.objects.using(using).order_by('pk')
+    if libro_ids is not None:
+        libros = libros.filter(pk__in=list(libro_ids))
+    ids = libros.values_list('pk', flat=True)
+
+    corregidos = []
+    ultimo = None
+    while True:
+        pagina = ids if ultimo is None else ids.filter(pk__gt=ultimo)
+        pagina = list(pagina[:lote])
+        if not pagina:
+            return corregidos
+        ultimo = pagina[-1]
+        with transaction.atomic(using=using):
+            corregidos.extend(_corregir_lote(pagina, using))
+
+
+def _corregir_lote(libro_ids, using):
+    # Se bloquean los libros antes de contar: un préstamo concurrente espera a que termine la corrección
+    guardados = list(
+        Libro.objects.using(using).select_for_update().filter(pk__in=libro_ids)
+        .only('pk', *Libro.CONTADORES_COPIAS)
+    )
+    reales = conteos_reales(libro_ids, using)
+    vacio = dict.fromkeys(Libro.CONTADORES_COPIAS, 0)
+    ahora = timezone.now()
+    desfasados = []
+    for libro in guardados:
+        conteo = reales.get(libro.pk, vacio)
+        if any(getattr(libro, campo) != valor for campo, valor in conteo.items()):
+            for campo, valor in conteo.items():
+                setattr(libro, campo, valor)
+            libro.modificado = ahora
+            desfasados.append(libro)
+    Libro.objects.using(using).bulk_update(desfasados, list(Libro.CONTADORES_COPIAS) + ['modificado'])
+    return [libro.pk for libro in desfasados]
@@ -0,0 +1,53 @@
+"""
+Disponibilidad de copias por libro, calculada con una consulta agregada.
+"""
+from django.db.models import Count, Min, Q
+
+from .models import Libro, PeticionesLibro
+
+# Libros que se pueden consultar en una sola petición
+MAXIMO_LOTE = 200
+
+
+def agregados(relacion=''):
+    """
+    Expresiones de agregación de la disponibilidad. ``relacion`` es el prefijo hasta las copias
+    (``'peticioneslibro__'`` desde Libro, vacío desde PeticionesLibro).
+    """
+    copia = relacion + 'id' if relacion else 'id'
+    resultado = {'copias': Count(copia)}
+    for status, _ in PeticionesLibro.LOAN_STATUS:
+        resultado['copias_%s' % status] = Count(copia, filter=Q(**{relacion + 'status': status}))
+    resultado['proxima_devolucion'] = Min(relacion + 'devolucion', filter=Q(**{relacion + 'status': 'p'}))
+    return resultado
+
+
+def _fila_json(fila):
+    if fila['proxima_devolucion']:
+        fila['proxima_devolucion'] = fila['proxima_devolucion'].isoformat()
+    return fila
+
+
+def disponibilidad_en_lote(ids=(), isbns=()):
+    """
+    Disponibilidad de los libros pedidos por id y/o ISBN, en una consulta agrupada por libro
+    (LEFT JOIN a las copias, así que los libros sin copias aparecen con cero).
+
+    Devuelve ``{'libros': [...], 'no_encontrados': {'ids': [...], 'isbns': [...]}}``.
+    """
+    filas = [
+        _fila_json(fila)
+        for fila in Libro.objects.filter(Q(pk__in=ids) | Q(isbn__in=isbns))
+        .order_by('pk')
+        .values('id', 'isbn')
+        .annotate(**agregados('peticioneslibro__'))
+    ]
+    encontrados_ids = {fila['id'] for fila in filas}
+    encontrados_isbns = {fila['isbn'] for fila in filas}
+    return {
+        'libros': filas,
+        'no_encontrados': {
+            'ids': sorted(set(ids) - encontrados_ids),
+            'isbns': sorted(set(isbns) - encontrados_isbns),
+        },
+    }
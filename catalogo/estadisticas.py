@@ -0,0 +1,123 @@
+"""
+Contadores de la página de inicio.
+
+Los seis contadores de ``index`` se calculan en una sola consulta agregada y se
+guardan en la caché. Las señales de ``catalogo.signals`` los actualizan de forma
+incremental, de modo que en estado estable la página de inicio no consulta las
+tablas del catálogo. El TTL (``CATALOGO_ESTADISTICAS_TTL``) actúa como red de
+seguridad para los cambios que no pasan por señales (``update()``, ``bulk_create()``):
+al expirar, los contadores se recalculan completos.
+
+Las señales ajustan e invalidan con ``ajustar_al_confirmar`` e ``invalidar_al_confirmar``:
+un ROLLBACK dejaría los contadores desfasados hasta el TTL, y una petición simultánea podría
+recalcularlos con las filas de antes del COMMIT.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Func, IntegerField
+
+from .models import Libro, PeticionesLibro, Autor, Genero
+
+PREFIJO_CACHE = 'catalogo:estadisticas:'
+TTL_PREDETERMINADO = 60 * 10
+
+# Palabra del contador 'filtro' de la página de inicio.
+PALABRA_FILTRO = 'anillo'
+
+
+def _consultas():
+    """
+    Devuelve los QuerySets cuyo conteo forma cada contador de la página de inicio.
+    """
+    return {
+        'num_books': Libro.objects.all(),
+        'num_instances': PeticionesLibro.objects.all(),
+        'num_instances_available': PeticionesLibro.objects.filter(status__exact='d'),
+        'num_authors': Autor.objects.all(),
+        'num_generos': Genero.objects.all(),
+        'filtro': Libro.objects.filter(titulo__icontains=PALABRA_FILTRO),
+    }
+
+
+def _ttl():
+    return getattr(settings, 'CATALOGO_ESTADISTICAS_TTL', TTL_PREDETERMINADO)
+
+
+def calcular_estadisticas():
+    """
+    Calcula todos los contadores en una única consulta (un SELECT con una subconsulta COUNT por contador).
+    """
+    consultas = _consultas()
+    columnas = []
+    parametros = []
+    for queryset in consultas.values():
+        subconsulta = queryset.order_by().annotate(
+            total=Func(F('pk'), function='COUNT', output_field=IntegerField())
+        ).values('total')
+        sql, params = subconsulta.query.sql_with_params()
+        columnas.append('(%s)' % sql)
+        parametros.extend(params)
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT %s' % ', '.join(columnas), parametros)
+        fila = cursor.fetchone()
+    return dict(zip(consultas.keys(), fila))
+
+
+def obtener_estadisticas():
+    """
+    Devuelve los contadores de la página de inicio desde la caché, recalculándolos si falta alguno.
+    """
+    nombres = list(_consultas().keys())
+    claves = {PREFIJO_CACHE + nombre: nombre for nombre in nombres}
+    en_cache = cache.get_many(claves.keys())
+    if len(en_cache) == len(claves):
+        return {claves[clave]: valor for clave, valor in en_cache.items()}
+
+    estadisticas = calcular_estadisticas()
+    cache.set_many({PREFIJO_CACHE + nombre: valor for nombre, valor in estadisticas.items()}, _ttl())
+    return estadisticas
+
+
+def ajustar_estadistica(nombre, delta):
+    """
+    Suma ``delta`` a un contador en caché. Si el contador no está en caché no hace nada:
+    la próxima lectura lo recalculará completo.
+    """
+    if not delta:
+        return
+    try:
+        cache.incr(PREFIJO_CACHE + nombre, delta)
+    except ValueError:
+        # La clave expiró o nunca se calculó.
+        pass
+
+
+def ajustar_al_confirmar(using=None, **deltas):
+    """
+    Como ``ajustar_estadistica`` para cada ``nombre=delta``, cuando se confirme la transacción
+    en curso de ``using`` (en seguida si no hay ninguna).
+    """
+    deltas = {nombre: delta for nombre, delta in deltas.items() if delta}
+
+    def ajustar():
+        for nombre, delta in deltas.items():
+            ajustar_estadistica(nombre, delta)
+
+    if deltas:
+        transaction.on_commit(ajustar, using=using)
+
+
+def invalidar_estadisticas():
+    """
+    Descarta los contadores en caché para forzar un recálculo completo en la próxima lectura.
+    """
+    cache.delete_many([PREFIJO_CACHE + nombre for nombre in _consultas()])
+
+
+def invalidar_al_confirmar(using=None):
+    """
+    Como ``invalidar_estadisticas``, cuando se confirme la transacción en curso de ``using``.
+    """
+    transaction.on_commit(invalidar_estadisticas, using=using)
@@ -0,0 +1,108 @@
+"""
+Exportación del catálogo completo en CSV o JSONL.
+
+Las filas se generan de forma perezosa: los libros se leen con ``values()`` e ``iterator()``
+(un cursor del lado del servidor en PostgreSQL) y los géneros se traen con una consulta por
+bloque, así que la memoria usada no depende del tamaño del catálogo.
+"""
+import csv
+import json
+
+from django.db.models import Count, Q
+
+from .models import Libro
+
+COLUMNAS = [
+    'id', 'titulo', 'isbn', 'autor', 'idioma', 'generos',
+    'copias', 'disponibles', 'prestadas', 'reservadas', 'mantenimiento',
+]
+
+# Columna de conteo por cada status de PeticionesLibro
+CONTEOS_POR_STATUS = {'d': 'disponibles', 'p': 'prestadas', 'r': 'reservadas', 'm': 'mantenimiento'}
+
+TAMANO_BLOQUE = 2000
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def filas_catalogo(tamano_bloque=TAMANO_BLOQUE):
+    """
+    Genera un dict por libro con las columnas de COLUMNAS, en orden de id.
+    """
+    conteos = {
+        columna: Count('peticioneslibro', filter=Q(peticioneslibro__status=status))
+        for status, columna in CONTEOS_POR_STATUS.items()
+    }
+    libros = (
+        Libro.objects.order_by('pk')
+        .values('pk', 'titulo', 'isbn', 'autor__nombre', 'autor__apellido', 'idioma__nombre')
+        .annotate(copias=Count('peticioneslibro'), **conteos)
+        .iterator(chunk_size=tamano_bloque)
+    )
+
+    bloque = []
+    for libro in libros:
+        bloque.append(libro)
+        if len(bloque) == tamano_bloque:
+            yield from _filas_de_bloque(bloque)
+            bloque = []
+    yield from _filas_de_bloque(bloque)
+
+
+def _filas_de_bloque(libros):
+    generos = {}
+    relaciones = (
+        Libro.genero.through.objects.filter(libro_id__in=[libro['pk'] for libro in libros])
+        .order_by('libro_id', 'genero__nombre')
+        .values_list('libro_id', 'genero__nombre')
+    )
+    for libro_id, nombre in relaciones:
+        generos.setdefault(libro_id, []).append(nombre)
+
+    for libro in libros:
+        autor = ', '.join(filter(None, [libro['autor__apellido'], libro['autor__nombre']]))
+        fila = {
+            'id': libro['pk'],
+            'titulo': libro['titulo'],
+            'isbn': libro['isbn'],
+            'autor': autor,
+            'idioma': libro['idioma__nombre'] or '',
+            'generos': generos.get(libro['pk'], []),
+        }
+        for columna in ['copias'] + list(CONTEOS_POR_STATUS.values()):
+            fila[columna] = libro[columna]
+        yield fila
+
+
+class _Eco:
+    """
+    Pseudo-archivo que devuelve lo que se escribe, para que csv.writer produzca líneas sueltas.
+    """
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(filas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(COLUMNAS)
+    for fila in filas:
+        fila = dict(fila, generos='|'.join(fila['generos']))
+        yield escritor.writerow([fila[columna] for columna in COLUMNAS])
+
+
+def lineas_jsonl(filas):
+    for fila in filas:
+        yield json.dumps(fila, ensure_ascii=False) + '\n'
+
+
+def exportar(formato, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Devuelve un generador de líneas de texto del catálogo en ``formato`` ('csv' o 'jsonl').
+    """
+    filas = filas_catalogo(tamano_bloque)
+    if formato == 'csv':
+        return lineas_csv(filas)
+    return lineas_jsonl(filas)
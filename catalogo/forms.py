@@ -1,8 +1,13 @@
 from django.core.exceptions import ValidationError
 #from django.utils.translation import ugettext_lazy as _
 import datetime #for checking renewal date range.
+import uuid
 
 from django import forms
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from .models import Libro
 
 class RenovarLibroForm(forms.Form):
     fecha_renovacion = forms.DateField(help_text="Ingresa una fecha entre hoy y 4 semanas (3 predetermindo).")
@@ -19,4 +24,98 @@ class RenovarLibroForm(forms.Form):
             raise ValidationError('Fecha invalida - renovación mayor a 4 semanas')
 
         # Remember to always return the cleaned data.
-        return data
\ No newline at end of file
+        return data
+
+class PrestarCopiaForm(forms.Form):
+    prestatario = forms.ModelChoiceField(queryset=User.objects.all(), to_field_name='username')
+    devolucion = forms.DateField(required=False, help_text="Por omisión, dentro de 3 semanas.")
+
+    def clean_devolucion(self):
+        data = self.cleaned_data['devolucion']
+        if data and data < datetime.date.today():
+            raise ValidationError('Fecha invalida - devolución en el pasado')
+        return data
+
+class CampoCopias(forms.Field):
+    """
+    Lista de ids (UUID) de copias enviada con varios valores del mismo nombre (p. ej. casillas).
+    Se valida solo el formato: no se carga ninguna copia.
+    """
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return [uuid.UUID(str(pk)) for pk in value or []]
+        except ValueError:
+            raise ValidationError('Identificador de copia inválido.')
+
+class RenovarPrestamosForm(RenovarLibroForm):
+    """
+    Renovación de varios préstamos a la vez, con las mismas reglas de fecha que RenovarLibroForm:
+    las copias marcadas en la lista o, si no se marca ninguna, todas las prestadas que vencen
+    hasta ``vencen_hasta``.
+    """
+    copias = CampoCopias(required=False)
+    vencen_hasta = forms.DateField(required=False, help_text="Renovar todos los préstamos que vencen hasta esta fecha.")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('copias') and not cleaned_data.get('vencen_hasta'):
+            raise ValidationError('Marca al menos un préstamo o indica hasta qué fecha vencen.')
+        # Renovar hasta una fecha anterior adelantaría la devolución de los préstamos elegidos
+        fecha = cleaned_data.get('fecha_renovacion')
+        if fecha and cleaned_data.get('vencen_hasta') and cleaned_data['vencen_hasta'] >= fecha:
+            self.add_error('vencen_hasta', 'Debe ser anterior a la fecha de renovación.')
+        return cleaned_data
+
+class AutocompletarMixin:
+    """
+    Selector que solo incluye en el HTML las opciones elegidas; las demás se buscan mientras se
+    escribe en ``/catalogo/api/autocompletar/<tipo>/`` (static/js/autocompletar.js). Evita
+    consultar y enviar todas las filas de la tabla relacionada en cada formulario.
+    """
+
+    def __init__(self, tipo, attrs=None, choices=()):
+        super().__init__(attrs, choices)
+        self.tipo = tipo
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-autocompletar'] = reverse('api-autocompletar', args=[self.tipo])
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        opciones = []
+        if not self.is_required and not self.allow_multiple_selected:
+            opciones.append(self.create_option(name, '', self.choices.field.empty_label or '', False, 0))
+        elegidos = {str(valor) for valor in value if str(valor) not in self.choices.field.empty_values}
+        campo = self.choices.field.to_field_name or 'pk'
+        try:
+            objetos = list(self.choices.queryset.filter(**{'%s__in' % campo: elegidos})) if elegidos else []
+        except (ValueError, ValidationError):
+            # Un valor enviado que no es un id válido: el campo ya muestra su error
+            objetos = []
+        for objeto in objetos:
+            opciones.append(self.create_option(
+                name, getattr(objeto, campo), self.choices.field.label_from_instance(objeto), True, len(opciones),
+            ))
+        return [(None, opciones, 0)]
+
+    class Media:
+        js = ('js/autocompletar.js',)
+
+class SelectAutocompletar(AutocompletarMixin, forms.Select):
+    pass
+
+class SelectMultipleAutocompletar(AutocompletarMixin, forms.SelectMultiple):
+    pass
+
+class LibroForm(forms.ModelForm):
+    class Meta:
+        model = Libro
+        fields = '__all__'
+        widgets = {
+            'autor': SelectAutocompletar('autor'),
+            'idioma': SelectAutocompletar('idioma'),
+            'genero': SelectMultipleAutocompletar('genero'),
+        }
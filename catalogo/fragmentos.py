@@ -0,0 +1,89 @@
+"""
+Contadores de versión para la caché de fragmentos de plantilla.
+
+Cada fragmento en caché (cabecera del libro, bloque de copias, bibliografía del autor) incluye
+en su clave las versiones de los objetos que muestra. Las señales de ``catalogo.signals``
+incrementan esas versiones cuando los objetos cambian, así que un fragmento se invalida en
+cuanto cambia algo de lo que contiene, sin esperar al TTL.
+
+Las señales incrementan con ``incrementar_al_confirmar``: si la versión cambiara antes del
+COMMIT, una petición simultánea podría leer la versión nueva con las filas viejas y guardarlas
+en caché con ella hasta el TTL; y un ROLLBACK invalidaría sin motivo.
+
+Una versión que no está en caché (nunca leída, o desalojada) se inicializa con la hora actual
+en nanosegundos, para no repetir nunca un valor anterior y servir un fragmento viejo.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+PREFIJO = 'catalogo:version:'
+TTL_PREDETERMINADO = 60 * 60 * 24
+
+# Versiones de todo un modelo, para cambios que afectan a muchos fragmentos a la vez.
+GLOBAL = 'todos'
+
+
+def _clave(tipo, pk):
+    return '%s%s:%s' % (PREFIJO, tipo, pk)
+
+
+def ttl_fragmentos():
+    return getattr(settings, 'CATALOGO_FRAGMENTOS_TTL', TTL_PREDETERMINADO)
+
+
+def _leer(claves):
+    """
+    Lee ``{nombre: clave}`` de la caché con un solo get_many, creando las versiones que falten.
+    """
+    en_cache = cache.get_many(claves.values())
+    resultado = {}
+    for nombre, clave in claves.items():
+        if clave not in en_cache:
+            nueva = time.time_ns()
+            cache.add(clave, nueva, timeout=None)
+            en_cache[clave] = cache.get(clave, nueva)
+        resultado[nombre] = en_cache[clave]
+    return resultado
+
+
+def versiones(**objetos):
+    """
+    Devuelve las versiones actuales con una sola lectura de la caché.
+
+    ``versiones(libro=3, copias=3, generos=GLOBAL)`` -> ``{'libro': ..., 'copias': ..., 'generos': ...}``
+    """
+    return _leer({nombre: _clave(nombre, pk) for nombre, pk in objetos.items()})
+
+
+def versiones_de(tipo, pks):
+    """
+    Versiones de ``tipo`` de muchos objetos a la vez: ``{pk: versión}``.
+    """
+    return _leer({pk: _clave(tipo, pk) for pk in pks})
+
+
+def incrementar(tipo, *pks):
+    """
+    Invalida los fragmentos de ``tipo`` para los objetos ``pks``.
+    """
+    for pk in set(pks):
+        if pk is None:
+            continue
+        try:
+            cache.incr(_clave(tipo, pk))
+        except ValueError:
+            # No estaba en caché: la próxima lectura creará una versión nueva.
+            pass
+
+
+def incrementar_al_confirmar(tipo, *pks, using=None):
+    """
+    Como ``incrementar``, cuando se confirme la transacción en curso de ``using`` (en seguida
+    si no hay ninguna). Los ``pks`` se fijan al llamar.
+    """
+    pks = {pk for pk in pks if pk is not None}
+    if pks:
+        transaction.on_commit(lambda: incrementar(tipo, *pks), using=using)
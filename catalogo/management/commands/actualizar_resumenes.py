@@ -0,0 +1,26 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from catalogo import reportes
+from catalogo.resumenes import actualizar_resumenes
+
+
+class Command(BaseCommand):
+    help = (
+        'Agrega los préstamos y devoluciones registrados desde la última ejecución en los resúmenes '
+        'diarios, guarda los vencidos del día y vuelve a dibujar los gráficos de circulación. '
+        'Pensado para ejecutarse cada hora o una vez al día (cron o Heroku Scheduler).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', type=datetime.date.fromisoformat, help='Último día a resumir AAAA-MM-DD (por omisión hoy).')
+        parser.add_argument('--sin-graficos', action='store_true', help='Solo actualiza los resúmenes.')
+
+    def handle(self, *args, **options):
+        desde, filas = actualizar_resumenes(options['fecha'])
+        self.stdout.write('%d filas de resumen actualizadas desde el %s.' % (filas, desde.isoformat()))
+        if not options['sin_graficos']:
+            graficos = reportes.regenerar_graficos(options['fecha'])
+            self.stdout.write('%d gráficos generados.' % graficos)
+        self.stdout.write(self.style.SUCCESS('Resúmenes actualizados.'))
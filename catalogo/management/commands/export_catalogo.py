@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from catalogo.exportacion import exportar, FORMATOS, TAMANO_BLOQUE
+
+
+class Command(BaseCommand):
+    help = 'Exporta el catálogo completo (libros con autor, idioma, géneros y copias por status) en CSV o JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=list(FORMATOS), default='csv')
+        parser.add_argument('--salida', help='Archivo de salida (por omisión la salida estándar).')
+        parser.add_argument('--lote', type=int, default=TAMANO_BLOQUE, help='Libros leídos por bloque.')
+
+    def handle(self, *args, **options):
+        lineas = exportar(options['formato'], options['lote'])
+        if options['salida']:
+            with open(options['salida'], 'w', newline='', encoding='utf-8') as salida:
+                salida.writelines(lineas)
+        else:
+            for linea in lineas:
+                self.stdout.write(linea, ending='')
@@ -0,0 +1,265 @@
+import csv
+import datetime
+import json
+import os
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from catalogo.contadores import recontar_copias
+from catalogo.models import Autor, Genero, Idioma, Libro, PeticionesLibro
+from catalogo.signals import libros_modificados_en_lote
+
+STATUS_VALIDOS = dict(PeticionesLibro.LOAN_STATUS)
+
+
+class ErrorDeFila(Exception):
+    pass
+
+
+def _texto(fila, campo, numero, valor=None):
+    """
+    ``fila[campo]`` (o ``valor``, si se da) sin espacios alrededor; los números del JSONL se pasan
+    a texto y las listas, objetos o booleanos son un error de la fila.
+    """
+    if valor is None:
+        valor = fila.get(campo)
+    if valor is None:
+        return ''
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        valor = str(valor)
+    if not isinstance(valor, str):
+        raise ErrorDeFila('Fila %d: %s debe ser un texto, no %s' % (numero, campo, json.dumps(valor)))
+    return valor.strip()
+
+
+def _error_de_archivo(error):
+    return CommandError('%s. Corrija el archivo y vuelva a ejecutar con --reanudar.' % error)
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa libros o copias desde un archivo CSV o JSONL, en lotes con bulk_create.\n\n'
+        'Libros: titulo, descripcion, isbn, autor_nombre, autor_apellido, idioma, generos '
+        '(en CSV separados por "|"). Los autores, idiomas y géneros que no existen se crean.\n'
+        'Copias: isbn, editorial, status, devolucion (AAAA-MM-DD), prestatario (nombre de usuario), id (UUID, opcional).\n\n'
+        'Cada lote se escribe en una transacción; tras cada lote se guarda un punto de control '
+        'para continuar con --reanudar si la importación se interrumpe.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--tipo', choices=['libros', 'copias'], default='libros')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Por omisión se deduce de la extensión del archivo.')
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por transacción.')
+        parser.add_argument('--reanudar', action='store_true', help='Continúa desde el último punto de control.')
+        parser.add_argument('--checkpoint', help='Archivo del punto de control (por omisión ARCHIVO.checkpoint).')
+
+    def handle(self, *args, **options):
+        archivo = options['archivo']
+        formato = options['formato'] or ('jsonl' if archivo.endswith(('.jsonl', '.ndjson')) else 'csv')
+        self.ruta_checkpoint = options['checkpoint'] or archivo + '.checkpoint'
+        self.tipo = options['tipo']
+        self.lote = options['lote']
+
+        saltar = 0
+        if options['reanudar']:
+            saltar = self.leer_checkpoint()
+            if saltar:
+                self.stdout.write('Reanudando después de %d filas.' % saltar)
+
+        if self.tipo == 'libros':
+            self.cargar_mapas()
+
+        importadas = 0
+        inicio = time.perf_counter()
+        with open(archivo, newline='', encoding='utf-8') as entrada:
+            pendientes = []
+            try:
+                for numero, fila in enumerate(self.leer(entrada, formato), start=1):
+                    if numero <= saltar:
+                        continue
+                    pendientes.append((numero, fila))
+                    if len(pendientes) == self.lote:
+                        importadas += self.escribir_lote(pendientes)
+                        self.informar(importadas, inicio)
+                        pendientes = []
+            except ErrorDeFila as error:
+                # Una línea ilegible: como con una fila inválida, el lote en curso no se escribe
+                # y el punto de control queda en el último lote completo
+                raise _error_de_archivo(error)
+            if pendientes:
+                importadas += self.escribir_lote(pendientes)
+
+        if os.path.exists(self.ruta_checkpoint):
+            os.remove(self.ruta_checkpoint)
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            '%d %s importados en %.1f s (%.0f filas/s).' % (importadas, self.tipo, segundos, importadas / max(segundos, 1e-9))
+        ))
+
+    # Lectura
+
+    def leer(self, entrada, formato):
+        if formato == 'csv':
+            lector = csv.DictReader(entrada)
+            try:
+                yield from lector
+            except csv.Error as error:
+                raise ErrorDeFila('Línea %d: CSV inválido (%s)' % (lector.line_num, error))
+        else:
+            for linea_numero, linea in enumerate(entrada, start=1):
+                if not linea.strip():
+                    continue
+                try:
+                    fila = json.loads(linea)
+                except ValueError as error:
+                    raise ErrorDeFila('Línea %d: JSON inválido (%s)' % (linea_numero, error))
+                if not isinstance(fila, dict):
+                    raise ErrorDeFila('Línea %d: se esperaba un objeto JSON' % linea_numero)
+                yield fila
+
+    def leer_checkpoint(self):
+        try:
+            with open(self.ruta_checkpoint) as archivo:
+                datos = json.load(archivo)
+        except FileNotFoundError:
+            return 0
+        if datos.get('tipo') != self.tipo:
+            raise CommandError('El punto de control %s es de una importación de %s.' % (self.ruta_checkpoint, datos.get('tipo')))
+        return datos['procesadas']
+
+    def guardar_checkpoint(self, procesadas):
+        temporal = self.ruta_checkpoint + '.tmp'
+        with open(temporal, 'w') as archivo:
+            json.dump({'tipo': self.tipo, 'procesadas': procesadas}, archivo)
+        os.replace(temporal, self.ruta_checkpoint)
+
+    def informar(self, importadas, inicio):
+        segundos = time.perf_counter() - inicio
+        self.stdout.write('  %d filas (%.0f filas/s)' % (importadas, importadas / max(segundos, 1e-9)))
+
+    # Escritura
+
+    def escribir_lote(self, filas):
+        try:
+            with transaction.atomic():
+                if self.tipo == 'libros':
+                    libro_ids = self.escribir_libros(filas)
+                else:
+                    libro_ids = self.escribir_copias(filas)
+                libros_modificados_en_lote.send(
+                    sender=Libro if self.tipo == 'libros' else PeticionesLibro,
+                    libro_ids=libro_ids, solo_copias=self.tipo == 'copias', using=DEFAULT_DB_ALIAS,
+                )
+            self.guardar_checkpoint(filas[-1][0])
+        except ErrorDeFila as error:
+            raise _error_de_archivo(error)
+        return len(filas)
+
+    def cargar_mapas(self):
+        self.autores = {(nombre, apellido): pk for pk, nombre, apellido in Autor.objects.values_list('pk', 'nombre', 'apellido')}
+        self.idiomas = {nombre: pk for pk, nombre in Idioma.objects.values_list('pk', 'nombre')}
+        self.generos = {nombre: pk for pk, nombre in Genero.objects.values_list('pk', 'nombre')}
+
+    def _resolver(self, mapa, modelo, claves, construir):
+        """
+        Crea con un solo bulk_create las claves que faltan en ``mapa`` y las agrega con su pk.
+        """
+        faltantes = [clave for clave in dict.fromkeys(claves) if clave not in mapa]
+        if faltantes:
+            creados = modelo.objects.bulk_create([construir(clave) for clave in faltantes])
+            for clave, objeto in zip(faltantes, creados):
+                mapa[clave] = objeto.pk
+
+    def escribir_libros(self, filas):
+        registros = []
+        for numero, fila in filas:
+            titulo = _texto(fila, 'titulo', numero)
+            if not titulo:
+                raise ErrorDeFila('Fila %d: falta el título' % numero)
+            generos = fila.get('generos') or []
+            if isinstance(generos, str):
+                generos = generos.split('|')
+            elif not isinstance(generos, list):
+                raise ErrorDeFila('Fila %d: generos debe ser una lista, no %s' % (numero, json.dumps(generos)))
+            generos = [_texto(fila, 'generos', numero, genero) for genero in generos]
+            autor = (_texto(fila, 'autor_nombre', numero), _texto(fila, 'autor_apellido', numero))
+            registros.append({
+                'titulo': titulo,
+                'descripcion': _texto(fila, 'descripcion', numero),
+                'isbn': _texto(fila, 'isbn', numero),
+                'autor': autor if any(autor) else None,
+                'idioma': _texto(fila, 'idioma', numero) or None,
+                'generos': [genero for genero in generos if genero],
+            })
+
+        self._resolver(self.autores, Autor, [r['autor'] for r in registros if r['autor']],
+                       lambda clave: Autor(nombre=clave[0], apellido=clave[1]))
+        self._resolver(self.idiomas, Idioma, [r['idioma'] for r in registros if r['idioma']],
+                       lambda nombre: Idioma(nombre=nombre))
+        self._resolver(self.generos, Genero, [g for r in registros for g in r['generos']],
+                       lambda nombre: Genero(nombre=nombre))
+
+        libros = Libro.objects.bulk_create([
+            Libro(
+                titulo=r['titulo'],
+                descripcion=r['descripcion'],
+                isbn=r['isbn'],
+                autor_id=self.autores.get(r['autor']),
+                idioma_id=self.idiomas.get(r['idioma']),
+            )
+            for r in registros
+        ])
+        Generos = Libro.genero.through
+        Generos.objects.bulk_create([
+            Generos(libro_id=libro.pk, genero_id=self.generos[nombre])
+            for libro, registro in zip(libros, registros)
+            for nombre in dict.fromkeys(registro['generos'])
+        ])
+        return [libro.pk for libro in libros]
+
+    def escribir_copias(self, filas):
+        textos = [
+            (numero, {campo: _texto(fila, campo, numero) for campo in ('isbn', 'editorial', 'status', 'devolucion', 'prestatario', 'id')})
+            for numero, fila in filas
+        ]
+        isbns = {texto['isbn'] for _, texto in textos}
+        usuarios = {texto['prestatario'] for _, texto in textos} - {''}
+        libros = dict(Libro.objects.filter(isbn__in=isbns).values_list('isbn', 'pk'))
+        prestatarios = dict(User.objects.filter(username__in=usuarios).values_list('username', 'pk'))
+
+        copias = []
+        for numero, texto in textos:
+            isbn = texto['isbn']
+            if isbn not in libros:
+                raise ErrorDeFila('Fila %d: no existe un libro con ISBN %r' % (numero, isbn))
+            status = texto['status'] or 'm'
+            if status not in STATUS_VALIDOS:
+                raise ErrorDeFila('Fila %d: status inválido %r' % (numero, status))
+            prestatario = texto['prestatario']
+            if prestatario and prestatario not in prestatarios:
+                raise ErrorDeFila('Fila %d: no existe el usuario %r' % (numero, prestatario))
+            try:
+                devolucion = datetime.date.fromisoformat(texto['devolucion']) if texto['devolucion'] else None
+                pk = uuid.UUID(texto['id']) if texto['id'] else uuid.uuid4()
+            except ValueError as error:
+                raise ErrorDeFila('Fila %d: %s' % (numero, error))
+            copias.append(PeticionesLibro(
+                id=pk,
+                libro_id=libros[isbn],
+                editorial=texto['editorial'],
+                status=status,
+                devolucion=devolucion,
+                prestatario_id=prestatarios.get(prestatario),
+            ))
+
+        PeticionesLibro.objects.bulk_create(copias)
+        libro_ids = list({copia.libro_id for copia in copias})
+        # bulk_create no dispara post_save: los contadores de los libros se recalculan aquí
+        recontar_copias(libro_ids)
+        return libro_ids
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogo.arranque import costo_paquete, costo_total, modulos_pesados, perfil_importacion
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide en un proceso nuevo la importación de módulos durante django.setup() '
+        '(python -X importtime) y muestra los más lentos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=20, help='Módulos a mostrar.')
+        parser.add_argument('--propio', action='store_true', help='Ordenar por tiempo propio en lugar de acumulado.')
+        parser.add_argument('--paquete', help='Mostrar solo los módulos de este paquete (p. ej. catalogo).')
+
+    def handle(self, *args, **options):
+        try:
+            importaciones = perfil_importacion()
+        except RuntimeError as error:
+            raise CommandError(error)
+
+        filas = importaciones
+        if options['paquete']:
+            paquete = options['paquete']
+            filas = [i for i in filas if i.modulo == paquete or i.modulo.startswith(paquete + '.')]
+        clave = (lambda i: i.propio_us) if options['propio'] else (lambda i: i.acumulado_us)
+        filas = sorted(filas, key=clave, reverse=True)[:options['limite']]
+
+        self.stdout.write('%12s %12s  %s' % ('propio ms', 'acumulado ms', 'módulo'))
+        for importacion in filas:
+            self.stdout.write('%12.1f %12.1f  %s' % (importacion.propio_us / 1000, importacion.acumulado_us / 1000, importacion.modulo))
+
+        self.stdout.write('\n%d módulos, %.1f ms en total; catalogo: %.1f ms.' % (
+            len(importaciones), costo_total(importaciones) / 1000, costo_paquete(importaciones, 'catalogo') / 1000,
+        ))
+        pesados = modulos_pesados(importaciones)
+        if pesados:
+            self.stdout.write(self.style.WARNING('Se importan al arrancar: %s.' % ', '.join(pesados)))
@@ -0,0 +1,69 @@
+import datetime
+
+from django.conf import settings
+from django.core import mail
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from catalogo import prestamos
+from catalogo.models import Reserva
+
+
+class Command(BaseCommand):
+    help = (
+        'Vence las copias apartadas que no se recogieron y avisa por correo a los usuarios '
+        'cuya reserva ya tiene una copia esperándolos. Pensado para ejecutarse cada pocos minutos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Correos enviados por conexión al servidor de correo.')
+        parser.add_argument('--simular', action='store_true', help='Solo informa cuántos avisos se enviarían.')
+
+    def handle(self, *args, **options):
+        vencidas = 0 if options['simular'] else prestamos.vencer_reservas()
+
+        enviados = sin_correo = 0
+        while True:
+            # Las reservas por avisar se leen del índice parcial reserva_por_notificar
+            lote = list(
+                Reserva.objects.filter(estado='a', notificada__isnull=True)
+                .order_by('id')
+                .values('id', 'usuario__username', 'usuario__email', 'libro__titulo', 'copia__devolucion')[:options['lote']]
+            )
+            if not lote:
+                break
+            mensajes = []
+            for fila in lote:
+                if fila['usuario__email']:
+                    mensajes.append(self.mensaje(fila))
+                else:
+                    sin_correo += 1
+            enviados += self.enviar(mensajes, options['simular'])
+            if options['simular']:
+                break
+            # Las reservas sin correo también se marcan, para no revisarlas en cada ejecución
+            Reserva.objects.filter(pk__in=[fila['id'] for fila in lote]).update(notificada=timezone.now())
+
+        self.stdout.write(self.style.SUCCESS(
+            '%d reservas vencidas; %d avisos %s; %d usuarios sin correo.'
+            % (vencidas, enviados, 'por enviar' if options['simular'] else 'enviados', sin_correo)
+        ))
+
+    def mensaje(self, fila):
+        limite = fila['copia__devolucion'] or datetime.date.today() + prestamos.PLAZO_RECOGIDA
+        cuerpo = 'Hola %s,\n\nTu reserva de "%s" ya tiene una copia esperándote. Puedes recogerla hasta el %s.\n\nBiblioteca Local' % (
+            fila['usuario__username'], fila['libro__titulo'], limite,
+        )
+        return mail.EmailMessage(
+            subject='Tu reserva de %s está lista' % fila['libro__titulo'],
+            body=cuerpo,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[fila['usuario__email']],
+        )
+
+    def enviar(self, mensajes, simular):
+        if not mensajes or simular:
+            return len(mensajes)
+        # Una sola conexión por lote en lugar de una por correo
+        with mail.get_connection() as conexion:
+            return conexion.send_messages(mensajes) or 0
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalogo import recomendaciones
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula desde el historial de préstamos la popularidad de cada libro y sus listas de '
+        '"quienes pidieron este libro también pidieron". Pensado para ejecutarse una vez al día.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vecinos', type=int, default=recomendaciones.VECINOS, help='Libros recomendados por libro.')
+        parser.add_argument('--sin-numpy', action='store_true', help='Calcula en Python aunque NumPy esté instalado.')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        modificados = recomendaciones.recalcular(options['vecinos'], usar_numpy=False if options['sin_numpy'] else None)
+        self.stdout.write(self.style.SUCCESS(
+            '%d libros actualizados en %.1f s.' % (len(modificados), time.monotonic() - inicio)
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from catalogo.contadores import recontar_copias, TAMANO_LOTE
+from catalogo.models import PeticionesLibro
+from catalogo.signals import libros_modificados_en_lote
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula desde las copias los contadores de cada libro (total, disponibles, prestadas, '
+        'reservadas, en mantenimiento) y corrige los que no coinciden.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--libro', type=int, action='append', dest='libros', help='Recontar solo este libro (repetible).')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Libros revisados por transacción.')
+
+    def handle(self, *args, **options):
+        corregidos = recontar_copias(options['libros'], lote=options['lote'])
+        if corregidos:
+            # Las páginas y fragmentos de esos libros muestran los contadores
+            libros_modificados_en_lote.send(
+                sender=PeticionesLibro, libro_ids=corregidos, solo_copias=True, using=DEFAULT_DB_ALIAS,
+            )
+        self.stdout.write(self.style.SUCCESS('%d libros corregidos.' % len(corregidos)))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalogo.busqueda import obtener_backend, TAMANO_LOTE
+from catalogo.models import Libro
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de texto completo de los libros.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Libros indexados por transacción.')
+
+    def handle(self, *args, **options):
+        backend = obtener_backend()
+        backend.crear()
+        backend.vaciar()
+
+        total = 0
+        lote = []
+        for pk in Libro.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=options['lote']):
+            lote.append(pk)
+            if len(lote) == options['lote']:
+                total += self._indexar(backend, lote)
+                lote = []
+        total += self._indexar(backend, lote)
+
+        self.stdout.write(self.style.SUCCESS('%d libros indexados.' % total))
+
+    def _indexar(self, backend, ids):
+        with transaction.atomic():
+            backend.indexar(ids)
+        return len(ids)
@@ -0,0 +1,72 @@
+import datetime
+from itertools import groupby
+
+from django.conf import settings
+from django.core import mail
+from django.core.management.base import BaseCommand
+
+from catalogo.models import PeticionesLibro
+
+
+class Command(BaseCommand):
+    help = (
+        'Envía a cada prestatario un resumen de sus préstamos vencidos. '
+        'Pensado para ejecutarse una vez al día (cron o Heroku Scheduler).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Correos enviados por conexión al servidor de correo.')
+        parser.add_argument('--fecha', type=datetime.date.fromisoformat, help='Fecha de referencia AAAA-MM-DD (por omisión hoy).')
+        parser.add_argument('--simular', action='store_true', help='Solo informa cuántos correos se enviarían.')
+
+    def handle(self, *args, **options):
+        fecha = options['fecha'] or datetime.date.today()
+        vencidos = (
+            PeticionesLibro.objects.overdue(fecha)
+            .filter(prestatario__isnull=False)
+            .order_by('prestatario_id', 'devolucion', 'id')
+            .values('prestatario_id', 'prestatario__username', 'prestatario__email', 'libro__titulo', 'devolucion')
+            .iterator(chunk_size=options['lote'])
+        )
+
+        enviados = prestamos = sin_correo = 0
+        pendientes = []
+        for _, filas in groupby(vencidos, key=lambda fila: fila['prestatario_id']):
+            filas = list(filas)
+            prestamos += len(filas)
+            if not filas[0]['prestatario__email']:
+                sin_correo += 1
+                continue
+            pendientes.append(self.mensaje(filas, fecha))
+            if len(pendientes) == options['lote']:
+                enviados += self.enviar(pendientes, options['simular'])
+                pendientes = []
+        enviados += self.enviar(pendientes, options['simular'])
+
+        self.stdout.write(self.style.SUCCESS(
+            '%d préstamos vencidos; %d resúmenes %s; %d prestatarios sin correo.'
+            % (prestamos, enviados, 'por enviar' if options['simular'] else 'enviados', sin_correo)
+        ))
+
+    def mensaje(self, filas, fecha):
+        lineas = [
+            '- %s (debió devolverse el %s, %d días de retraso)'
+            % (fila['libro__titulo'], fila['devolucion'], (fecha - fila['devolucion']).days)
+            for fila in filas
+        ]
+        cuerpo = 'Hola %s,\n\nTienes %d libro%s con la fecha de devolución vencida:\n\n%s\n\nBiblioteca Local' % (
+            filas[0]['prestatario__username'], len(filas), 's' if len(filas) != 1 else '', '\n'.join(lineas),
+        )
+        return mail.EmailMessage(
+            subject='Préstamos vencidos al %s' % fecha,
+            body=cuerpo,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[filas[0]['prestatario__email']],
+        )
+
+    def enviar(self, mensajes, simular):
+        if not mensajes or simular:
+            return len(mensajes)
+        # Una sola conexión por lote en lugar de una por correo
+        with mail.get_connection() as conexion:
+            return conexion.send_messages(mensajes) or 0
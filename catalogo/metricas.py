@@ -0,0 +1,99 @@
+"""
+Métricas de rendimiento por vista, agregadas en memoria.
+
+Cada proceso (worker de gunicorn) acumula sus propios histogramas; el endpoint
+``/catalogo/metricas/`` muestra los del worker que atiende la petición.
+"""
+import math
+import threading
+
+# Histograma con cubetas logarítmicas: cada cubeta es 2^(1/4) (~19%) más ancha que la anterior,
+# así que los percentiles tienen un error relativo menor al 19% con memoria fija.
+CUBETAS_POR_DUPLICACION = 4
+NUM_CUBETAS = 128
+MINIMO = 0.01
+
+METRICAS = ('total_ms', 'db_ms', 'consultas', 'plantilla_ms', 'bytes')
+
+
+class Histograma:
+    def __init__(self):
+        self.cubetas = [0] * NUM_CUBETAS
+        self.cantidad = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    @staticmethod
+    def _cubeta(valor):
+        if valor <= MINIMO:
+            return 0
+        return min(NUM_CUBETAS - 1, 1 + int(math.log2(valor / MINIMO) * CUBETAS_POR_DUPLICACION))
+
+    @staticmethod
+    def _limite(cubeta):
+        # Límite superior de la cubeta
+        return MINIMO * 2 ** (cubeta / CUBETAS_POR_DUPLICACION)
+
+    def agregar(self, valor):
+        self.cubetas[self._cubeta(valor)] += 1
+        self.cantidad += 1
+        self.suma += valor
+        self.maximo = max(self.maximo, valor)
+
+    def percentil(self, p):
+        if not self.cantidad:
+            return None
+        objetivo = math.ceil(self.cantidad * p / 100)
+        acumulado = 0
+        for cubeta, cuenta in enumerate(self.cubetas):
+            acumulado += cuenta
+            if acumulado >= objetivo:
+                return min(self._limite(cubeta), self.maximo)
+        return self.maximo
+
+    def resumen(self):
+        return {
+            'n': self.cantidad,
+            'media': round(self.suma / self.cantidad, 3) if self.cantidad else None,
+            'p50': _redondear(self.percentil(50)),
+            'p95': _redondear(self.percentil(95)),
+            'p99': _redondear(self.percentil(99)),
+            'max': round(self.maximo, 3),
+        }
+
+
+def _redondear(valor):
+    return None if valor is None else round(valor, 3)
+
+
+class RegistroMetricas:
+    """
+    Histogramas por nombre de URL y métrica.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vistas = {}
+
+    def registrar(self, vista, **valores):
+        with self._lock:
+            histogramas = self._vistas.get(vista)
+            if histogramas is None:
+                histogramas = self._vistas[vista] = {metrica: Histograma() for metrica in METRICAS}
+            for metrica, valor in valores.items():
+                if valor is not None:
+                    histogramas[metrica].agregar(valor)
+
+    def resumen(self):
+        with self._lock:
+            return {
+                vista: {metrica: histograma.resumen() for metrica, histograma in histogramas.items()}
+                for vista, histogramas in sorted(self._vistas.items())
+            }
+
+    def reiniciar(self):
+        with self._lock:
+            self._vistas.clear()
+
+
+registro = RegistroMetricas()
@@ -0,0 +1,124 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from .metricas import registro
+
+
+class _MedidorConsultas:
+    """
+    execute_wrapper que cuenta las consultas y suma su duración.
+    """
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.segundos += time.perf_counter() - inicio
+
+
+def _instalar_medidor(medidor):
+    # La conexión se resuelve en el hilo que llama: debe ser el de las consultas de la petición
+    envoltura = connection.execute_wrapper(medidor)
+    envoltura.__enter__()
+    return envoltura
+
+
+class MetricasRendimientoMiddleware:
+    """
+    Mide una fracción de las peticiones (``CATALOGO_METRICAS_MUESTREO``, entre 0 y 1): tiempo total,
+    número y tiempo de consultas, tiempo de renderizado de la plantilla y tamaño de la respuesta.
+
+    Las medidas se agregan por nombre de URL en ``catalogo.metricas.registro`` y se envían al
+    navegador en la cabecera ``Server-Timing``. Con muestreo 0 el middleware se desactiva al
+    arrancar y no agrega ningún costo.
+
+    Admite peticiones síncronas y asíncronas: con ASGI no obliga a Django a pasar las vistas
+    asíncronas por ``sync_to_async``. En ese caso el medidor de consultas se instala en el hilo
+    donde ``sync_to_async`` ejecuta el ORM durante la petición.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.muestreo = float(getattr(settings, 'CATALOGO_METRICAS_MUESTREO', 0))
+        if self.muestreo <= 0:
+            raise MiddlewareNotUsed
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _medir(self):
+        return self.muestreo >= 1 or random.random() < self.muestreo
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._medir():
+            return self.get_response(request)
+
+        medidor = _MedidorConsultas()
+        request._metricas_plantilla = None
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(medidor):
+            response = self.get_response(request)
+        return self._registrar(request, response, time.perf_counter() - inicio, medidor)
+
+    async def __acall__(self, request):
+        if not self._medir():
+            return await self.get_response(request)
+
+        medidor = _MedidorConsultas()
+        request._metricas_plantilla = None
+        envoltura = await sync_to_async(_instalar_medidor)(medidor)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            total = time.perf_counter() - inicio
+            await sync_to_async(envoltura.__exit__)(None, None, None)
+        return self._registrar(request, response, total, medidor)
+
+    def _registrar(self, request, response, total, medidor):
+        plantilla = request._metricas_plantilla
+        tamano = None if response.streaming else len(response.content)
+        vista = request.resolver_match.view_name if request.resolver_match else '(sin ruta)'
+        registro.registrar(
+            vista,
+            total_ms=total * 1000,
+            db_ms=medidor.segundos * 1000,
+            consultas=medidor.consultas,
+            plantilla_ms=None if plantilla is None else plantilla * 1000,
+            bytes=tamano,
+        )
+
+        tiempos = [
+            'total;dur=%.2f' % (total * 1000),
+            'db;dur=%.2f;desc="%d consultas"' % (medidor.segundos * 1000, medidor.consultas),
+        ]
+        if plantilla is not None:
+            tiempos.append('plantilla;dur=%.2f' % (plantilla * 1000))
+        response['Server-Timing'] = ', '.join(tiempos)
+        return response
+
+    def process_template_response(self, request, response):
+        # Se ejecuta justo antes de renderizar un TemplateResponse (este middleware va primero en
+        # MIDDLEWARE, así que su process_template_response es el último).
+        if hasattr(request, '_metricas_plantilla'):
+            inicio = time.perf_counter()
+
+            def medir_plantilla(response):
+                request._metricas_plantilla = time.perf_counter() - inicio
+
+            response.add_post_render_callback(medir_plantilla)
+        return response
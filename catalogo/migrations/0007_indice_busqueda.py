@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def crear_indice(apps, schema_editor):
+    from catalogo.busqueda import obtener_backend
+
+    backend = obtener_backend(connection=schema_editor.connection)
+    backend.crear()
+    Libro = apps.get_model('catalogo', 'Libro')
+    backend.indexar(Libro.objects.values_list('pk', flat=True), modelo_libro=Libro)
+
+
+def eliminar_indice(apps, schema_editor):
+    from catalogo.busqueda import obtener_backend
+
+    obtener_backend(connection=schema_editor.connection).eliminar()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0006_alter_peticioneslibro_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
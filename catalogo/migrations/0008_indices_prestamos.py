@@ -0,0 +1,34 @@
+# Generated by Django 4.2.16 on 2026-10-18 14:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0007_indice_busqueda'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='libro',
+            name='isbn',
+            field=models.CharField(db_index=True, help_text='13 Caracteres <a href="https://www.isbn-international.org/content/what-isbn">ISBN number</a>', max_length=13, verbose_name='ISBN'),
+        ),
+        migrations.AddIndex(
+            model_name='autor',
+            index=models.Index(fields=['apellido', 'nombre', 'id'], name='autor_apellido_nombre'),
+        ),
+        migrations.AddIndex(
+            model_name='peticioneslibro',
+            index=models.Index(fields=['status', 'devolucion'], name='peticion_status_devolucion'),
+        ),
+        migrations.AddIndex(
+            model_name='peticioneslibro',
+            index=models.Index(fields=['prestatario', 'status', 'devolucion', 'id'], name='peticion_prestatario_status'),
+        ),
+        migrations.AddIndex(
+            model_name='peticioneslibro',
+            index=models.Index(condition=models.Q(('status', 'p')), fields=['devolucion', 'id'], name='prestamo_devolucion'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalogo', '0008_indices_prestamos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('e', 'En espera'), ('a', 'Asignada'), ('c', 'Cancelada'), ('t', 'Completada')], default='e', max_length=1)),
+                ('creada', models.DateTimeField(auto_now_add=True)),
+                ('asignada', models.DateTimeField(blank=True, null=True)),
+                ('notificada', models.DateTimeField(blank=True, null=True)),
+                ('copia', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalogo.peticioneslibro')),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='catalogo.libro')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('estado', 'e')), fields=['libro', 'id'], name='reserva_cola'), models.Index(condition=models.Q(('estado', 'a'), ('notificada__isnull', True)), fields=['id'], name='reserva_por_notificar')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reserva',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['e', 'a'])), fields=('libro', 'usuario'), name='reserva_activa_unica'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# Contador de cada status de PeticionesLibro (ver catalogo.contadores)
+CONTADOR_POR_STATUS = {
+    'd': 'copias_disponibles',
+    'p': 'copias_prestadas',
+    'r': 'copias_reservadas',
+    'm': 'copias_mantenimiento',
+}
+
+
+def contar_copias(apps, schema_editor):
+    Libro = apps.get_model('catalogo', 'Libro')
+    PeticionesLibro = apps.get_model('catalogo', 'PeticionesLibro')
+    db = schema_editor.connection.alias
+
+    def conteo(**filtro):
+        copias = (
+            PeticionesLibro.objects.using(db).filter(libro=OuterRef('pk'), **filtro).order_by()
+            .values('libro').annotate(total=Count('pk')).values('total')
+        )
+        return Coalesce(Subquery(copias), 0)
+
+    # Un solo UPDATE con una subconsulta correlacionada por contador
+    valores = {campo: conteo(status=status) for status, campo in CONTADOR_POR_STATUS.items()}
+    Libro.objects.using(db).update(copias_total=conteo(), **valores)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0010_modificado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='copias_total',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='copias_disponibles',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='copias_prestadas',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='copias_reservadas',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='copias_mantenimiento',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(contar_copias, migrations.RunPython.noop),
+    ]
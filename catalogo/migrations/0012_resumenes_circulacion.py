@@ -0,0 +1,51 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0011_contadores_copias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoPrestamo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(db_index=True, default=django.utils.timezone.localdate)),
+                ('momento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tipo', models.CharField(choices=[('p', 'Préstamo'), ('d', 'Devolución')], max_length=1)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('dimension', models.CharField(choices=[('t', 'Total'), ('g', 'Género'), ('i', 'Idioma'), ('a', 'Autor')], max_length=1)),
+                ('clave', models.IntegerField(default=0)),
+                ('prestamos', models.IntegerField(default=0)),
+                ('devoluciones', models.IntegerField(default=0)),
+                ('vencidos', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['fecha'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiario',
+            constraint=models.UniqueConstraint(fields=('dimension', 'clave', 'fecha'), name='resumen_diario_unico'),
+        ),
+        migrations.AddField(
+            model_name='movimientoprestamo',
+            name='copia',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalogo.peticioneslibro'),
+        ),
+        migrations.AddField(
+            model_name='movimientoprestamo',
+            name='libro',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalogo.libro'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalogo', '0012_resumenes_circulacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recomendacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicion', models.PositiveSmallIntegerField()),
+                ('lectores', models.IntegerField()),
+                ('puntaje', models.FloatField()),
+            ],
+            options={
+                'ordering': ['libro', 'posicion'],
+            },
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='popularidad',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movimientoprestamo',
+            name='prestatario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['-popularidad', 'id'], name='libro_popularidad'),
+        ),
+        migrations.AddField(
+            model_name='recomendacion',
+            name='libro',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recomendaciones', to='catalogo.libro'),
+        ),
+        migrations.AddField(
+            model_name='recomendacion',
+            name='recomendado',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalogo.libro'),
+        ),
+        migrations.AddConstraint(
+            model_name='recomendacion',
+            constraint=models.UniqueConstraint(fields=('libro', 'posicion'), name='recomendacion_posicion_unica'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0013_recomendaciones'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='autor',
+            name='fecha_de_deceso',
+            field=models.DateField(blank=True, null=True, verbose_name='murió'),
+        ),
+    ]
@@ -1,6 +1,6 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.utils import timezone
 from django.contrib.auth.models import User
-import matplotlib matplotlib.use('Agg')
 
 class Genero(models.Model):
     """
@@ -29,7 +29,7 @@ class Libro(models.Model):
 
     descripcion = models.TextField(max_length=1000, help_text="Ingrese una breve descripción del libro")
 
-    isbn = models.CharField('ISBN',max_length=13, help_text='13 Caracteres <a href="https://www.isbn-international.org/content/what-isbn">ISBN number</a>')
+    isbn = models.CharField('ISBN',max_length=13, db_index=True, help_text='13 Caracteres <a href="https://www.isbn-international.org/content/what-isbn">ISBN number</a>')
 
     genero = models.ManyToManyField(Genero, help_text="Seleccione un genero para este libro")
     # ManyToManyField, porque un género puede contener muchos libros y un libro puede cubrir varios géneros.
@@ -37,6 +37,48 @@ class Libro(models.Model):
 
     idioma = models.ForeignKey('Idioma', on_delete=models.SET_NULL, null=True)
 
+    # Última modificación del libro, sus géneros o sus copias (para Last-Modified y GET condicional)
+    modificado = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Copias del libro en total y por status. Las mantiene catalogo.contadores con UPDATE ... SET
+    # campo = campo + 1, en la misma transacción que el cambio de la copia.
+    copias_total = models.IntegerField(default=0, editable=False)
+    copias_disponibles = models.IntegerField(default=0, editable=False)
+    copias_prestadas = models.IntegerField(default=0, editable=False)
+    copias_reservadas = models.IntegerField(default=0, editable=False)
+    copias_mantenimiento = models.IntegerField(default=0, editable=False)
+
+    CONTADORES_COPIAS = ('copias_total', 'copias_disponibles', 'copias_prestadas', 'copias_reservadas', 'copias_mantenimiento')
+
+    # Lectores distintos que pidieron el libro; lo recalcula manage.py recalcular_recomendaciones
+    popularidad = models.IntegerField(default=0, editable=False)
+
+    CAMPOS_CALCULADOS = CONTADORES_COPIAS + ('popularidad',)
+
+    class Meta:
+        indexes = [
+            # Lista de libros populares, en el orden de su paginación por cursor
+            models.Index(fields=['-popularidad', 'id'], name='libro_popularidad'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Recuerda los valores leídos para que las señales puedan detectar cambios al guardar.
+        instancia._valores_db = dict(zip(field_names, values))
+        return instancia
+
+    def save(self, *args, update_fields=None, **kwargs):
+        # Al modificar un libro no se escriben los contadores leídos antes: pisarían los préstamos
+        # y devoluciones registrados mientras tanto (ni la popularidad, que escribe un proceso por lotes).
+        if update_fields is None and not self._state.adding:
+            diferidos = self.get_deferred_fields()
+            update_fields = [
+                campo.attname for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_CALCULADOS and campo.attname not in diferidos
+            ]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
     def mostrar_genero(self):
         """
         Crea una cadena para el Genero. Esto es requerido para mostrar el Genero en Admin.
@@ -58,7 +100,28 @@ class Libro(models.Model):
         return reverse('libro_detail', args=[str(self.id)])
 
 import uuid # Requerida para las instancias de libros únicos
-from datetime import date
+from datetime import date, timedelta
+
+class PeticionesLibroQuerySet(models.QuerySet):
+    """
+    Filtros de préstamos evaluados en la base de datos.
+    """
+
+    def prestados(self):
+        return self.filter(status__exact='p')
+
+    def overdue(self, fecha=None):
+        """
+        Préstamos cuya fecha de devolución ya pasó (el equivalente en SQL de ``es_retraso``).
+        """
+        return self.prestados().filter(devolucion__lt=fecha or date.today())
+
+    def due_within(self, dias, fecha=None):
+        """
+        Préstamos que vencen entre hoy y dentro de ``dias`` días (inclusive).
+        """
+        hoy = fecha or date.today()
+        return self.prestados().filter(devolucion__gte=hoy, devolucion__lte=hoy + timedelta(days=dias))
 
 class PeticionesLibro(models.Model):
     """
@@ -80,6 +143,22 @@ class PeticionesLibro(models.Model):
 
     prestatario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
 
+    modificado = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = PeticionesLibroQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Recuerda los valores leídos para que las señales puedan detectar cambios de status.
+        instancia._valores_db = dict(zip(field_names, values))
+        return instancia
+
+    def save(self, *args, **kwargs):
+        # Los contadores del libro se ajustan en post_save: la copia y el ajuste se confirman juntos
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+
     @property
     def es_retraso(self):
         if self.devolucion and date.today() > self.devolucion:
@@ -89,6 +168,12 @@ class PeticionesLibro(models.Model):
     class Meta:
         ordering = ["devolucion"]
         permissions = (("can_mark_returned", "Establece libro como regresado"),)
+        indexes = [
+            models.Index(fields=['status', 'devolucion'], name='peticion_status_devolucion'),
+            models.Index(fields=['prestatario', 'status', 'devolucion', 'id'], name='peticion_prestatario_status'),
+            # Listas de préstamos: solo las copias prestadas, en el orden de la paginación por cursor
+            models.Index(fields=['devolucion', 'id'], name='prestamo_devolucion', condition=models.Q(status='p')),
+        ]
 
 
     def __str__(self):
@@ -97,6 +182,42 @@ class PeticionesLibro(models.Model):
         """
         return '%s (%s)' % (self.id,self.libro.titulo)
 
+class Reserva(models.Model):
+    """
+    Modelo que representa la reserva de un libro por un usuario, en una cola por libro.
+
+    La cola se atiende por orden de llegada (``id`` creciente). El índice parcial sobre
+    ``(libro, id)`` de las reservas en espera permite encontrar la siguiente sin recorrer la cola.
+    """
+    ESTADOS = (
+        ('e', 'En espera'),
+        ('a', 'Asignada'),
+        ('c', 'Cancelada'),
+        ('t', 'Completada'),
+    )
+
+    libro = models.ForeignKey('Libro', on_delete=models.CASCADE, related_name='reservas')
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservas')
+    estado = models.CharField(max_length=1, choices=ESTADOS, default='e')
+    creada = models.DateTimeField(auto_now_add=True)
+    # Copia apartada para el usuario cuando le llega el turno, y cuándo se le avisó
+    copia = models.ForeignKey(PeticionesLibro, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    asignada = models.DateTimeField(null=True, blank=True)
+    notificada = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['libro', 'id'], name='reserva_cola', condition=models.Q(estado='e')),
+            models.Index(fields=['id'], name='reserva_por_notificar', condition=models.Q(estado='a', notificada__isnull=True)),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['libro', 'usuario'], condition=models.Q(estado__in=['e', 'a']), name='reserva_activa_unica'),
+        ]
+
+    def __str__(self):
+        return '%s: %s (%s)' % (self.usuario, self.libro, self.get_estado_display())
+
 class Autor(models.Model):
     """
     Modelo que representa un autor
@@ -105,9 +226,13 @@ class Autor(models.Model):
     apellido = models.CharField(max_length=100)
     fecha_de_nacimiento = models.DateField(null=True, blank=True)
     fecha_de_deceso = models.DateField('murió', null=True, blank=True)
+    modificado = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['apellido', 'nombre']
+        indexes = [
+            models.Index(fields=['apellido', 'nombre', 'id'], name='autor_apellido_nombre'),
+        ]
 
     def get_absolute_url(self):
         """
@@ -132,4 +257,79 @@ class Idioma(models.Model):
         """
         Cadena que representa a la instancia particular del modelo (p. ej. en el sitio de Administración)
         """
-        return self.nombre
\ No newline at end of file
+        return self.nombre
+
+
+class MovimientoPrestamo(models.Model):
+    """
+    Registro de cada préstamo y devolución de una copia, solo de inserción. Lo escribe
+    catalogo.resumenes en la misma transacción que el cambio de status; ``manage.py
+    actualizar_resumenes`` lo agrega por día en ResumenDiario.
+    """
+    TIPOS = (
+        ('p', 'Préstamo'),
+        ('d', 'Devolución'),
+    )
+
+    fecha = models.DateField(default=timezone.localdate, db_index=True)
+    momento = models.DateTimeField(default=timezone.now)
+    tipo = models.CharField(max_length=1, choices=TIPOS)
+    # Los movimientos sobreviven a la copia y al libro: el historial no se reescribe
+    copia = models.ForeignKey(PeticionesLibro, on_delete=models.SET_NULL, null=True, related_name='+')
+    libro = models.ForeignKey(Libro, on_delete=models.SET_NULL, null=True, related_name='+')
+    # En los préstamos, quién se llevó la copia (para las recomendaciones, catalogo.recomendaciones)
+    prestatario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    def __str__(self):
+        return '%s: %s (%s)' % (self.fecha, self.get_tipo_display(), self.copia_id)
+
+class ResumenDiario(models.Model):
+    """
+    Préstamos, devoluciones y préstamos vencidos de un día, en total (``clave`` 0) o de un
+    género, idioma o autor (``clave`` es su id). Los reportes leen estas filas, no las copias.
+    """
+    DIMENSIONES = (
+        ('t', 'Total'),
+        ('g', 'Género'),
+        ('i', 'Idioma'),
+        ('a', 'Autor'),
+    )
+
+    fecha = models.DateField()
+    dimension = models.CharField(max_length=1, choices=DIMENSIONES)
+    clave = models.IntegerField(default=0)
+    prestamos = models.IntegerField(default=0)
+    devoluciones = models.IntegerField(default=0)
+    # Préstamos vencidos al actualizar los resúmenes ese día (una foto, no se reconstruye)
+    vencidos = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'clave', 'fecha'], name='resumen_diario_unico'),
+        ]
+
+    def __str__(self):
+        return '%s %s:%s' % (self.fecha, self.dimension, self.clave)
+
+class Recomendacion(models.Model):
+    """
+    Uno de los libros que más pidieron los lectores de ``libro`` ("quienes pidieron este libro
+    también pidieron"), en la ``posicion`` de su lista. Las listas las calcula por lotes
+    catalogo.recomendaciones a partir de los préstamos.
+    """
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='recomendaciones')
+    recomendado = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='+')
+    posicion = models.PositiveSmallIntegerField()
+    # Lectores que pidieron los dos libros, y esa cifra normalizada por la popularidad de ambos
+    lectores = models.IntegerField()
+    puntaje = models.FloatField()
+
+    class Meta:
+        ordering = ['libro', 'posicion']
+        constraints = [
+            models.UniqueConstraint(fields=['libro', 'posicion'], name='recomendacion_posicion_unica'),
+        ]
+
+    def __str__(self):
+        return '%s -> %s' % (self.libro_id, self.recomendado_id)
@@ -0,0 +1,260 @@
+"""
+Paginación por cursor (keyset) para las vistas de lista.
+
+En lugar de ``OFFSET n`` y un ``COUNT(*)`` por página, cada página se pide con un cursor
+opaco que contiene los valores de la última (o primera) fila vista en las columnas de
+orden, y se filtra con ``WHERE (col1, col2, ...) > (v1, v2, ...)``. El costo de una
+página no depende de su profundidad.
+
+Las columnas que admiten NULL se ordenan con los NULL al final.
+"""
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+SAL_CURSOR = 'catalogo.paginacion'
+
+# Filas a partir de las cuales el total de una tabla sin filtros se estima en lugar de contarse
+UMBRAL_CONTEO_ESTIMADO = 100000
+
+
+def _q_nada():
+    return Q(pk__in=[])
+
+
+class PaginaCursor:
+    """
+    Página obtenida con un cursor. Ofrece la parte de la interfaz de ``django.core.paginator.Page``
+    que usan las plantillas, más los cursores de las páginas vecinas.
+    """
+    es_cursor = True
+
+    def __init__(self, object_list, paginator, cursor_anterior, cursor_siguiente):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor_anterior = cursor_anterior
+        self.cursor_siguiente = cursor_siguiente
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+class PaginadorCursor:
+    """
+    Pagina ``queryset`` por las columnas ``orden`` (p. ej. ``('devolucion', 'id')``).
+
+    La última columna debe identificar filas de forma única para que el orden sea total.
+    Un prefijo ``-`` indica orden descendente.
+    """
+
+    def __init__(self, queryset, per_page, orden):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.orden = [(campo.lstrip('-'), campo.startswith('-')) for campo in orden]
+        self.modelo = queryset.model
+
+    def _campo(self, nombre):
+        if nombre == 'pk':
+            return self.modelo._meta.pk
+        try:
+            return self.modelo._meta.get_field(nombre)
+        except FieldDoesNotExist:
+            raise ValueError('Solo se puede paginar por campos propios del modelo: %s' % nombre)
+
+    def _orden(self, invertido):
+        expresiones = []
+        for nombre, descendente in self.orden:
+            campo = self._campo(nombre)
+            nulos = {'nulls_first': True} if invertido else {'nulls_last': True}
+            if not campo.null:
+                nulos = {}
+            if descendente != invertido:
+                expresiones.append(F(nombre).desc(**nulos))
+            else:
+                expresiones.append(F(nombre).asc(**nulos))
+        return expresiones
+
+    def _despues(self, nombre, descendente, valor):
+        """
+        Filas estrictamente posteriores a ``valor`` en la columna ``nombre`` según el orden de la página.
+        """
+        campo = self._campo(nombre)
+        operador = 'lt' if descendente else 'gt'
+        if valor is None:
+            return _q_nada()
+        condicion = Q(**{'%s__%s' % (nombre, operador): valor})
+        if campo.null:
+            condicion |= Q(**{'%s__isnull' % nombre: True})
+        return condicion
+
+    def _antes(self, nombre, descendente, valor):
+        campo = self._campo(nombre)
+        operador = 'gt' if descendente else 'lt'
+        if valor is None:
+            return Q(**{'%s__isnull' % nombre: False})
+        return Q(**{'%s__%s' % (nombre, operador): valor})
+
+    def _igual(self, nombre, valor):
+        if valor is None:
+            return Q(**{'%s__isnull' % nombre: True})
+        return Q(**{nombre: valor})
+
+    def _filtro(self, valores, hacia_atras):
+        # Comparación lexicográfica de tuplas: (a > x) OR (a = x AND b > y) OR ...
+        filtro = _q_nada()
+        iguales = Q()
+        for (nombre, descendente), valor in zip(self.orden, valores):
+            comparar = self._antes if hacia_atras else self._despues
+            filtro |= iguales & comparar(nombre, descendente, valor)
+            iguales &= self._igual(nombre, valor)
+        return filtro
+
+    def codificar(self, objeto, direccion):
+        valores = []
+        for nombre, _ in self.orden:
+            valor = self._campo(nombre).value_from_object(objeto)
+            valores.append(valor if valor is None or isinstance(valor, (int, str)) else str(valor))
+        return signing.dumps({'d': direccion, 'v': valores}, salt=SAL_CURSOR, compress=True)
+
+    def decodificar(self, cursor):
+        try:
+            datos = signing.loads(cursor, salt=SAL_CURSOR)
+            valores = [
+                None if valor is None else self._campo(nombre).to_python(valor)
+                for (nombre, _), valor in zip(self.orden, datos['v'])
+            ]
+            if datos['d'] not in ('s', 'a') or len(valores) != len(self.orden):
+                raise ValueError
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            raise Http404('Cursor de paginación inválido.')
+        return datos['d'], valores
+
+    def _consulta(self, cursor):
+        """
+        Devuelve el queryset de la página (con una fila extra) y si se recorre hacia atrás.
+        """
+        hacia_atras = False
+        queryset = self.queryset
+        if cursor:
+            direccion, valores = self.decodificar(cursor)
+            hacia_atras = direccion == 'a'
+            queryset = queryset.filter(self._filtro(valores, hacia_atras))
+
+        # Se pide una fila extra para saber si hay otra página en la misma dirección.
+        return queryset.order_by(*self._orden(hacia_atras))[:self.per_page + 1], hacia_atras
+
+    def _pagina(self, filas, cursor, hacia_atras):
+        hay_mas = len(filas) > self.per_page
+        filas = filas[:self.per_page]
+        if hacia_atras:
+            filas.reverse()
+
+        if hacia_atras:
+            hay_anterior, hay_siguiente = hay_mas, True
+        else:
+            hay_anterior, hay_siguiente = bool(cursor), hay_mas
+
+        cursor_anterior = self.codificar(filas[0], 'a') if filas and hay_anterior else None
+        cursor_siguiente = self.codificar(filas[-1], 's') if filas and hay_siguiente else None
+        return PaginaCursor(filas, self, cursor_anterior, cursor_siguiente)
+
+    def page(self, cursor=None):
+        """
+        Devuelve la PaginaCursor correspondiente a ``cursor`` (la primera página si es None).
+        """
+        queryset, hacia_atras = self._consulta(cursor)
+        return self._pagina(list(queryset), cursor, hacia_atras)
+
+    async def apage(self, cursor=None):
+        """
+        Versión asíncrona de ``page()`` para las vistas ``async def``.
+        """
+        queryset, hacia_atras = self._consulta(cursor)
+        return self._pagina([fila async for fila in queryset], cursor, hacia_atras)
+
+
+class PaginacionCursorMixin:
+    """
+    Mixin para ListView que activa la paginación por cursor cuando ``paginacion = 'cursor'``.
+
+    Las URL existentes con ``?page=`` se siguen sirviendo con el paginador de Django,
+    de modo que los enlaces antiguos no se rompen.
+    """
+    paginacion = 'offset'
+    orden_cursor = ('pk',)
+    parametro_cursor = 'cursor'
+
+    def usa_cursor(self):
+        return self.paginacion == 'cursor' and self.page_kwarg not in self.request.GET
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.usa_cursor():
+            return super().paginate_queryset(queryset, page_size)
+
+        paginador = PaginadorCursor(queryset, page_size, self.orden_cursor)
+        pagina = paginador.page(self.request.GET.get(self.parametro_cursor))
+        return (paginador, pagina, pagina.object_list, pagina.has_other_pages())
+
+
+def conteo_estimado(modelo, using):
+    """
+    Número aproximado de filas de la tabla de ``modelo`` según las estadísticas del planificador
+    (``pg_class.reltuples`` en PostgreSQL, ``sqlite_stat1`` en SQLite), o None si la tabla
+    todavía no se analizó o el backend no las ofrece.
+    """
+    connection = connections[using]
+    tabla = modelo._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [tabla])
+            fila = cursor.fetchone()
+            # -1: la tabla nunca se analizó
+            return fila[0] if fila and fila[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # El primer número de cada fila de estadísticas es el total de filas de la tabla
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [tabla])
+            fila = cursor.fetchone()
+            return int(fila[0].split()[0]) if fila else None
+    return None
+
+
+class PaginadorConteoEstimado(Paginator):
+    """
+    Paginator de Django para listas muy grandes (p. ej. las del admin): si el queryset no tiene
+    filtros y la tabla supera ``umbral`` filas según las estadísticas, usa el conteo estimado en
+    lugar de un ``COUNT(*)`` que recorre toda la tabla. Con filtros, o en tablas chicas, cuenta.
+
+    El número de páginas es entonces aproximado.
+    """
+    umbral = UMBRAL_CONTEO_ESTIMADO
+
+    @cached_property
+    def count(self):
+        consulta = getattr(self.object_list, 'query', None)
+        if consulta is not None and not consulta.where and not consulta.is_sliced:
+            estimado = conteo_estimado(self.object_list.model, self.object_list.db)
+            if estimado is not None and estimado >= self.umbral:
+                return estimado
+        return super().count
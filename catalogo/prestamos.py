@@ -0,0 +1,316 @@
+"""
+Préstamo, devolución, renovación y reserva de copias.
+
+Cada operación es un único ``UPDATE ... WHERE status = ...`` condicional dentro de una
+transacción: si dos mostradores intentan prestar la misma copia a la vez, la base de datos
+serializa los dos UPDATE y solo el primero encuentra la copia disponible; el otro actualiza
+cero filas y recibe ``CopiaNoDisponible``. Solo se escriben las columnas que cambian.
+
+Los contadores de copias del libro se ajustan, y los préstamos y devoluciones se registran para
+los reportes (catalogo.resumenes), en la misma transacción. Como ``update()`` no
+dispara ``post_save``, al confirmarse se envía ``status_copia_cambiado`` para ajustar las
+estadísticas y las versiones de los fragmentos.
+
+Las reservas forman una cola por libro. Al devolverse una copia se aparta (status 'r') para
+la reserva en espera más antigua de ese libro, que se lee del índice parcial ``reserva_cola``
+sin recorrer la cola; la reserva también se reclama con un UPDATE condicional, así que dos
+devoluciones simultáneas no asignan la misma reserva.
+
+Las operaciones en lote (``renovar_en_lote``, ``devolver_en_lote``, ``enviar_a_mantenimiento``)
+cambian miles de copias con un solo UPDATE condicional, recalculan los contadores de los
+libros afectados y avisan con ``libros_modificados_en_lote``.
+"""
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from .contadores import ajustar_contadores, recontar_copias
+from .models import PeticionesLibro, Reserva
+from .resumenes import registrar_movimientos
+from .signals import libros_modificados_en_lote, status_copia_cambiado
+
+PLAZO_PRESTAMO = datetime.timedelta(weeks=3)
+# Días que una copia apartada espera a que el usuario la recoja
+PLAZO_RECOGIDA = datetime.timedelta(days=7)
+
+
+class ErrorPrestamo(Exception):
+    """
+    La operación no se puede aplicar al estado actual de la copia.
+    """
+
+
+class CopiaNoDisponible(ErrorPrestamo):
+    pass
+
+
+class CopiaNoPrestada(ErrorPrestamo):
+    pass
+
+
+class ReservaInvalida(ErrorPrestamo):
+    pass
+
+
+def _cambiar(pk, filtro, error, using=None, **valores):
+    """
+    Aplica ``valores`` a la copia ``pk`` solo si cumple ``filtro`` (que incluye su status actual)
+    y devuelve la copia actualizada.
+    """
+    with transaction.atomic(using=using):
+        copias = PeticionesLibro.objects.using(using).filter(pk=pk, **filtro)
+        # update() no aplica auto_now: la fecha de modificación se fija aquí
+        if not copias.update(modificado=timezone.now(), **valores):
+            if not PeticionesLibro.objects.using(using).filter(pk=pk).exists():
+                raise PeticionesLibro.DoesNotExist('No existe la copia %s.' % pk)
+            raise error
+        copia = PeticionesLibro.objects.using(using).select_related('libro', 'prestatario').get(pk=pk)
+        anterior = filtro['status']
+        nuevo = valores.get('status', anterior)
+        ajustar_contadores(copia.libro_id, anterior, nuevo, using)
+        registrar_movimientos([(copia.pk, copia.libro_id, copia.prestatario_id)], anterior, nuevo, using)
+        # Sin consultas al confirmar: el autor ya se leyó con la copia
+        autor_id = copia.libro.autor_id if copia.libro else None
+        transaction.on_commit(
+            lambda: status_copia_cambiado.send(
+                sender=PeticionesLibro, libro_id=copia.libro_id, autor_id=autor_id, anterior=anterior, nuevo=nuevo,
+                using=using,
+            ),
+            using=using,
+        )
+    return copia
+
+
+def prestar(pk, prestatario, devolucion=None, using=None):
+    """
+    Presta la copia ``pk`` a ``prestatario`` hasta ``devolucion`` (por omisión, dentro de tres semanas).
+
+    La copia debe estar disponible, o apartada para una reserva de ``prestatario``.
+    """
+    devolucion = devolucion or datetime.date.today() + PLAZO_PRESTAMO
+    with transaction.atomic(using=using):
+        try:
+            copia = _cambiar(
+                pk, {'status': 'd'}, CopiaNoDisponible('La copia %s no está disponible.' % pk), using,
+                status='p', prestatario=prestatario, devolucion=devolucion,
+            )
+        except CopiaNoDisponible:
+            copia = _cambiar(
+                pk, {'status': 'r', 'prestatario': prestatario},
+                CopiaNoDisponible('La copia %s no está disponible.' % pk), using,
+                status='p', devolucion=devolucion,
+            )
+        # El préstamo completa la reserva que el usuario tuviera de este libro; si tenía apartada
+        # otra copia, esa pasa a la siguiente reserva.
+        reservas = Reserva.objects.using(using).filter(libro_id=copia.libro_id, usuario=prestatario, estado__in=('e', 'a'))
+        apartada = reservas.filter(estado='a').exclude(copia=copia).values_list('copia_id', flat=True).first()
+        reservas.update(estado='t', copia=copia)
+        if apartada:
+            try:
+                _liberar_copia(apartada, copia.prestatario_id, using)
+            except CopiaNoDisponible:
+                pass
+    return copia
+
+
+def devolver(pk, using=None):
+    """
+    Registra la devolución de la copia ``pk``: queda apartada para la siguiente reserva, o disponible.
+    """
+    with transaction.atomic(using=using):
+        copia = _cambiar(
+            pk, {'status': 'p'}, CopiaNoPrestada('La copia %s no está prestada.' % pk), using,
+            status='d', prestatario=None, devolucion=None,
+        )
+        return _asignar_a_siguiente(copia, using) or copia
+
+
+def renovar(pk, devolucion, using=None):
+    """
+    Cambia la fecha de devolución de la copia prestada ``pk``.
+    """
+    return _cambiar(
+        pk, {'status': 'p'}, CopiaNoPrestada('La copia %s no está prestada.' % pk), using,
+        devolucion=devolucion,
+    )
+
+
+def _asignar_a_siguiente(copia, using=None):
+    """
+    Aparta la copia disponible ``copia`` para la reserva en espera más antigua de su libro.
+
+    Devuelve la copia actualizada, o None si no hay nadie esperando.
+    """
+    en_espera = Reserva.objects.using(using).filter(libro_id=copia.libro_id, estado='e').order_by('id')
+    while True:
+        siguiente = en_espera.values_list('pk', 'usuario_id').first()
+        if siguiente is None:
+            return None
+        reserva_id, usuario_id = siguiente
+        # Si la copia ya no está disponible, el savepoint deshace también la asignación de la reserva
+        with transaction.atomic(using=using):
+            # Otra devolución concurrente pudo reclamar esta reserva primero: se pasa a la siguiente
+            if Reserva.objects.using(using).filter(pk=reserva_id, estado='e').update(
+                estado='a', copia=copia, asignada=timezone.now(),
+            ):
+                return _cambiar(
+                    copia.pk, {'status': 'd'}, CopiaNoDisponible('La copia %s no está disponible.' % copia.pk), using,
+                    status='r', prestatario_id=usuario_id, devolucion=datetime.date.today() + PLAZO_RECOGIDA,
+                )
+
+
+def _liberar_copia(copia_pk, usuario_id, using=None):
+    """
+    Devuelve a la cola una copia apartada que no se recogió.
+    """
+    copia = _cambiar(
+        copia_pk, {'status': 'r', 'prestatario_id': usuario_id},
+        CopiaNoDisponible('La copia %s no está apartada.' % copia_pk), using,
+        status='d', prestatario=None, devolucion=None,
+    )
+    return _asignar_a_siguiente(copia, using) or copia
+
+
+def reservar(libro_id, usuario, using=None):
+    """
+    Pone a ``usuario`` en la cola del libro ``libro_id``. Si hay una copia disponible y nadie
+    esperando antes, se le aparta de inmediato.
+    """
+    try:
+        with transaction.atomic(using=using):
+            reserva = Reserva.objects.using(using).create(libro_id=libro_id, usuario=usuario)
+            disponible = PeticionesLibro.objects.using(using).filter(libro_id=libro_id, status='d').first()
+            if disponible is not None:
+                try:
+                    _asignar_a_siguiente(disponible, using)
+                except CopiaNoDisponible:
+                    # La copia se prestó mientras tanto: la reserva queda en espera
+                    pass
+    except IntegrityError:
+        raise ReservaInvalida('Ya tienes una reserva activa de este libro.')
+    reserva.refresh_from_db(using=using)
+    return reserva
+
+
+def cancelar_reserva(pk, usuario=None, using=None):
+    """
+    Cancela la reserva ``pk`` (solo si es de ``usuario``, cuando se indica); si tenía una copia
+    apartada, pasa a la siguiente reserva. Devuelve la reserva ya cancelada.
+    """
+    reservas = Reserva.objects.using(using).filter(pk=pk, estado__in=('e', 'a'))
+    if usuario is not None:
+        reservas = reservas.filter(usuario=usuario)
+    with transaction.atomic(using=using):
+        reserva = reservas.first()
+        # Se cancela solo si sigue en el estado leído (una devolución concurrente pudo asignarla)
+        if reserva is None or not Reserva.objects.using(using).filter(pk=pk, estado=reserva.estado).update(estado='c'):
+            raise ReservaInvalida('La reserva %s no está activa.' % pk)
+        if reserva.estado == 'a' and reserva.copia_id:
+            try:
+                _liberar_copia(reserva.copia_id, reserva.usuario_id, using)
+            except CopiaNoDisponible:
+                # La copia ya se prestó o se liberó por otro camino
+                pass
+    reserva.estado = 'c'
+    return reserva
+
+
+def vencer_reservas(fecha=None, using=None):
+    """
+    Cancela las reservas asignadas cuya copia no se recogió antes de ``fecha`` y pasa cada copia
+    a la siguiente reserva. Devuelve cuántas venció.
+    """
+    fecha = fecha or datetime.date.today()
+    # Se leen primero: la lista es corta y cada copia se actualiza en su propia transacción
+    vencidas = list(PeticionesLibro.objects.using(using).filter(status='r', devolucion__lt=fecha).values_list('pk', 'prestatario_id'))
+    total = 0
+    for copia_pk, usuario_id in vencidas:
+        with transaction.atomic(using=using):
+            if not Reserva.objects.using(using).filter(copia_id=copia_pk, usuario_id=usuario_id, estado='a').update(estado='c'):
+                continue
+            try:
+                _liberar_copia(copia_pk, usuario_id, using)
+            except CopiaNoDisponible:
+                continue
+            total += 1
+    return total
+
+
+def posicion_en_cola(reserva, using=None):
+    """
+    Posición (desde 1) de una reserva en espera dentro de la cola de su libro.
+    """
+    return Reserva.objects.using(using).filter(libro_id=reserva.libro_id, estado='e', id__lte=reserva.pk).count()
+
+
+# Operaciones en lote
+
+def _cambiar_en_lote(copias, filtro, using=None, **valores):
+    """
+    Aplica ``valores`` con un único UPDATE a las ``copias`` (un queryset o una lista de pks) que
+    cumplen ``filtro``. Si cambia el status, recalcula los contadores de sus libros en la misma
+    transacción. Devuelve el número de copias actualizadas y los ids de sus libros.
+    """
+    if isinstance(copias, QuerySet):
+        seleccion = {'pk__in': copias.order_by().values('pk')}
+    else:
+        seleccion = {'pk__in': list(copias)}
+    with transaction.atomic(using=using):
+        elegidas = PeticionesLibro.objects.using(using).filter(**seleccion, **filtro)
+        # Se bloquean las filas antes del UPDATE para que las copias leídas sean las que cambian
+        filas = list(elegidas.select_for_update().order_by().values_list('pk', 'libro_id', 'prestatario_id'))
+        libro_ids = {libro_id for _, libro_id, _ in filas} - {None}
+        actualizadas = elegidas.update(modificado=timezone.now(), **valores)
+        if actualizadas:
+            libro_ids = sorted(libro_ids)
+            if 'status' in valores:
+                recontar_copias(libro_ids, using)
+                registrar_movimientos(filas, filtro.get('status'), valores['status'], using)
+            transaction.on_commit(
+                lambda: libros_modificados_en_lote.send(
+                    sender=PeticionesLibro, libro_ids=libro_ids, solo_copias=True, using=using,
+                ),
+                using=using,
+            )
+    return actualizadas, libro_ids
+
+
+def renovar_en_lote(copias, devolucion, using=None):
+    """
+    Cambia la fecha de devolución de las ``copias`` que siguen prestadas. Devuelve cuántas renovó.
+    """
+    return _cambiar_en_lote(copias, {'status': 'p'}, using, devolucion=devolucion)[0]
+
+
+def devolver_en_lote(copias, using=None):
+    """
+    Registra la devolución de las ``copias`` prestadas. Después, las copias disponibles de los
+    libros con reservas en espera se apartan para esas reservas, una por una, como en ``devolver``.
+    Devuelve cuántas devolvió.
+    """
+    with transaction.atomic(using=using):
+        devueltas, libro_ids = _cambiar_en_lote(
+            copias, {'status': 'p'}, using, status='d', prestatario=None, devolucion=None,
+        )
+        con_reservas = (
+            Reserva.objects.using(using).filter(libro_id__in=libro_ids, estado='e')
+            .order_by().values_list('libro_id', flat=True).distinct()
+        )
+        for libro_id in con_reservas:
+            for copia in PeticionesLibro.objects.using(using).filter(libro_id=libro_id, status='d'):
+                try:
+                    if _asignar_a_siguiente(copia, using) is None:
+                        break
+                except CopiaNoDisponible:
+                    continue
+    return devueltas
+
+
+def enviar_a_mantenimiento(copias, using=None):
+    """
+    Pasa a mantenimiento las ``copias`` disponibles (las prestadas o apartadas para una reserva no
+    se tocan). Devuelve cuántas cambió.
+    """
+    return _cambiar_en_lote(copias, {'status__in': ('d', '')}, using, status='m')[0]
@@ -0,0 +1,205 @@
+"""
+Libros populares y "quienes pidieron este libro también pidieron".
+
+``manage.py recalcular_recomendaciones`` lee los pares (lector, libro) de los préstamos
+registrados (``MovimientoPrestamo``) y de las copias prestadas ahora, y calcula:
+
+- la popularidad de cada libro: cuántos lectores distintos lo pidieron (``Libro.popularidad``);
+- para cada libro, los ``VECINOS`` libros que más comparten lectores con él, ordenados por
+  coocurrencia normalizada (``lectores en común / sqrt(lectores de A * lectores de B)``), que
+  evita que los libros más populares aparezcan en todas las listas (``Recomendacion``).
+
+La coocurrencia es dispersa: solo se cuentan los pares de libros que algún lector pidió juntos.
+Con NumPy los pares de cada lector se generan y cuentan con operaciones vectorizadas; sin NumPy
+se cuentan en Python con el mismo resultado. Los lectores con más de ``MAX_LIBROS_POR_LECTOR``
+libros no aportan pares (su costo crece con el cuadrado y su señal es débil), aunque sí cuentan
+para la popularidad.
+
+Solo se escriben los libros cuya popularidad o lista cambió; al confirmarse se envía
+``recomendaciones_actualizadas`` para invalidar sus fragmentos en caché. La página del libro
+muestra la lista guardada dentro de un fragmento en caché: no calcula nada por petición.
+"""
+import heapq
+import itertools
+import math
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Libro, MovimientoPrestamo, PeticionesLibro, Recomendacion
+from .signals import recomendaciones_actualizadas
+
+VECINOS = 5
+MAX_LIBROS_POR_LECTOR = 200
+TAMANO_LOTE = 1000
+
+
+def pares_lector_libro(using=None):
+    """
+    Pares ``(usuario_id, libro_id)`` distintos de los préstamos registrados y los actuales.
+    """
+    historial = (
+        MovimientoPrestamo.objects.using(using).filter(tipo='p', prestatario__isnull=False, libro__isnull=False)
+        .values_list('prestatario_id', 'libro_id')
+    )
+    actuales = (
+        PeticionesLibro.objects.using(using).filter(status='p', prestatario__isnull=False, libro__isnull=False)
+        .order_by().values_list('prestatario_id', 'libro_id')
+    )
+    # UNION (sin ALL) descarta los duplicados en la base de datos
+    return list(historial.union(actuales))
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def calcular(pares, vecinos=VECINOS, usar_numpy=None):
+    """
+    Devuelve ``(popularidad, recomendaciones)``: ``{libro_id: lectores}`` y
+    ``{libro_id: [(recomendado_id, lectores en común, puntaje), ...]}`` con hasta ``vecinos``
+    libros por lista. ``usar_numpy=None`` usa NumPy si está instalado.
+    """
+    pares = sorted(set(pares))
+    if not pares:
+        return {}, {}
+    np = _numpy() if usar_numpy is not False else None
+    if usar_numpy and np is None:
+        raise ImportError('NumPy no está instalado.')
+    if np is not None:
+        return _calcular_numpy(np, pares, vecinos)
+    return _calcular_python(pares, vecinos)
+
+
+def _calcular_python(pares, vecinos):
+    lectores = Counter(libro for _, libro in pares)
+    comunes = Counter()
+    for _, grupo in itertools.groupby(pares, key=lambda par: par[0]):
+        libros = [libro for _, libro in grupo]
+        if len(libros) <= MAX_LIBROS_POR_LECTOR:
+            comunes.update(itertools.permutations(libros, 2))
+
+    candidatos = defaultdict(list)
+    for (libro, otro), cantidad in comunes.items():
+        puntaje = cantidad / math.sqrt(lectores[libro] * lectores[otro])
+        candidatos[libro].append((-puntaje, -cantidad, otro))
+    recomendaciones = {
+        libro: [(otro, -cantidad, -puntaje) for puntaje, cantidad, otro in heapq.nsmallest(vecinos, lista)]
+        for libro, lista in candidatos.items()
+    }
+    return dict(lectores), recomendaciones
+
+
+def _calcular_numpy(np, pares, vecinos):
+    datos = np.array(pares, dtype=np.int64)
+    usuarios, libros = datos[:, 0], datos[:, 1]
+    # Índice compacto de cada libro (0..m-1) y sus lectores
+    ids, libro_idx, lectores = np.unique(libros, return_inverse=True, return_counts=True)
+    m = len(ids)
+
+    # Grupos de libros por lector (los pares vienen ordenados por usuario)
+    inicios = np.flatnonzero(np.r_[True, usuarios[1:] != usuarios[:-1]])
+    tamanos = np.diff(np.r_[inicios, len(usuarios)])
+    validos = (tamanos > 1) & (tamanos <= MAX_LIBROS_POR_LECTOR)
+
+    # Cada libro de un grupo válido se repite una vez por libro del grupo: todos los pares ordenados
+    elementos = np.flatnonzero(np.repeat(validos, tamanos))
+    repeticiones = np.repeat(tamanos, tamanos)[elementos]
+    inicio_grupo = np.repeat(inicios, tamanos)[elementos]
+    izquierda = np.repeat(elementos, repeticiones)
+    desplazamiento = np.arange(repeticiones.sum()) - np.repeat(np.cumsum(repeticiones) - repeticiones, repeticiones)
+    derecha = np.repeat(inicio_grupo, repeticiones) + desplazamiento
+    distintos = izquierda != derecha
+    claves = libro_idx[izquierda[distintos]] * m + libro_idx[derecha[distintos]]
+
+    claves, comunes = np.unique(claves, return_counts=True)
+    libro, otro = claves // m, claves % m
+    puntajes = comunes / np.sqrt(lectores[libro] * lectores[otro])
+
+    # Por libro: mayor puntaje, luego más lectores en común, luego menor id
+    orden = np.lexsort((ids[otro], -comunes, -puntajes, libro))
+    libro, otro, comunes, puntajes = libro[orden], otro[orden], comunes[orden], puntajes[orden]
+    inicios = np.flatnonzero(np.r_[True, libro[1:] != libro[:-1]])
+    posicion = np.arange(len(libro)) - np.repeat(inicios, np.diff(np.r_[inicios, len(libro)]))
+    elegidos = posicion < vecinos
+
+    recomendaciones = defaultdict(list)
+    for a, b, cantidad, puntaje in zip(
+        ids[libro[elegidos]].tolist(), ids[otro[elegidos]].tolist(), comunes[elegidos].tolist(), puntajes[elegidos].tolist(),
+    ):
+        recomendaciones[a].append((b, cantidad, puntaje))
+    return dict(zip(ids.tolist(), lectores.tolist())), dict(recomendaciones)
+
+
+def guardar(popularidad, recomendaciones, using=None):
+    """
+    Escribe la popularidad y las listas que cambiaron. Devuelve los ids de los libros modificados.
+    """
+    libros = Libro.objects.using(using)
+    guardadas = defaultdict(list)
+    for libro_id, recomendado_id, lectores, puntaje in (
+        Recomendacion.objects.using(using).order_by('libro_id', 'posicion')
+        .values_list('libro_id', 'recomendado_id', 'lectores', 'puntaje').iterator(chunk_size=TAMANO_LOTE)
+    ):
+        guardadas[libro_id].append((recomendado_id, lectores, puntaje))
+
+    with transaction.atomic(using=using):
+        # Los libros borrados después de leer los pares no se escriben (se leen todos los ids del
+        # índice de la clave primaria: un IN con decenas de miles de ids superaría el límite de SQLite)
+        existentes = set(libros.values_list('pk', flat=True).iterator(chunk_size=TAMANO_LOTE * 10))
+        anterior = dict(libros.filter(popularidad__gt=0).values_list('pk', 'popularidad'))
+        nueva = {libro_id: valor for libro_id, valor in popularidad.items() if libro_id in existentes}
+        cambio_popularidad = {
+            libro_id: nueva.get(libro_id, 0) for libro_id in set(anterior) | set(nueva)
+            if nueva.get(libro_id, 0) != anterior.get(libro_id, 0)
+        }
+
+        listas = {
+            libro_id: [fila for fila in lista if fila[0] in existentes]
+            for libro_id, lista in recomendaciones.items() if libro_id in existentes
+        }
+        cambio_listas = {
+            libro_id for libro_id in set(guardadas) | set(listas)
+            if not _misma_lista(guardadas.get(libro_id, []), listas.get(libro_id, []))
+        }
+
+        ahora = timezone.now()
+        libros.bulk_update(
+            [Libro(pk=libro_id, popularidad=valor, modificado=ahora) for libro_id, valor in cambio_popularidad.items()],
+            ['popularidad', 'modificado'], batch_size=TAMANO_LOTE,
+        )
+        cambiadas = sorted(cambio_listas)
+        for inicio in range(0, len(cambiadas), TAMANO_LOTE):
+            lote = cambiadas[inicio:inicio + TAMANO_LOTE]
+            Recomendacion.objects.using(using).filter(libro_id__in=lote).delete()
+            # La lista forma parte de la página del libro: cambia su Last-Modified
+            libros.filter(pk__in=lote).update(modificado=ahora)
+        Recomendacion.objects.using(using).bulk_create([
+            Recomendacion(libro_id=libro_id, recomendado_id=otro, posicion=posicion, lectores=lectores, puntaje=puntaje)
+            for libro_id in cambiadas
+            for posicion, (otro, lectores, puntaje) in enumerate(listas.get(libro_id, []), start=1)
+        ], batch_size=TAMANO_LOTE)
+
+        modificados = sorted(set(cambio_popularidad) | cambio_listas)
+        if cambiadas:
+            transaction.on_commit(
+                lambda: recomendaciones_actualizadas.send(sender=Recomendacion, libro_ids=cambiadas, using=using),
+                using=using,
+            )
+    return modificados
+
+
+def _misma_lista(guardada, nueva):
+    return len(guardada) == len(nueva) and all(
+        a[0] == b[0] and a[1] == b[1] and math.isclose(a[2], b[2]) for a, b in zip(guardada, nueva)
+    )
+
+
+def recalcular(vecinos=VECINOS, usar_numpy=None, using=None):
+    popularidad, recomendaciones = calcular(pares_lector_libro(using), vecinos, usar_numpy)
+    return guardar(popularidad, recomendaciones, using)
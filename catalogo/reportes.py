@@ -0,0 +1,176 @@
+"""
+Gráficos de circulación del catálogo en PNG o SVG.
+
+matplotlib (con numpy) tarda unos 300 ms en importarse, así que no se importa al cargar este
+módulo sino dentro de cada función: los workers y los comandos que no dibujan no lo pagan.
+Se usa el backend Agg a través de Figure, sin pyplot ni su estado global, que no es seguro
+entre hilos.
+
+Los gráficos se dibujan a partir de los resúmenes diarios (catalogo.resumenes), nunca de las
+copias, y se guardan como archivos en ``settings.CATALOGO_REPORTES_DIR``. ``manage.py
+actualizar_resumenes`` vuelve a dibujar todos los periodos y formatos después de actualizar los
+resúmenes; las vistas sirven el archivo y solo dibujan los que faltan.
+"""
+import datetime
+import io
+import os
+import tempfile
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import resumenes
+
+FORMATOS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+# Días que abarca cada gráfico; a partir de PERIODO_MENSUAL la serie se agrupa por mes
+PERIODOS = (30, 365, 3650)
+PERIODO_PREDETERMINADO = 365
+PERIODO_MENSUAL = 400
+
+
+def _figura(ancho=8, alto=3.5):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figura = Figure(figsize=(ancho, alto), dpi=100)
+    FigureCanvasAgg(figura)
+    return figura
+
+
+def _exportar(figura, formato='png'):
+    salida = io.BytesIO()
+    figura.tight_layout()
+    figura.savefig(salida, format=formato)
+    return salida.getvalue()
+
+
+def grafico_barras(etiquetas, valores, titulo='', etiqueta_y='', formato='png'):
+    figura = _figura()
+    ejes = figura.add_subplot()
+    ejes.bar([str(etiqueta) for etiqueta in etiquetas], valores)
+    ejes.set_title(titulo)
+    ejes.set_ylabel(etiqueta_y)
+    ejes.tick_params(axis='x', labelrotation=30)
+    return _exportar(figura, formato)
+
+
+def grafico_lineas(fechas, series, titulo='', formato='png'):
+    """
+    Una línea por cada ``nombre: valores`` de ``series`` sobre el eje de ``fechas``.
+    """
+    figura = _figura()
+    ejes = figura.add_subplot()
+    for nombre, valores in series.items():
+        ejes.plot(fechas, valores, label=nombre)
+    ejes.set_title(titulo)
+    ejes.set_ylim(bottom=0)
+    ejes.legend(loc='upper left')
+    figura.autofmt_xdate()
+    return _exportar(figura, formato)
+
+
+def _por_mes(fechas, series, agregar):
+    meses = OrderedDict()
+    for i, fecha in enumerate(fechas):
+        meses.setdefault(fecha.replace(day=1), []).append(i)
+    return list(meses), {
+        nombre: [agregar(valores[i] for i in indices) for indices in meses.values()]
+        for nombre, valores in series.items()
+    }
+
+
+# Gráficos disponibles: nombre -> (título, función(desde, hasta, formato))
+
+def _circulacion(desde, hasta, formato):
+    fechas, series = resumenes.serie_diaria(desde, hasta, ('prestamos', 'devoluciones'))
+    titulo = 'Préstamos y devoluciones por día'
+    if (hasta - desde).days >= PERIODO_MENSUAL:
+        fechas, series = _por_mes(fechas, series, sum)
+        titulo = 'Préstamos y devoluciones por mes'
+    return grafico_lineas(fechas, {'Préstamos': series['prestamos'], 'Devoluciones': series['devoluciones']}, titulo, formato)
+
+
+def _vencidos(desde, hasta, formato):
+    fechas, series = resumenes.serie_diaria(desde, hasta, ('vencidos',))
+    if (hasta - desde).days >= PERIODO_MENSUAL:
+        # Los vencidos son una foto diaria: del mes se muestra el máximo
+        fechas, series = _por_mes(fechas, series, max)
+    return grafico_lineas(fechas, {'Vencidos': series['vencidos']}, 'Préstamos vencidos', formato)
+
+
+def _ranking(dimension, titulo):
+    def dibujar(desde, hasta, formato):
+        filas = resumenes.ranking(dimension, desde, hasta)
+        return grafico_barras([nombre for nombre, _ in filas], [total for _, total in filas], titulo, 'Préstamos', formato)
+    return dibujar
+
+
+GRAFICOS = OrderedDict([
+    ('circulacion', ('Préstamos y devoluciones', _circulacion)),
+    ('vencidos', ('Préstamos vencidos', _vencidos)),
+    ('generos', ('Géneros más prestados', _ranking('g', 'Géneros más prestados'))),
+    ('idiomas', ('Préstamos por idioma', _ranking('i', 'Préstamos por idioma'))),
+    ('autores', ('Autores más prestados', _ranking('a', 'Autores más prestados'))),
+])
+
+
+def dibujar(nombre, dias=PERIODO_PREDETERMINADO, formato='png', hasta=None):
+    hasta = hasta or timezone.localdate()
+    desde = hasta - datetime.timedelta(days=dias - 1)
+    return GRAFICOS[nombre][1](desde, hasta, formato)
+
+
+# Almacén de archivos
+
+def ruta_grafico(nombre, dias, formato):
+    return os.path.join(settings.CATALOGO_REPORTES_DIR, '%s-%d.%s' % (nombre, dias, formato))
+
+
+def _escribir(ruta, contenido):
+    # Se escribe en un temporal y se renombra: una petición concurrente nunca lee un archivo a medias
+    directorio = os.path.dirname(ruta)
+    os.makedirs(directorio, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, ruta)
+
+
+def obtener_grafico(nombre, dias=PERIODO_PREDETERMINADO, formato='png'):
+    """
+    Ruta del archivo del gráfico; si todavía no se generó, lo dibuja y lo guarda.
+    """
+    ruta = ruta_grafico(nombre, dias, formato)
+    if not os.path.exists(ruta):
+        _escribir(ruta, dibujar(nombre, dias, formato))
+    return ruta
+
+
+def regenerar_graficos(hasta=None, periodos=PERIODOS, formatos=tuple(FORMATOS)):
+    """
+    Vuelve a dibujar los gráficos de ``periodos`` y ``formatos`` sobre los guardados y después
+    borra los demás, que ya no corresponden a los resúmenes; esos se dibujan cuando se pidan.
+    Devuelve cuántos dibujó.
+    """
+    dibujados = set()
+    for nombre in GRAFICOS:
+        for dias in periodos:
+            for formato in formatos:
+                ruta = ruta_grafico(nombre, dias, formato)
+                # Cada archivo se reemplaza de una vez: las vistas nunca encuentran un hueco
+                _escribir(ruta, dibujar(nombre, dias, formato, hasta))
+                dibujados.add(os.path.basename(ruta))
+    directorio = settings.CATALOGO_REPORTES_DIR
+    if os.path.isdir(directorio):
+        for archivo in os.listdir(directorio):
+            if archivo.rpartition('.')[2] in FORMATOS and archivo not in dibujados:
+                try:
+                    os.remove(os.path.join(directorio, archivo))
+                except FileNotFoundError:
+                    pass
+    return len(dibujados)
@@ -0,0 +1,162 @@
+"""
+Resúmenes diarios de circulación (``ResumenDiario``) para los reportes.
+
+Cada préstamo y devolución deja una fila en ``MovimientoPrestamo`` dentro de la transacción
+que cambia la copia (``registrar_movimientos``). ``actualizar_resumenes`` agrega esas filas por
+día en total y por género, idioma y autor. Es incremental: vuelve a contar solo desde el último
+día resumido (que pudo quedar a medias) hasta hoy, leyendo los movimientos por el índice de
+fecha, así que puede ejecutarse cada hora sin recorrer el historial.
+
+Los vencidos no se pueden reconstruir a partir de los movimientos (las renovaciones cambian
+la fecha de devolución): cada actualización guarda una foto de los vencidos de ese día.
+
+Los reportes (``serie_diaria``, ``ranking``) leen solo ResumenDiario: años de historial son
+unos cientos de filas por dimensión.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from .models import Autor, Genero, Idioma, MovimientoPrestamo, PeticionesLibro, ResumenDiario
+
+# Dimensión de ResumenDiario y campo de la copia o del movimiento por el que se agrupa
+CAMPOS_DIMENSION = {
+    't': None,
+    'g': 'libro__genero',
+    'i': 'libro__idioma',
+    'a': 'libro__autor',
+}
+
+NOMBRES_DIMENSION = {
+    'g': lambda ids: {genero.pk: genero.nombre for genero in Genero.objects.filter(pk__in=ids)},
+    'i': lambda ids: {idioma.pk: idioma.nombre for idioma in Idioma.objects.filter(pk__in=ids)},
+    'a': lambda ids: {autor.pk: str(autor) for autor in Autor.objects.filter(pk__in=ids)},
+}
+
+TAMANO_LOTE = 500
+
+
+def tipo_movimiento(anterior, nuevo):
+    """
+    'p' si la copia pasa a prestada, 'd' si deja de estarlo, None si no es un movimiento.
+    """
+    if nuevo == 'p' and anterior != 'p':
+        return 'p'
+    if anterior == 'p' and nuevo != 'p':
+        return 'd'
+    return None
+
+
+def registrar_movimientos(copias, anterior, nuevo, using=None):
+    """
+    Registra el paso de las ``copias`` (tuplas ``(copia_id, libro_id, prestatario_id)``) del
+    status ``anterior`` a ``nuevo``, si es un préstamo o una devolución. El prestatario solo se
+    guarda en los préstamos.
+    """
+    tipo = tipo_movimiento(anterior, nuevo)
+    if tipo is None or not copias:
+        return
+    fecha, momento = timezone.localdate(), timezone.now()
+    MovimientoPrestamo.objects.using(using).bulk_create([
+        MovimientoPrestamo(
+            fecha=fecha, momento=momento, tipo=tipo, copia_id=copia_id, libro_id=libro_id,
+            prestatario_id=prestatario_id if tipo == 'p' else None,
+        )
+        for copia_id, libro_id, prestatario_id in copias
+    ], batch_size=TAMANO_LOTE)
+
+
+def _contar(consulta, agrupar=()):
+    """
+    Cuenta las filas de ``consulta`` en total y por género, idioma y autor, agrupadas además por
+    los campos ``agrupar``: ``{(dimension, clave, *valores de agrupar): cantidad}``.
+    """
+    conteos = {}
+    for dimension, campo in CAMPOS_DIMENSION.items():
+        campos = list(agrupar) + ([campo] if campo else [])
+        if not campos:
+            conteos[dimension, 0] = consulta.count()
+            continue
+        for fila in consulta.values(*campos).annotate(cantidad=Count('pk')).order_by():
+            clave = fila[campo] if campo else 0
+            if clave is not None:
+                conteos[(dimension, clave) + tuple(fila[nombre] for nombre in agrupar)] = fila['cantidad']
+    return conteos
+
+
+def actualizar_resumenes(hasta=None, using=None):
+    """
+    Recalcula los resúmenes desde el último día resumido hasta ``hasta`` (por omisión hoy) y
+    guarda los vencidos de ``hasta``. Devuelve el primer día recalculado y el número de filas escritas.
+    """
+    hasta = hasta or timezone.localdate()
+    resumenes = ResumenDiario.objects.using(using)
+    movimientos = MovimientoPrestamo.objects.using(using)
+    desde = (
+        resumenes.aggregate(ultimo=Max('fecha'))['ultimo']
+        or movimientos.aggregate(primero=Min('fecha'))['primero']
+        or hasta
+    )
+    desde = min(desde, hasta)
+
+    por_dia = defaultdict(dict)
+    conteos = _contar(movimientos.filter(fecha__gte=desde, fecha__lte=hasta), ('fecha', 'tipo'))
+    for (dimension, clave, fecha, tipo), cantidad in conteos.items():
+        por_dia[dimension, clave, fecha][tipo] = cantidad
+    filas = [
+        ResumenDiario(
+            fecha=fecha, dimension=dimension, clave=clave,
+            prestamos=valores.get('p', 0), devoluciones=valores.get('d', 0),
+        )
+        for (dimension, clave, fecha), valores in por_dia.items()
+    ]
+    # La foto incluye siempre la fila total de ``hasta``, que marca el día como resumido
+    fotos = [
+        ResumenDiario(fecha=hasta, dimension=dimension, clave=clave, vencidos=cantidad)
+        for (dimension, clave), cantidad in _contar(PeticionesLibro.objects.using(using).overdue(hasta)).items()
+    ]
+    with transaction.atomic(using=using):
+        # Los días recalculados se cuentan de nuevo completos (un libro pudo cambiar de género)
+        resumenes.filter(fecha__gte=desde, fecha__lte=hasta).update(prestamos=0, devoluciones=0)
+        resumenes.filter(fecha=hasta).update(vencidos=0)
+        resumenes.bulk_create(
+            filas, batch_size=TAMANO_LOTE, update_conflicts=True,
+            unique_fields=['dimension', 'clave', 'fecha'], update_fields=['prestamos', 'devoluciones'],
+        )
+        resumenes.bulk_create(
+            fotos, batch_size=TAMANO_LOTE, update_conflicts=True,
+            unique_fields=['dimension', 'clave', 'fecha'], update_fields=['vencidos'],
+        )
+    return desde, len(filas) + len(fotos)
+
+
+def serie_diaria(desde, hasta, campos=('prestamos', 'devoluciones', 'vencidos'), using=None):
+    """
+    Valores totales de cada día entre ``desde`` y ``hasta``, con cero en los días sin resumen:
+    ``(fechas, {campo: [valores]})``.
+    """
+    filas = dict(
+        (fila[0], fila[1:]) for fila in
+        ResumenDiario.objects.using(using).filter(dimension='t', clave=0, fecha__gte=desde, fecha__lte=hasta)
+        .order_by('fecha').values_list('fecha', *campos)
+    )
+    fechas = [desde + datetime.timedelta(days=dias) for dias in range((hasta - desde).days + 1)]
+    ceros = (0,) * len(campos)
+    valores = [filas.get(fecha, ceros) for fecha in fechas]
+    return fechas, {campo: [fila[i] for fila in valores] for i, campo in enumerate(campos)}
+
+
+def ranking(dimension, desde, hasta, campo='prestamos', limite=10, using=None):
+    """
+    Los ``limite`` géneros, idiomas o autores con más ``campo`` entre ``desde`` y ``hasta``:
+    lista de ``(nombre, total)``.
+    """
+    filas = list(
+        ResumenDiario.objects.using(using).filter(dimension=dimension, fecha__gte=desde, fecha__lte=hasta)
+        .values('clave').annotate(total=Sum(campo)).filter(total__gt=0).order_by('-total', 'clave')[:limite]
+    )
+    nombres = NOMBRES_DIMENSION[dimension]([fila['clave'] for fila in filas])
+    return [(nombres.get(fila['clave'], '(eliminado)'), fila['total']) for fila in filas]
@@ -0,0 +1,415 @@
+"""
+Receptores de señales del catálogo.
+
+Se conectan en ``CatalogoConfig.ready()``.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver, Signal
+from django.utils import timezone
+
+from .models import Libro, PeticionesLibro, Autor, Genero, Idioma, Recomendacion
+from .estadisticas import ajustar_al_confirmar, invalidar_al_confirmar, PALABRA_FILTRO
+from .busqueda import obtener_backend
+from .condicional import marcar_borrado
+from .contadores import ajustar_contadores, recontar_copias
+from .resumenes import registrar_movimientos
+from . import autocompletar, fragmentos
+
+# Se envía después de escrituras masivas (bulk_create, update) que no disparan post_save/post_delete.
+# Argumentos: libro_ids (libros afectados), solo_copias (True si solo cambiaron sus copias) y using.
+libros_modificados_en_lote = Signal()
+
+# Se envía cuando catalogo.prestamos cambia una copia con un UPDATE condicional.
+# Argumentos: libro_id, autor_id (del libro), anterior y nuevo (status antes y después) y using.
+status_copia_cambiado = Signal()
+
+# Se envía cuando catalogo.recomendaciones reescribe las listas de recomendados de algunos libros.
+# Argumentos: libro_ids y using.
+recomendaciones_actualizadas = Signal()
+
+
+def _valor_original(instance, campo):
+    """
+    Devuelve el valor de ``campo`` tal como se leyó de la base de datos, o None si no se conoce.
+    """
+    return getattr(instance, '_valores_db', {}).get(campo)
+
+
+def _recordar_valores(instance, *campos):
+    """
+    Actualiza los valores originales después de guardar, para que un segundo save() no cuente dos veces.
+    """
+    valores = getattr(instance, '_valores_db', None)
+    if valores is None:
+        valores = instance._valores_db = {}
+    for campo in campos:
+        valores[campo] = getattr(instance, campo)
+
+
+def _contiene_filtro(titulo):
+    return PALABRA_FILTRO in (titulo or '').lower()
+
+
+# Contadores de copias por libro (catalogo.contadores) y registro de préstamos y devoluciones
+# (catalogo.resumenes). Van primero: los receptores siguientes actualizan los valores originales
+# recordados de la copia.
+
+@receiver(post_save, sender=PeticionesLibro)
+def contar_copia_guardada(sender, instance, created, using, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        ajustar_contadores(instance.libro_id, None, instance.status, using)
+        return
+    valores = getattr(instance, '_valores_db', {})
+    if 'status' not in valores or 'libro_id' not in valores:
+        # No se sabe de dónde venía la copia: se recuentan los libros posibles
+        recontar_copias({instance.libro_id, valores.get('libro_id')} - {None}, using)
+    elif valores['libro_id'] != instance.libro_id:
+        ajustar_contadores(valores['libro_id'], valores['status'], None, using)
+        ajustar_contadores(instance.libro_id, None, instance.status, using)
+    else:
+        ajustar_contadores(instance.libro_id, valores['status'], instance.status, using)
+
+
+@receiver(post_delete, sender=PeticionesLibro)
+def contar_copia_eliminada(sender, instance, using, **kwargs):
+    valores = getattr(instance, '_valores_db', {})
+    ajustar_contadores(valores.get('libro_id', instance.libro_id), valores.get('status', instance.status), None, using)
+
+
+@receiver(post_save, sender=PeticionesLibro)
+def registrar_movimiento_guardado(sender, instance, created, using, raw=False, **kwargs):
+    # Préstamos y devoluciones hechos editando la copia (en el admin, por ejemplo)
+    if raw:
+        return
+    valores = getattr(instance, '_valores_db', {})
+    if created or 'status' in valores:
+        registrar_movimientos(
+            [(instance.pk, instance.libro_id, instance.prestatario_id)], valores.get('status'), instance.status, using,
+        )
+
+
+# Contadores de la página de inicio
+
+@receiver(post_save, sender=Libro)
+def libro_guardado(sender, instance, created, using, raw=False, **kwargs):
+    if raw:
+        invalidar_al_confirmar(using)
+        return
+    if created:
+        ajustar_al_confirmar(using, num_books=1, filtro=int(_contiene_filtro(instance.titulo)))
+    else:
+        anterior = _valor_original(instance, 'titulo')
+        if anterior is None:
+            invalidar_al_confirmar(using)
+        else:
+            ajustar_al_confirmar(using, filtro=int(_contiene_filtro(instance.titulo)) - int(_contiene_filtro(anterior)))
+    _recordar_valores(instance, 'titulo')
+
+
+@receiver(post_delete, sender=Libro)
+def libro_eliminado(sender, instance, using, **kwargs):
+    titulo = _valor_original(instance, 'titulo') or instance.titulo
+    ajustar_al_confirmar(using, num_books=-1, filtro=-int(_contiene_filtro(titulo)))
+
+
+@receiver(post_save, sender=PeticionesLibro)
+def peticion_guardada(sender, instance, created, using, raw=False, **kwargs):
+    if raw:
+        invalidar_al_confirmar(using)
+        return
+    disponible = int(instance.status == 'd')
+    if created:
+        ajustar_al_confirmar(using, num_instances=1, num_instances_available=disponible)
+    else:
+        anterior = _valor_original(instance, 'status')
+        if anterior is None:
+            invalidar_al_confirmar(using)
+        else:
+            ajustar_al_confirmar(using, num_instances_available=disponible - int(anterior == 'd'))
+    _recordar_valores(instance, 'status')
+
+
+@receiver(post_delete, sender=PeticionesLibro)
+def peticion_eliminada(sender, instance, using, **kwargs):
+    status = _valor_original(instance, 'status') or instance.status
+    ajustar_al_confirmar(using, num_instances=-1, num_instances_available=-int(status == 'd'))
+
+
+@receiver(libros_modificados_en_lote)
+def invalidar_estadisticas_en_lote(sender, using=None, **kwargs):
+    invalidar_al_confirmar(using)
+
+
+@receiver(status_copia_cambiado)
+def ajustar_disponibles(sender, anterior, nuevo, using=None, **kwargs):
+    ajustar_al_confirmar(using, num_instances_available=int(nuevo == 'd') - int(anterior == 'd'))
+
+
+@receiver(post_save, sender=Autor)
+def autor_guardado(sender, instance, created, using, raw=False, **kwargs):
+    if raw:
+        invalidar_al_confirmar(using)
+    elif created:
+        ajustar_al_confirmar(using, num_authors=1)
+
+
+@receiver(post_delete, sender=Autor)
+def autor_eliminado(sender, instance, using, **kwargs):
+    ajustar_al_confirmar(using, num_authors=-1)
+
+
+@receiver(post_save, sender=Genero)
+def genero_guardado(sender, instance, created, using, raw=False, **kwargs):
+    if raw:
+        invalidar_al_confirmar(using)
+    elif created:
+        ajustar_al_confirmar(using, num_generos=1)
+
+
+@receiver(post_delete, sender=Genero)
+def genero_eliminado(sender, instance, using, **kwargs):
+    ajustar_al_confirmar(using, num_generos=-1)
+
+
+# Índice de búsqueda
+
+@receiver(post_save, sender=Libro)
+def indexar_libro(sender, instance, using, **kwargs):
+    obtener_backend(using).indexar([instance.pk])
+
+
+@receiver(post_delete, sender=Libro)
+def quitar_libro_del_indice(sender, instance, using, **kwargs):
+    obtener_backend(using).quitar([instance.pk])
+
+
+@receiver(m2m_changed, sender=Libro.genero.through)
+def indexar_generos_de_libro(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        ids = [instance.pk]
+    elif pk_set is not None:
+        ids = pk_set
+    else:
+        # post_clear desde el género: ya no se sabe qué libros tenía, se guardaron en pre_clear
+        ids = getattr(instance, '_libros_indexados', [])
+    obtener_backend(using).indexar(ids)
+
+
+@receiver(m2m_changed, sender=Libro.genero.through)
+def recordar_libros_de_genero(sender, instance, action, reverse, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._libros_indexados = list(instance.libro_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Autor)
+@receiver(post_save, sender=Genero)
+def indexar_libros_relacionados(sender, instance, created, using, **kwargs):
+    if not created:
+        obtener_backend(using).indexar(instance.libro_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Autor)
+@receiver(pre_delete, sender=Genero)
+def recordar_libros_relacionados(sender, instance, **kwargs):
+    # Al borrar se anulan/borran las relaciones sin señales por libro: se reindexan en post_delete
+    instance._libros_indexados = list(instance.libro_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Autor)
+@receiver(post_delete, sender=Genero)
+def indexar_libros_de_relacion_eliminada(sender, instance, using, **kwargs):
+    obtener_backend(using).indexar(getattr(instance, '_libros_indexados', []))
+
+
+@receiver(libros_modificados_en_lote)
+def indexar_libros_en_lote(sender, libro_ids, using, solo_copias=False, **kwargs):
+    if not solo_copias:
+        obtener_backend(using).indexar(libro_ids)
+
+
+# Fechas de modificación para las respuestas condicionales (catalogo.condicional).
+# Van antes de las versiones de fragmentos, que actualizan los valores originales recordados.
+
+def _tocar(modelo, pks):
+    pks = {pk for pk in pks if pk is not None}
+    if pks:
+        modelo.objects.filter(pk__in=pks).update(modificado=timezone.now())
+
+
+@receiver(post_save, sender=Libro)
+def tocar_autor_anterior(sender, instance, created, **kwargs):
+    # El autor anterior pierde un libro de su bibliografía
+    anterior = _valor_original(instance, 'autor_id')
+    if not created and anterior != instance.autor_id:
+        _tocar(Autor, [anterior])
+
+
+@receiver(post_delete, sender=Libro)
+def tocar_autor_de_libro_eliminado(sender, instance, **kwargs):
+    _tocar(Autor, [instance.autor_id])
+    marcar_borrado(Libro)
+
+
+@receiver(post_delete, sender=Autor)
+def marcar_autor_eliminado(sender, instance, **kwargs):
+    marcar_borrado(Autor)
+
+
+@receiver(pre_delete, sender=Libro)
+def recordar_libros_que_lo_recomiendan(sender, instance, using, **kwargs):
+    # Al borrar el libro desaparece de las listas de recomendados de otros libros (CASCADE)
+    instance._recomendado_en = list(
+        Recomendacion.objects.using(using).filter(recomendado=instance).values_list('libro_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Libro)
+def tocar_libros_que_lo_recomendaban(sender, instance, **kwargs):
+    _tocar(Libro, getattr(instance, '_recomendado_en', []))
+
+
+@receiver(post_save, sender=PeticionesLibro)
+def tocar_libro_anterior(sender, instance, created, **kwargs):
+    anterior = _valor_original(instance, 'libro_id')
+    if not created and anterior != instance.libro_id:
+        _tocar(Libro, [anterior])
+
+
+@receiver(post_delete, sender=PeticionesLibro)
+def tocar_libro_de_copia_eliminada(sender, instance, **kwargs):
+    _tocar(Libro, [instance.libro_id])
+
+
+@receiver(m2m_changed, sender=Libro.genero.through)
+def tocar_libros_por_generos(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        _tocar(Libro, [instance.pk])
+    elif pk_set is not None:
+        _tocar(Libro, pk_set)
+    else:
+        _tocar(Libro, getattr(instance, '_libros_indexados', []))
+
+
+# Versiones de los fragmentos de plantilla en caché (se incrementan al confirmar la transacción)
+
+def _autores_de(libro_ids):
+    return list(Libro.objects.filter(pk__in=libro_ids).values_list('autor_id', flat=True).distinct())
+
+
+@receiver(post_save, sender=Libro)
+@receiver(post_delete, sender=Libro)
+def versionar_libro(sender, instance, using, **kwargs):
+    fragmentos.incrementar_al_confirmar('libro', instance.pk, using=using)
+    fragmentos.incrementar_al_confirmar(
+        'bibliografia', instance.autor_id, _valor_original(instance, 'autor_id'), using=using,
+    )
+    _recordar_valores(instance, 'autor_id')
+
+
+@receiver(m2m_changed, sender=Libro.genero.through)
+def versionar_generos_de_libro(sender, instance, action, reverse, using, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if reverse:
+            fragmentos.incrementar_al_confirmar('generos', fragmentos.GLOBAL, using=using)
+        else:
+            fragmentos.incrementar_al_confirmar('libro', instance.pk, using=using)
+
+
+@receiver(post_save, sender=PeticionesLibro)
+@receiver(post_delete, sender=PeticionesLibro)
+def versionar_copias(sender, instance, using, **kwargs):
+    libro_ids = {instance.libro_id, _valor_original(instance, 'libro_id')} - {None}
+    fragmentos.incrementar_al_confirmar('copias', *libro_ids, using=using)
+    fragmentos.incrementar_al_confirmar('bibliografia', *_autores_de(libro_ids), using=using)
+    _recordar_valores(instance, 'libro_id')
+
+
+@receiver(status_copia_cambiado)
+def versionar_copias_de_prestamo(sender, libro_id, autor_id, anterior, nuevo, using=None, **kwargs):
+    # catalogo.prestamos envía la señal al confirmar: on_commit la ejecuta en seguida
+    fragmentos.incrementar_al_confirmar('copias', libro_id, using=using)
+    if anterior != nuevo:
+        # La bibliografía del autor muestra las copias disponibles de cada libro
+        fragmentos.incrementar_al_confirmar('bibliografia', autor_id, using=using)
+
+
+@receiver(post_delete, sender=Libro)
+def versionar_recomendaciones_de_libro_eliminado(sender, instance, using, **kwargs):
+    fragmentos.incrementar_al_confirmar('recomendaciones', *getattr(instance, '_recomendado_en', []), using=using)
+
+
+@receiver(recomendaciones_actualizadas)
+def versionar_recomendaciones(sender, libro_ids, using=None, **kwargs):
+    fragmentos.incrementar_al_confirmar('recomendaciones', *libro_ids, using=using)
+
+
+@receiver(post_save, sender=Autor)
+@receiver(post_delete, sender=Autor)
+def versionar_autor(sender, instance, using, **kwargs):
+    fragmentos.incrementar_al_confirmar('autor', instance.pk, using=using)
+    fragmentos.incrementar_al_confirmar('bibliografia', instance.pk, using=using)
+
+
+@receiver(post_save, sender=Genero)
+@receiver(post_delete, sender=Genero)
+def versionar_generos(sender, instance, using, **kwargs):
+    fragmentos.incrementar_al_confirmar('generos', fragmentos.GLOBAL, using=using)
+
+
+@receiver(post_save, sender=Idioma)
+@receiver(post_delete, sender=Idioma)
+def versionar_idiomas(sender, instance, using, **kwargs):
+    fragmentos.incrementar_al_confirmar('idiomas', fragmentos.GLOBAL, using=using)
+
+
+@receiver(libros_modificados_en_lote)
+def versionar_libros_en_lote(sender, libro_ids, using=None, solo_copias=False, **kwargs):
+    fragmentos.incrementar_al_confirmar('copias', *libro_ids, using=using)
+    if not solo_copias:
+        fragmentos.incrementar_al_confirmar('libro', *libro_ids, using=using)
+    fragmentos.incrementar_al_confirmar('bibliografia', *_autores_de(libro_ids), using=using)
+
+
+# Índices de autocompletado (catalogo.autocompletar), al confirmar la transacción como las
+# versiones de fragmentos: antes, otro proceso reconstruiría su índice con las filas viejas
+
+@receiver(post_save, sender=Libro)
+@receiver(post_delete, sender=Libro)
+@receiver(post_save, sender=Autor)
+@receiver(post_delete, sender=Autor)
+@receiver(post_save, sender=Genero)
+@receiver(post_delete, sender=Genero)
+@receiver(post_save, sender=Idioma)
+@receiver(post_delete, sender=Idioma)
+def invalidar_autocompletado(sender, using, **kwargs):
+    nombre = sender._meta.model_name
+    transaction.on_commit(lambda: autocompletar.invalidar(nombre), using=using)
+
+
+@receiver(libros_modificados_en_lote)
+def invalidar_autocompletado_en_lote(sender, using=None, solo_copias=False, **kwargs):
+    if not solo_copias:
+        # Las importaciones crean en lote libros, autores, géneros e idiomas
+        transaction.on_commit(lambda: autocompletar.invalidar(*autocompletar.TIPOS), using=using)
+
+
+# Conexiones a la base de datos
+
+@receiver(connection_created)
+def configurar_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'CATALOGO_SQLITE_PRAGMAS', {})
+    if pragmas:
+        with connection.cursor() as cursor:
+            for nombre, valor in pragmas.items():
+                cursor.execute('PRAGMA %s = %s' % (nombre, valor))
@@ -0,0 +1,69 @@
+/*
+ * Autocompletado de los selectores con data-autocompletar (catalogo.forms.AutocompletarMixin).
+ *
+ * El selector llega solo con las opciones elegidas. Encima se agrega un campo de texto; al
+ * escribir se consulta /catalogo/api/autocompletar/<tipo>/?q= y las opciones no elegidas se
+ * reemplazan por los resultados.
+ */
+(function () {
+  'use strict';
+
+  var ESPERA_MS = 200;
+
+  function iniciar(select) {
+    var campo = document.createElement('input');
+    campo.type = 'search';
+    campo.placeholder = 'Buscar...';
+    campo.autocomplete = 'off';
+    select.parentNode.insertBefore(campo, select);
+
+    var temporizador = null;
+    var ultima = '';
+
+    function mostrar(resultados) {
+      var elegidos = {};
+      Array.prototype.slice.call(select.options).forEach(function (opcion) {
+        if (opcion.value === '' || opcion.selected) {
+          elegidos[opcion.value] = true;
+        } else {
+          select.removeChild(opcion);
+        }
+      });
+      resultados.forEach(function (resultado) {
+        var valor = String(resultado.id);
+        if (!elegidos[valor]) {
+          select.appendChild(new Option(resultado.texto, valor));
+        }
+      });
+    }
+
+    function consultar() {
+      var consulta = campo.value.trim();
+      if (consulta === ultima) {
+        return;
+      }
+      ultima = consulta;
+      if (!consulta) {
+        mostrar([]);
+        return;
+      }
+      fetch(select.dataset.autocompletar + '?q=' + encodeURIComponent(consulta), {credentials: 'same-origin'})
+        .then(function (respuesta) { return respuesta.json(); })
+        .then(function (datos) {
+          // Solo la respuesta de la última consulta escrita
+          if (datos.q.trim() === ultima) {
+            mostrar(datos.resultados);
+          }
+        });
+    }
+
+    campo.addEventListener('input', function () {
+      clearTimeout(temporizador);
+      temporizador = setTimeout(consultar, ESPERA_MS);
+    });
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    Array.prototype.forEach.call(document.querySelectorAll('select[data-autocompletar]'), iniciar);
+  });
+})();
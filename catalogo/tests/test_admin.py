@@ -0,0 +1,60 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from catalogo.models import Autor, Genero, Libro, PeticionesLibro
+from catalogo.paginacion import PaginadorConteoEstimado
+from catalogo.tests.utils import ConsultasConstantesMixin
+
+
+class TestAdminListas(ConsultasConstantesMixin, TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='12345')
+        self.client.login(username='admin', password='12345')
+        self.autor = Autor.objects.create(nombre='Silvina', apellido='Ocampo')
+        self.poesia = Genero.objects.create(nombre='Poesía')
+
+    def crear_libros(self, numero):
+        for _ in range(numero):
+            libro = Libro.objects.create(titulo='La furia', descripcion='-', isbn='9789500000003', autor=self.autor)
+            libro.genero.add(self.poesia)
+            PeticionesLibro.objects.create(libro=libro, editorial='Sur', status='d', prestatario=self.admin)
+
+    def test_listas_con_consultas_constantes(self):
+        self.crear_libros(1)
+        for nombre in ('admin:catalogo_libro_changelist', 'admin:catalogo_peticioneslibro_changelist', 'admin:catalogo_autor_changelist'):
+            self.assertConsultasConstantes(reverse(nombre), lambda: self.crear_libros(3))
+
+    def test_generos_anotados_en_la_lista(self):
+        self.crear_libros(1)
+        self.assertContains(self.client.get(reverse('admin:catalogo_libro_changelist')), 'Poesía')
+
+    def test_conteo_estimado_solo_sin_filtros(self):
+        self.crear_libros(3)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        with connection.cursor() as cursor:
+            # Estadística de una tabla enorme, como la dejaría ANALYZE
+            cursor.execute("UPDATE sqlite_stat1 SET stat = '5000000 1' WHERE tbl = 'catalogo_peticioneslibro'")
+
+        class Paginador(PaginadorConteoEstimado):
+            umbral = 1000
+
+        self.assertEqual(Paginador(PeticionesLibro.objects.all(), 10).count, 5000000)
+        self.assertEqual(Paginador(PeticionesLibro.objects.filter(status='d'), 10).count, 3)
+        self.assertEqual(PaginadorConteoEstimado(PeticionesLibro.objects.all(), 10).count, 5000000)
+
+    def test_inline_de_copias_paginado(self):
+        libro = Libro.objects.create(titulo='Autobiografía de Irene', descripcion='-', isbn='9789500000004', autor=self.autor)
+        PeticionesLibro.objects.bulk_create([PeticionesLibro(libro=libro, editorial='Sur', status='m') for _ in range(25)])
+        url = reverse('admin:catalogo_libro_change', args=[libro.pk])
+
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.context['inline_admin_formsets'][0].formset.initial_form_count(), 20)
+        self.assertContains(respuesta, 'Página 1 de 2 (25 en total)')
+
+        respuesta = self.client.get(url, {'pagina_peticioneslibro': 2})
+        formset = respuesta.context['inline_admin_formsets'][0].formset
+        self.assertEqual(formset.initial_form_count(), 5)
+        self.assertIsNone(formset.url_siguiente)
@@ -0,0 +1,57 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from catalogo.models import Autor, Genero, Idioma, Libro, PeticionesLibro
+
+
+class TestApiAsincrona(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.autor = Autor.objects.create(nombre='Julio', apellido='Cortázar')
+        self.libro = Libro.objects.create(titulo='Rayuela', descripcion='Novela', isbn='9788437604572',
+                                          autor=self.autor, idioma=Idioma.objects.create(nombre='Español'))
+        self.libro.genero.add(Genero.objects.create(nombre='Novela'))
+        for numero in range(25):
+            Libro.objects.create(titulo='Libro %02d' % numero, descripcion='-', isbn='%013d' % numero, autor=self.autor)
+        self.devolucion = datetime.date.today() + datetime.timedelta(days=3)
+        PeticionesLibro.objects.create(libro=self.libro, editorial='Sudamericana', status='d')
+        PeticionesLibro.objects.create(libro=self.libro, editorial='Sudamericana', status='p', devolucion=self.devolucion)
+
+    async def test_lista_de_libros_por_cursor(self):
+        respuesta = await self.async_client.get(reverse('api-libros'))
+        datos = respuesta.json()
+        self.assertEqual(len(datos['resultados']), 20)
+        self.assertIsNone(datos['anterior'])
+
+        siguiente = (await self.async_client.get(reverse('api-libros'), {'cursor': datos['siguiente']})).json()
+        self.assertEqual(len(siguiente['resultados']), 6)
+        self.assertIsNone(siguiente['siguiente'])
+
+    async def test_detalle_de_libro_con_disponibilidad(self):
+        datos = (await self.async_client.get(reverse('api-libro', args=[self.libro.pk]))).json()
+        self.assertEqual(datos['autor']['apellido'], 'Cortázar')
+        self.assertEqual(datos['generos'], ['Novela'])
+        self.assertEqual(datos['idioma'], 'Español')
+        disponibilidad = datos['disponibilidad']
+        self.assertEqual((disponibilidad['copias'], disponibilidad['copias_d'], disponibilidad['copias_p']), (2, 1, 1))
+        self.assertEqual(disponibilidad['proxima_devolucion'], self.devolucion.isoformat())
+
+    async def test_no_existe(self):
+        self.assertEqual((await self.async_client.get(reverse('api-libro', args=[999999]))).status_code, 404)
+        self.assertEqual((await self.async_client.get(reverse('api-disponibilidad', args=[999999]))).status_code, 404)
+
+    async def test_autor_y_busqueda(self):
+        datos = (await self.async_client.get(reverse('api-autor', args=[self.autor.pk]))).json()
+        self.assertEqual(len(datos['libros']), 26)
+        self.assertEqual(datos['libros'][-1], {
+            'id': self.libro.pk, 'titulo': 'Rayuela', 'num_copias': 2, 'disponibles': 1, 'url': self.libro.get_absolute_url(),
+        })
+
+        datos = (await self.async_client.get(reverse('api-buscar'), {'q': 'rayuela'})).json()
+        self.assertEqual([libro['id'] for libro in datos['resultados']], [self.libro.pk])
+
+    def test_funciona_tambien_con_el_cliente_sincrono(self):
+        self.assertEqual(self.client.get(reverse('api-autores')).json()['resultados'][0]['apellido'], 'Cortázar')
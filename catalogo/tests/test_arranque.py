@@ -0,0 +1,52 @@
+import os
+import unittest
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from catalogo import arranque
+
+
+class TestArranque(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.importaciones = arranque.perfil_importacion()
+
+    def test_sin_modulos_pesados_al_arrancar(self):
+        self.assertEqual(arranque.modulos_pesados(self.importaciones), [])
+
+    def test_catalogo_es_una_parte_menor_del_arranque(self):
+        modulos = {importacion.modulo for importacion in self.importaciones}
+        self.assertTrue({'catalogo.models', 'catalogo.admin'} <= modulos)
+        costo = arranque.costo_paquete(self.importaciones, 'catalogo')
+        self.assertLess(costo, arranque.costo_total(self.importaciones) * arranque.PRESUPUESTO_CATALOGO_FRACCION)
+
+    @unittest.skipUnless(os.environ.get('CATALOGO_PRUEBAS_TIEMPOS'), 'Mide tiempo real: CATALOGO_PRUEBAS_TIEMPOS=1')
+    def test_importar_catalogo_dentro_del_presupuesto(self):
+        costo_ms = arranque.costo_paquete(self.importaciones, 'catalogo') / 1000
+        self.assertLess(costo_ms, arranque.PRESUPUESTO_CATALOGO_MS)
+
+    def test_costo_del_paquete_cuenta_lo_anidado_una_vez(self):
+        importaciones = arranque.leer_importtime(
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       100 |        100 |     numpy\n'
+            'import time:        10 |        110 |   catalogo.reportes\n'
+            'import time:        20 |        130 | catalogo.models\n'
+            'import time:         5 |          5 | catalogo.admin\n'
+            'import time:        50 |         50 | django.http\n'
+        )
+        self.assertEqual(importaciones[0], arranque.Importacion('numpy', 100, 100, 2))
+        self.assertEqual(arranque.costo_paquete(importaciones, 'catalogo'), 135)
+        self.assertEqual(arranque.costo_total(importaciones), 185)
+        self.assertEqual(arranque.modulos_pesados(importaciones), ['numpy'])
+
+    def test_import_profile_muestra_los_mas_lentos(self):
+        salida = StringIO()
+        # Con el perfil ya medido en setUpClass, sin otro subproceso
+        with mock.patch('catalogo.management.commands.import_profile.perfil_importacion', return_value=self.importaciones):
+            call_command('import_profile', limite=3, paquete='catalogo', stdout=salida)
+        self.assertIn('catalogo.admin', salida.getvalue())
+        self.assertIn('catalogo:', salida.getvalue())
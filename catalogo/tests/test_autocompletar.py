@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from catalogo import autocompletar, fragmentos
+from catalogo.forms import LibroForm
+from catalogo.models import Autor, Genero, Libro
+
+
+class TestIndicePrefijos(SimpleTestCase):
+    def test_muchas_coincidencias_de_un_prefijo_corto(self):
+        # Cada título tiene dos palabras con "c": cada id aparece dos veces entre las claves
+        filas = [{'pk': pk, 'titulo': 'Cuentos completos %05d' % pk} for pk in range(30000)]
+        indice = autocompletar.IndicePrefijos(filas, autocompletar.TIPOS['libro'])
+        encontrados = indice.buscar('c', None)
+        self.assertEqual(len(encontrados), 30000)
+        self.assertEqual(set(encontrados), set(range(30000)))
+        self.assertEqual(indice.buscar('c', 5), [0, 1, 2, 3, 4])
+
+
+class TestAutocompletar(TestCase):
+    def setUp(self):
+        cache.clear()
+        autocompletar._indices.clear()
+        self.borges = Autor.objects.create(nombre='Jorge Luis', apellido='Borges')
+        self.bioy = Autor.objects.create(nombre='Adolfo', apellido='Bioy Casares')
+        self.ocampo = Autor.objects.create(nombre='Silvina', apellido='Ocampo')
+        self.poesia = Genero.objects.create(nombre='Poesía')
+        self.libro = Libro.objects.create(titulo='El jardín de senderos que se bifurcan', descripcion='-', isbn='9789875664001', autor=self.borges)
+        self.libro.genero.add(self.poesia)
+
+    def test_prefijo_de_cualquier_palabra_sin_acentos(self):
+        self.assertEqual(autocompletar.buscar('autor', 'bo'), [(self.borges.pk, 'Borges, Jorge Luis')])
+        self.assertEqual(autocompletar.buscar('autor', 'luis bor'), [(self.borges.pk, 'Borges, Jorge Luis')])
+        self.assertEqual(autocompletar.buscar('autor', 'CASA'), [(self.bioy.pk, 'Bioy Casares, Adolfo')])
+        self.assertEqual(autocompletar.buscar('libro', 'jardin'), [(self.libro.pk, self.libro.titulo)])
+        self.assertEqual(autocompletar.buscar('genero', 'poes'), [(self.poesia.pk, 'Poesía')])
+        self.assertEqual(autocompletar.buscar('autor', '  '), [])
+        self.assertEqual(autocompletar.buscar_ids_por_palabras('autor', 'borges jor'), {self.borges.pk})
+        self.assertEqual(autocompletar.buscar_ids_por_palabras('autor', 'borges casa'), set())
+
+        # Las búsquedas siguientes no consultan la base de datos
+        with self.assertNumQueries(0):
+            autocompletar.buscar('autor', 'silv')
+
+    def test_guardar_o_borrar_invalida_el_indice(self):
+        self.assertEqual(autocompletar.buscar('autor', 'pizarnik'), [])
+        with self.captureOnCommitCallbacks() as pendientes:
+            pizarnik = Autor.objects.create(nombre='Alejandra', apellido='Pizarnik')
+            # Sin confirmar, el índice no se reconstruye
+            self.assertEqual(autocompletar.buscar('autor', 'pizarnik'), [])
+        for callback in pendientes:
+            callback()
+        self.assertEqual(autocompletar.buscar('autor', 'pizarnik'), [(pizarnik.pk, 'Pizarnik, Alejandra')])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ocampo.delete()
+        self.assertEqual(autocompletar.buscar('autor', 'ocampo'), [])
+
+        # Si otro proceso invalida, este lo ve por la versión en la caché compartida
+        Autor.objects.filter(pk=pizarnik.pk).update(apellido='Pizarnik Bromiker')
+        fragmentos.incrementar('autocompletar', 'autor')
+        self.assertEqual(autocompletar.buscar('autor', 'bromi'), [(pizarnik.pk, 'Pizarnik Bromiker, Alejandra')])
+
+    def test_tablas_grandes_se_buscan_en_la_base_de_datos(self):
+        with mock.patch.object(autocompletar, 'MAX_ENTRADAS', 2):
+            autocompletar.invalidar('autor')
+            self.assertIsNone(autocompletar.buscar_ids('autor', 'bo'))
+            self.assertEqual(
+                autocompletar.buscar('autor', 'b'),
+                [(self.bioy.pk, 'Bioy Casares, Adolfo'), (self.borges.pk, 'Borges, Jorge Luis')],
+            )
+            self.assertEqual(autocompletar.buscar('autor', 'silvina'), [(self.ocampo.pk, 'Ocampo, Silvina')])
+            self.assertIsNone(autocompletar.buscar_ids_por_palabras('autor', 'bo'))
+
+    def test_api_json(self):
+        respuesta = self.client.get(reverse('api-autocompletar', args=['autor']), {'q': 'b', 'limite': 1})
+        self.assertEqual(respuesta.json(), {'q': 'b', 'resultados': [{'id': self.bioy.pk, 'texto': 'Bioy Casares, Adolfo'}]})
+        self.assertEqual(self.client.get(reverse('api-autocompletar', args=['copia']), {'q': 'b'}).status_code, 404)
+
+    def test_formulario_de_libro_solo_incluye_las_opciones_elegidas(self):
+        html = LibroForm(instance=self.libro).as_p()
+        self.assertIn('data-autocompletar="%s"' % reverse('api-autocompletar', args=['autor']), html)
+        self.assertIn('Borges, Jorge Luis', html)
+        self.assertIn('Poesía', html)
+        self.assertNotIn('Ocampo', html)
+        self.assertIn('js/autocompletar', str(LibroForm().media))
+
+    def test_busqueda_del_admin_usa_el_indice(self):
+        User.objects.create_superuser(username='admin', password='clave-admin-1')
+        self.client.login(username='admin', password='clave-admin-1')
+        respuesta = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'catalogo', 'model_name': 'libro', 'field_name': 'autor', 'term': 'casa',
+        })
+        self.assertEqual([resultado['id'] for resultado in respuesta.json()['results']], [str(self.bioy.pk)])
+        for termino in ('jorge bor', 'borges jorge'):
+            respuesta = self.client.get(reverse('admin:autocomplete'), {
+                'app_label': 'catalogo', 'model_name': 'libro', 'field_name': 'autor', 'term': termino,
+            })
+            self.assertEqual([resultado['id'] for resultado in respuesta.json()['results']], [str(self.borges.pk)])
+
+        respuesta = self.client.get(reverse('admin:catalogo_libro_changelist'), {'q': 'senderos'})
+        self.assertContains(respuesta, 'El jardín de senderos')
+        respuesta = self.client.get(reverse('admin:catalogo_libro_changelist'), {'q': '9789875664001'})
+        self.assertContains(respuesta, 'El jardín de senderos')
@@ -0,0 +1,64 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from catalogo.busqueda import buscar_libros, obtener_backend
+from catalogo.models import Autor, Genero, Libro
+
+
+class TestBusquedaLibros(TestCase):
+    def setUp(self):
+        self.tolkien = Autor.objects.create(nombre='John Ronald', apellido='Tolkien')
+        self.fantasia = Genero.objects.create(nombre='Fantasía')
+        self.anillos = Libro.objects.create(titulo='El Señor de los Anillos', descripcion='Una comunidad viaja a Mordor.', isbn='9788445073728', autor=self.tolkien)
+        self.anillos.genero.add(self.fantasia)
+        self.hobbit = Libro.objects.create(titulo='El Hobbit', descripcion='Bilbo encuentra un anillo.', isbn='9788445073735', autor=self.tolkien)
+        Libro.objects.create(titulo='Rayuela', descripcion='Novela de Cortázar.', isbn='9788437604572')
+
+    def ids(self, consulta):
+        return [libro.pk for libro in buscar_libros(consulta)[0:10]]
+
+    def test_busca_por_titulo_descripcion_isbn_autor_y_genero(self):
+        self.assertEqual(self.ids('hobbit'), [self.hobbit.pk])
+        self.assertEqual(self.ids('mordor'), [self.anillos.pk])
+        self.assertEqual(self.ids('9788445073735'), [self.hobbit.pk])
+        self.assertEqual(sorted(self.ids('tolkien')), sorted([self.anillos.pk, self.hobbit.pk]))
+        self.assertEqual(self.ids('fantasia'), [self.anillos.pk])
+
+    def test_coincidencia_en_titulo_tiene_mayor_rango(self):
+        self.assertEqual(self.ids('anillo'), [self.anillos.pk, self.hobbit.pk])
+
+    def test_indice_se_sincroniza_con_los_cambios(self):
+        self.hobbit.titulo = 'The Hobbit, or There and Back Again'
+        self.hobbit.save()
+        self.assertEqual(self.ids('again'), [self.hobbit.pk])
+
+        self.tolkien.apellido = 'Tolkien Suffield'
+        self.tolkien.save()
+        self.assertEqual(len(self.ids('suffield')), 2)
+
+        self.fantasia.delete()
+        self.assertEqual(self.ids('fantasia'), [])
+
+        self.hobbit.delete()
+        self.assertEqual(self.ids('again'), [])
+
+    def test_reindexar_busqueda(self):
+        obtener_backend().vaciar()
+        self.assertEqual(self.ids('hobbit'), [])
+        call_command('reindexar_busqueda', stdout=StringIO())
+        self.assertEqual(self.ids('hobbit'), [self.hobbit.pk])
+
+    def test_vista_de_busqueda_paginada(self):
+        respuesta = self.client.get(reverse('buscar'), {'q': 'tolkien'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTemplateUsed(respuesta, 'catalogo/libro_busqueda.html')
+        self.assertEqual(respuesta.context['paginator'].count, 2)
+        self.assertEqual(len(respuesta.context['libro_list']), 2)
+
+    def test_vista_de_busqueda_sin_consulta(self):
+        respuesta = self.client.get(reverse('buscar'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.context['libro_list']), 0)
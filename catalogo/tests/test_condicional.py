@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from catalogo import prestamos
+from catalogo.models import Autor, Genero, Libro, PeticionesLibro
+
+
+class TestRespuestasCondicionales(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.autor = Autor.objects.create(nombre='Alejandra', apellido='Pizarnik')
+        self.libro = Libro.objects.create(titulo='Árbol de Diana', descripcion='Poemas', isbn='9789500000001', autor=self.autor)
+        self.copia = PeticionesLibro.objects.create(libro=self.libro, editorial='Sur', status='d')
+        self.url_libro = reverse('libro_detail', args=[self.libro.pk])
+
+    def condicional(self, url, respuesta, **extra):
+        return self.client.get(
+            url, HTTP_IF_NONE_MATCH=respuesta['ETag'], HTTP_IF_MODIFIED_SINCE=respuesta['Last-Modified'], **extra
+        )
+
+    def test_304_sin_renderizar_mientras_no_cambie_nada(self):
+        respuesta = self.client.get(self.url_libro)
+        self.assertTrue(respuesta.has_header('ETag'))
+        self.assertTrue(respuesta.has_header('Last-Modified'))
+        with self.assertNumQueries(1):
+            condicional = self.condicional(self.url_libro, respuesta)
+        self.assertEqual(condicional.status_code, 304)
+        self.assertEqual(condicional.content, b'')
+
+    def test_prestamo_de_copia_cambia_la_pagina(self):
+        respuesta = self.client.get(self.url_libro)
+        with self.captureOnCommitCallbacks(execute=True):
+            prestamos.prestar(self.copia.pk, User.objects.create_user(username='lector'))
+        condicional = self.condicional(self.url_libro, respuesta)
+        self.assertEqual(condicional.status_code, 200)
+        self.assertContains(condicional, 'Prestado')
+
+    def test_copia_eliminada_cambia_la_pagina(self):
+        respuesta = self.client.get(self.url_libro)
+        self.copia.delete()
+        self.assertEqual(self.condicional(self.url_libro, respuesta).status_code, 200)
+
+    def test_generos_cambian_la_pagina(self):
+        respuesta = self.client.get(self.url_libro)
+        self.libro.genero.add(Genero.objects.create(nombre='Poesía'))
+        self.assertEqual(self.condicional(self.url_libro, respuesta).status_code, 200)
+
+    def test_autor_renombrado_cambia_el_libro_y_la_lista(self):
+        url_libros = reverse('libros')
+        libro = self.client.get(self.url_libro)
+        lista = self.client.get(url_libros)
+        self.assertEqual(self.condicional(url_libros, lista).status_code, 304)
+        self.autor.apellido = 'Pizarnik Bromiker'
+        self.autor.save()
+        self.assertEqual(self.condicional(self.url_libro, libro).status_code, 200)
+        self.assertEqual(self.condicional(url_libros, lista).status_code, 200)
+
+    def test_la_etag_depende_del_usuario(self):
+        anonima = self.client.get(self.url_libro)
+        User.objects.create_user(username='lector', password='12345')
+        self.client.login(username='lector', password='12345')
+        self.assertEqual(self.client.get(self.url_libro, HTTP_IF_NONE_MATCH=anonima['ETag']).status_code, 200)
+
+    def test_libro_eliminado_cambia_las_listas(self):
+        otro = Libro.objects.create(titulo='Extracción de la piedra de locura', descripcion='-', isbn='9789500000002', autor=self.autor)
+        url_libros, url_autor = reverse('libros'), reverse('autor_detail', args=[self.autor.pk])
+        lista, autor = self.client.get(url_libros), self.client.get(url_autor)
+        otro.delete()
+        self.assertEqual(self.condicional(url_libros, lista).status_code, 200)
+        self.assertEqual(self.condicional(url_autor, autor).status_code, 200)
+
+    def test_inexistente_sigue_dando_404(self):
+        self.assertEqual(self.client.get(reverse('libro_detail', args=[999999])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('autor_detail', args=[999999])).status_code, 404)
@@ -0,0 +1,64 @@
+import datetime
+
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from catalogo import recomendaciones
+from catalogo.models import Autor, Genero, Idioma, Libro, PeticionesLibro
+from catalogo.tests.utils import ConsultasConstantesMixin
+
+
+class TestConsultasConstantes(ConsultasConstantesMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user(username='bibliotecario', password='12345')
+        self.usuario.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.usuario.is_staff = True
+        self.usuario.save()
+
+        self.idioma = Idioma.objects.create(nombre='Español')
+        self.autor = Autor.objects.create(nombre='Jorge Luis', apellido='Borges')
+        self.libro = self.crear_libro()
+        self.crear_copias(self.libro, 1)
+
+    def crear_libro(self):
+        libro = Libro.objects.create(titulo='Ficciones', descripcion='Cuentos', isbn='9789875666474', autor=self.autor, idioma=self.idioma)
+        libro.genero.add(Genero.objects.create(nombre='Cuento'))
+        return libro
+
+    def crear_copias(self, libro, numero, status='p'):
+        for dias in range(numero):
+            PeticionesLibro.objects.create(
+                libro=libro,
+                editorial='Sur',
+                status=status,
+                prestatario=self.usuario,
+                devolucion=datetime.date.today() + datetime.timedelta(days=dias),
+            )
+
+    def agregar_libros_con_copias(self):
+        for _ in range(4):
+            self.crear_copias(self.crear_libro(), 2)
+
+    def test_lista_de_libros(self):
+        self.assertConsultasConstantes(reverse('libros'), self.agregar_libros_con_copias)
+
+    def test_detalle_de_libro(self):
+        def agregar_copias_generos_y_recomendados():
+            self.crear_copias(self.libro, 5)
+            self.libro.genero.add(Genero.objects.create(nombre='Ensayo'))
+            recomendaciones.guardar({}, {self.libro.pk: [(self.crear_libro().pk, 2, 0.5) for _ in range(3)]})
+        self.assertConsultasConstantes(reverse('libro_detail', args=[self.libro.pk]), agregar_copias_generos_y_recomendados, num=5)
+
+    def test_detalle_de_autor(self):
+        self.assertConsultasConstantes(reverse('autor_detail', args=[self.autor.pk]), self.agregar_libros_con_copias, num=3)
+
+    def test_mis_prestamos(self):
+        self.client.login(username='bibliotecario', password='12345')
+        self.assertConsultasConstantes(reverse('mis-prestamos'), self.agregar_libros_con_copias)
+
+    def test_todos_los_prestamos(self):
+        self.client.login(username='bibliotecario', password='12345')
+        self.assertConsultasConstantes(reverse('lista-prestamos'), self.agregar_libros_con_copias)
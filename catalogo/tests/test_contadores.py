@@ -0,0 +1,73 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from catalogo import prestamos
+from catalogo.models import Autor, Libro, PeticionesLibro
+
+
+class TestContadoresDeCopias(TestCase):
+    def setUp(self):
+        self.autor = Autor.objects.create(nombre='Juan', apellido='Rulfo')
+        self.libro = Libro.objects.create(titulo='Pedro Páramo', descripcion='-', isbn='9786071600000', autor=self.autor)
+        self.otro = Libro.objects.create(titulo='El llano en llamas', descripcion='-', isbn='9786071600001', autor=self.autor)
+
+    def contadores(self, libro):
+        return Libro.objects.values_list(*Libro.CONTADORES_COPIAS).get(pk=libro.pk)
+
+    def test_crear_cambiar_mover_y_eliminar_copias(self):
+        copia = PeticionesLibro.objects.create(libro=self.libro, editorial='FCE', status='d')
+        PeticionesLibro.objects.create(libro=self.libro, editorial='FCE', status='m')
+        self.assertEqual(self.contadores(self.libro), (2, 1, 0, 0, 1))
+
+        copia.status = 'r'
+        copia.save()
+        self.assertEqual(self.contadores(self.libro), (2, 0, 0, 1, 1))
+
+        copia.libro = self.otro
+        copia.save()
+        self.assertEqual(self.contadores(self.libro), (1, 0, 0, 0, 1))
+        self.assertEqual(self.contadores(self.otro), (1, 0, 0, 1, 0))
+
+        PeticionesLibro.objects.get(pk=copia.pk).delete()
+        self.assertEqual(self.contadores(self.otro), (0, 0, 0, 0, 0))
+
+    def test_prestamo_y_devolucion(self):
+        copia = PeticionesLibro.objects.create(libro=self.libro, editorial='FCE', status='d')
+        prestamos.prestar(copia.pk, User.objects.create_user(username='lector'))
+        self.assertEqual(self.contadores(self.libro), (1, 0, 1, 0, 0))
+        prestamos.devolver(copia.pk)
+        self.assertEqual(self.contadores(self.libro), (1, 1, 0, 0, 0))
+
+    def test_guardar_el_libro_no_pisa_los_contadores(self):
+        leido = Libro.objects.get(pk=self.libro.pk)
+        PeticionesLibro.objects.create(libro=self.libro, editorial='FCE', status='d')
+        leido.titulo = 'Pedro Páramo (edición crítica)'
+        leido.save()
+        self.assertEqual(self.contadores(self.libro), (1, 1, 0, 0, 0))
+
+    def test_recount_copies_corrige_solo_los_desfasados(self):
+        PeticionesLibro.objects.create(libro=self.libro, editorial='FCE', status='p')
+        PeticionesLibro.objects.create(libro=self.otro, editorial='FCE', status='d')
+        # update() no pasa por las señales: el contador queda desfasado
+        PeticionesLibro.objects.filter(libro=self.libro).update(status='d')
+        Libro.objects.filter(pk=self.otro.pk).update(copias_total=7)
+
+        salida = StringIO()
+        call_command('recount_copies', lote=1, stdout=salida)
+        self.assertIn('2 libros corregidos', salida.getvalue())
+        self.assertEqual(self.contadores(self.libro), (1, 1, 0, 0, 0))
+        self.assertEqual(self.contadores(self.otro), (1, 1, 0, 0, 0))
+
+        salida = StringIO()
+        call_command('recount_copies', stdout=salida)
+        self.assertIn('0 libros corregidos', salida.getvalue())
+
+    def test_las_listas_muestran_la_disponibilidad(self):
+        PeticionesLibro.objects.create(libro=self.libro, editorial='FCE', status='d')
+        PeticionesLibro.objects.create(libro=self.libro, editorial='FCE', status='p')
+        self.assertContains(self.client.get(reverse('libros')), '1 de 2 disponibles')
+        self.assertContains(self.client.get(reverse('autor_detail', args=[self.autor.pk])), '(1 de 2 disponibles)')
@@ -0,0 +1,67 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from catalogo import prestamos
+from catalogo.models import Autor, Libro, PeticionesLibro
+
+
+class TestDisponibilidadEnLote(TestCase):
+    def setUp(self):
+        cache.clear()
+        autor = Autor.objects.create(nombre='Clarice', apellido='Lispector')
+        self.libros = [
+            Libro.objects.create(titulo='Libro %d' % numero, descripcion='-', isbn='978000000000%d' % numero, autor=autor)
+            for numero in range(3)
+        ]
+        self.devolucion = datetime.date.today() + datetime.timedelta(days=4)
+        self.copia = PeticionesLibro.objects.create(libro=self.libros[0], editorial='Rocco', status='d')
+        PeticionesLibro.objects.create(libro=self.libros[0], editorial='Rocco', status='p', devolucion=self.devolucion)
+        PeticionesLibro.objects.create(libro=self.libros[1], editorial='Rocco', status='m')
+        self.url = reverse('api-disponibilidad-lote')
+
+    def ids(self, *libros):
+        return ','.join(str(libro.pk) for libro in libros)
+
+    def test_una_consulta_agrupada(self):
+        with self.assertNumQueries(1):
+            datos = self.client.get(self.url, {'ids': self.ids(*self.libros) + ',999999'}).json()
+        primero, segundo, tercero = datos['libros']
+        self.assertEqual((primero['copias'], primero['copias_d'], primero['copias_p']), (2, 1, 1))
+        self.assertEqual(primero['proxima_devolucion'], self.devolucion.isoformat())
+        self.assertEqual(segundo['copias_m'], 1)
+        self.assertEqual((tercero['copias'], tercero['proxima_devolucion']), (0, None))
+        self.assertEqual(datos['no_encontrados'], {'ids': [999999], 'isbns': []})
+
+    def test_por_isbn(self):
+        datos = self.client.get(self.url, {'isbn': [self.libros[2].isbn, '9789999999999']}).json()
+        self.assertEqual([libro['id'] for libro in datos['libros']], [self.libros[2].pk])
+        self.assertEqual(datos['no_encontrados']['isbns'], ['9789999999999'])
+
+    def test_304_sin_consultas_mientras_no_cambie_nada(self):
+        respuesta = self.client.get(self.url, {'ids': self.ids(*self.libros)})
+        etag = respuesta['ETag']
+        with self.assertNumQueries(0):
+            respuesta = self.client.get(self.url, {'ids': self.ids(*self.libros)}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            prestamos.prestar(self.copia.pk, User.objects.create_user(username='lector'))
+        respuesta = self.client.get(self.url, {'ids': self.ids(*self.libros)}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        self.assertEqual(respuesta.json()['libros'][0]['copias_p'], 2)
+
+    def test_304_por_isbn_con_el_hash_de_la_respuesta(self):
+        etag = self.client.get(self.url, {'isbn': self.libros[0].isbn})['ETag']
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(self.url, {'isbn': self.libros[0].isbn}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_peticiones_invalidas(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'ids': 'uno'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'ids': ','.join(str(n) for n in range(300))}).status_code, 400)
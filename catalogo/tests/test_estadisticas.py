@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalogo.estadisticas import calcular_estadisticas, obtener_estadisticas
+from catalogo.models import Autor, Genero, Libro, PeticionesLibro
+
+
+class TestEstadisticas(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.autor = Autor.objects.create(nombre='John', apellido='Tolkien')
+        Genero.objects.create(nombre='Fantasia')
+        self.libro = Libro.objects.create(titulo='El Señor de los Anillos', descripcion='Resumen', isbn='123', autor=self.autor)
+        Libro.objects.create(titulo='El Hobbit', descripcion='Resumen', isbn='456', autor=self.autor)
+        self.copia = PeticionesLibro.objects.create(libro=self.libro, editorial='Minotauro', status='d')
+        PeticionesLibro.objects.create(libro=self.libro, editorial='Minotauro', status='m')
+
+    def test_calcula_todos_los_contadores_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            estadisticas = calcular_estadisticas()
+        self.assertEqual(estadisticas, {
+            'num_books': 2,
+            'num_instances': 2,
+            'num_instances_available': 1,
+            'num_authors': 1,
+            'num_generos': 1,
+            'filtro': 1,
+        })
+
+    def test_lectura_en_cache_no_consulta_la_base_de_datos(self):
+        obtener_estadisticas()
+        with self.assertNumQueries(0):
+            obtener_estadisticas()
+
+    def test_index_no_consulta_tablas_del_catalogo_con_cache_caliente(self):
+        self.client.get(reverse('index'))
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('index'))
+        self.assertEqual(respuesta.context['num_books'], 2)
+        self.assertFalse([c['sql'] for c in consultas if 'catalogo_' in c['sql']])
+
+    def test_senales_actualizan_los_contadores_de_forma_incremental(self):
+        obtener_estadisticas()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Libro.objects.create(titulo='Anillos de poder', descripcion='Resumen', isbn='789', autor=self.autor)
+            self.copia.status = 'p'
+            self.copia.save()
+            copia = PeticionesLibro.objects.get(status='m')
+            copia.status = 'd'
+            copia.save()
+            Genero.objects.create(nombre='Poesia')
+            Libro.objects.get(titulo='El Hobbit').delete()
+
+        with self.assertNumQueries(0):
+            estadisticas = obtener_estadisticas()
+        self.assertEqual(estadisticas, calcular_estadisticas())
+
+    def test_una_transaccion_revertida_no_ajusta_los_contadores(self):
+        antes = obtener_estadisticas()
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Libro.objects.create(titulo='Anillos de poder', descripcion='Resumen', isbn='789', autor=self.autor)
+                    Autor.objects.create(nombre='Ursula', apellido='Le Guin')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(obtener_estadisticas(), antes)
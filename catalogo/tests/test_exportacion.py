@@ -0,0 +1,55 @@
+import csv
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from catalogo.models import Autor, Genero, Idioma, Libro, PeticionesLibro
+
+
+class TestExportarCatalogo(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username='socio', password='12345')
+        autor = Autor.objects.create(nombre='Rosario', apellido='Castellanos')
+        idioma = Idioma.objects.create(nombre='Español')
+        libro = Libro.objects.create(titulo='Balún Canán', descripcion='Novela', isbn='9786071600257', autor=autor, idioma=idioma)
+        libro.genero.add(Genero.objects.create(nombre='Novela'), Genero.objects.create(nombre='Indigenista'))
+        for status in ['d', 'd', 'p', 'm']:
+            PeticionesLibro.objects.create(libro=libro, editorial='FCE', status=status)
+        Libro.objects.create(titulo='Oficio de tinieblas', descripcion='Novela', isbn='9786071600264', autor=autor)
+
+    def test_comando_exporta_jsonl_con_bloques_pequenos(self):
+        salida = StringIO()
+        call_command('export_catalogo', formato='jsonl', lote=1, stdout=salida)
+        filas = [json.loads(linea) for linea in salida.getvalue().splitlines()]
+
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(filas[0]['autor'], 'Castellanos, Rosario')
+        self.assertEqual(filas[0]['generos'], ['Indigenista', 'Novela'])
+        self.assertEqual(
+            [filas[0][c] for c in ['copias', 'disponibles', 'prestadas', 'reservadas', 'mantenimiento']],
+            [4, 2, 1, 0, 1],
+        )
+        self.assertEqual(filas[1]['copias'], 0)
+        self.assertEqual(filas[1]['generos'], [])
+
+    def test_vista_requiere_usuario_autenticado(self):
+        respuesta = self.client.get(reverse('exportar_catalogo'))
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertTrue(respuesta.url.startswith('/accounts/login/'))
+
+    def test_vista_transmite_csv(self):
+        self.client.login(username='socio', password='12345')
+        respuesta = self.client.get(reverse('exportar_catalogo'), {'formato': 'csv'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+        self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+
+        contenido = b''.join(respuesta.streaming_content).decode('utf-8')
+        filas = list(csv.DictReader(StringIO(contenido)))
+        self.assertEqual([fila['titulo'] for fila in filas], ['Balún Canán', 'Oficio de tinieblas'])
+        self.assertEqual(filas[0]['generos'], 'Indigenista|Novela')
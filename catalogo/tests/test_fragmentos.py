@@ -0,0 +1,84 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from catalogo import fragmentos
+from catalogo.models import Autor, Genero, Idioma, Libro, PeticionesLibro
+
+
+class TestFragmentosEnCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.autor = Autor.objects.create(nombre='Gabriela', apellido='Mistral')
+        self.libro = Libro.objects.create(titulo='Desolación', descripcion='Poemas', isbn='9789561124963',
+                                          autor=self.autor, idioma=Idioma.objects.create(nombre='Español'))
+        self.genero = Genero.objects.create(nombre='Poesía')
+        self.libro.genero.add(self.genero)
+        self.copia = PeticionesLibro.objects.create(libro=self.libro, editorial='Nascimento', status='d')
+
+    def detalle_libro(self):
+        return self.client.get(reverse('libro_detail', args=[self.libro.pk])).content.decode()
+
+    def detalle_autor(self):
+        return self.client.get(reverse('autor_detail', args=[self.autor.pk])).content.decode()
+
+    def test_fragmentos_en_cache_no_consultan_generos_ni_copias(self):
+        # La consulta de Last-Modified (condicional.py) más la del libro o autor
+        self.detalle_libro()
+        with self.assertNumQueries(2):
+            self.detalle_libro()
+        self.detalle_autor()
+        with self.assertNumQueries(2):
+            self.detalle_autor()
+
+    def test_cambio_de_copia_invalida_copias_y_bibliografia(self):
+        self.assertIn('Disponible', self.detalle_libro())
+        self.assertIn('(1 de 1 disponibles)', self.detalle_autor())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.copia.status = 'm'
+            self.copia.save()
+            PeticionesLibro.objects.create(libro=self.libro, editorial='Nascimento', status='m')
+
+        self.assertNotIn('Disponible', self.detalle_libro())
+        self.assertIn('(0 de 2 disponibles)', self.detalle_autor())
+
+    def test_cambios_de_libro_autor_y_genero_invalidan_la_cabecera(self):
+        self.detalle_libro()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.libro.titulo = 'Ternura'
+            self.libro.save()
+        self.assertIn('Ternura', self.detalle_libro())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.autor.nombre = 'Lucila'
+            self.autor.save()
+        self.assertIn('Mistral, Lucila', self.detalle_libro())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.genero.nombre = 'Lírica'
+            self.genero.save()
+        self.assertIn('Lírica', self.detalle_libro())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.libro.genero.add(Genero.objects.create(nombre='Infantil'))
+        self.assertIn('Infantil', self.detalle_libro())
+
+    def test_la_version_cambia_al_confirmar(self):
+        # Hasta el COMMIT una lectura simultánea ve las filas viejas: no debe ver la versión nueva
+        antes = fragmentos.versiones(libro=self.libro.pk)
+        with self.captureOnCommitCallbacks() as pendientes:
+            self.libro.titulo = 'Ternura'
+            self.libro.save()
+            self.assertEqual(fragmentos.versiones(libro=self.libro.pk), antes)
+        for callback in pendientes:
+            callback()
+        self.assertNotEqual(fragmentos.versiones(libro=self.libro.pk), antes)
+
+    def test_version_desalojada_no_sirve_fragmentos_viejos(self):
+        self.detalle_libro()
+        # Simula el desalojo de la versión: el fragmento viejo sigue en caché
+        cache.delete('catalogo:version:libro:%s' % self.libro.pk)
+        Libro.objects.filter(pk=self.libro.pk).update(titulo='Tala')
+        self.assertIn('Tala', self.detalle_libro())
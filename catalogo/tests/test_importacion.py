@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from catalogo.busqueda import buscar_libros
+from catalogo.models import Autor, Genero, Idioma, Libro, PeticionesLibro
+
+LIBROS_CSV = '''titulo,descripcion,isbn,autor_nombre,autor_apellido,idioma,generos
+Ficciones,Cuentos,9789875666474,Jorge Luis,Borges,Español,Cuento|Fantasía
+El Aleph,Cuentos,9789875666481,Jorge Luis,Borges,Español,Cuento
+Rayuela,Novela,9788437604572,Julio,Cortázar,Español,Novela
+Bestiario,Cuentos,9788466331890,Julio,Cortázar,Español,Cuento|Fantasía
+Pedro Páramo,Novela,9788437604183,Juan,Rulfo,Español,Novela
+'''
+
+
+class TestImportarCatalogo(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+
+    def archivo(self, nombre, contenido):
+        ruta = os.path.join(self.directorio.name, nombre)
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            archivo.write(contenido)
+        return ruta
+
+    def importar(self, *args, **opciones):
+        call_command('import_catalogo', *args, stdout=StringIO(), **opciones)
+
+    def test_importa_libros_con_autores_idiomas_y_generos(self):
+        self.importar(self.archivo('libros.csv', LIBROS_CSV), lote=2)
+
+        self.assertEqual(Libro.objects.count(), 5)
+        self.assertEqual(Autor.objects.count(), 3)
+        self.assertEqual(Idioma.objects.count(), 1)
+        self.assertEqual(Genero.objects.count(), 3)
+        ficciones = Libro.objects.get(isbn='9789875666474')
+        self.assertEqual(str(ficciones.autor), 'Borges, Jorge Luis')
+        self.assertEqual(sorted(g.nombre for g in ficciones.genero.all()), ['Cuento', 'Fantasía'])
+        # bulk_create no dispara señales: el lote se indexa explícitamente
+        self.assertEqual([libro.pk for libro in buscar_libros('rulfo')[0:10]], [Libro.objects.get(titulo='Pedro Páramo').pk])
+
+    def test_importa_copias_jsonl(self):
+        self.importar(self.archivo('libros.csv', LIBROS_CSV))
+        User.objects.create_user(username='lector', password='12345')
+        copias = [
+            {'isbn': '9788437604572', 'editorial': 'Cátedra', 'status': 'p', 'devolucion': '2030-01-15', 'prestatario': 'lector'},
+            {'isbn': '9788437604572', 'editorial': 'Cátedra', 'status': 'd'},
+        ]
+        self.importar(self.archivo('copias.jsonl', '\n'.join(json.dumps(c) for c in copias)), tipo='copias')
+
+        self.assertEqual(PeticionesLibro.objects.count(), 2)
+        prestada = PeticionesLibro.objects.get(status='p')
+        self.assertEqual(prestada.prestatario.username, 'lector')
+        self.assertEqual(prestada.libro.titulo, 'Rayuela')
+
+    def test_reanuda_desde_el_punto_de_control(self):
+        contenido = LIBROS_CSV.replace('Bestiario,', ',')
+        ruta = self.archivo('libros.csv', contenido)
+        with self.assertRaises(CommandError):
+            self.importar(ruta, lote=2)
+        # El primer lote se escribió; el segundo (con la fila inválida) se revirtió
+        self.assertEqual(Libro.objects.count(), 2)
+
+        self.archivo('libros.csv', LIBROS_CSV)
+        self.importar(ruta, lote=2, reanudar=True)
+        self.assertEqual(Libro.objects.count(), 5)
+        self.assertEqual(Libro.objects.filter(titulo='Ficciones').count(), 1)
+        self.assertFalse(os.path.exists(ruta + '.checkpoint'))
+
+    def test_linea_jsonl_invalida(self):
+        filas = [json.dumps({'titulo': titulo}) for titulo in ('Ficciones', 'El Aleph', 'Rayuela')]
+        filas.insert(2, '{"titulo": "Bestiario",')
+        ruta = self.archivo('libros.jsonl', '\n'.join(filas))
+        with self.assertRaisesMessage(CommandError, 'Línea 3: JSON inválido'):
+            self.importar(ruta, lote=2)
+        self.assertEqual(Libro.objects.count(), 2)
+
+        filas[2] = json.dumps({'titulo': 'Bestiario'})
+        self.archivo('libros.jsonl', '\n'.join(filas))
+        self.importar(ruta, lote=2, reanudar=True)
+        self.assertEqual(Libro.objects.count(), 4)
+
+    def test_campos_jsonl_que_no_son_texto(self):
+        filas = [
+            {'titulo': 1984, 'isbn': 9788499890944, 'autor_nombre': 'George', 'autor_apellido': 'Orwell', 'generos': ['Novela', 7]},
+            {'titulo': 'Ficciones', 'autor_nombre': ['Jorge Luis']},
+        ]
+        ruta = self.archivo('libros.jsonl', '\n'.join(json.dumps(fila) for fila in filas))
+        with self.assertRaisesMessage(CommandError, 'Fila 2: autor_nombre debe ser un texto, no ["Jorge Luis"]'):
+            self.importar(ruta)
+        self.assertEqual(Libro.objects.count(), 0)
+
+        filas[1]['autor_nombre'] = 'Jorge Luis'
+        self.archivo('libros.jsonl', '\n'.join(json.dumps(fila) for fila in filas))
+        self.importar(ruta)
+        libro = Libro.objects.get(titulo='1984')
+        self.assertEqual(libro.isbn, '9788499890944')
+        self.assertEqual(sorted(g.nombre for g in libro.genero.all()), ['7', 'Novela'])
+
+        ruta = self.archivo('copias.jsonl', json.dumps({'isbn': 9788499890944, 'editorial': 'Debolsillo', 'status': True}))
+        with self.assertRaisesMessage(CommandError, 'Fila 1: status debe ser un texto, no true'):
+            self.importar(ruta, tipo='copias')
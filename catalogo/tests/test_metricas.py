@@ -0,0 +1,78 @@
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from catalogo.metricas import Histograma, registro
+from catalogo.middleware import MetricasRendimientoMiddleware
+from catalogo.models import Autor, Libro
+
+
+class TestHistograma(SimpleTestCase):
+    def test_percentiles_con_error_acotado(self):
+        histograma = Histograma()
+        for valor in range(1, 1001):
+            histograma.agregar(valor)
+        for p, esperado in ((50, 500), (95, 950), (99, 990)):
+            self.assertAlmostEqual(histograma.percentil(p), esperado, delta=esperado * 0.2)
+        self.assertEqual(histograma.percentil(100), 1000)
+
+    def test_vacio(self):
+        self.assertIsNone(Histograma().percentil(50))
+
+
+@override_settings(CATALOGO_METRICAS_MUESTREO=1)
+class TestMetricasRendimientoMiddleware(TestCase):
+    def setUp(self):
+        cache.clear()
+        registro.reiniciar()
+        autor = Autor.objects.create(nombre='Gabriela', apellido='Mistral')
+        Libro.objects.create(titulo='Desolación', descripcion='Poemas', isbn='9789561124963', autor=autor)
+
+    def test_cabecera_server_timing(self):
+        respuesta = self.client.get(reverse('libros'))
+        tiempos = respuesta['Server-Timing']
+        self.assertIn('total;dur=', tiempos)
+        self.assertIn('db;dur=', tiempos)
+        self.assertIn('plantilla;dur=', tiempos)
+
+    def test_agrega_por_nombre_de_url(self):
+        for _ in range(3):
+            self.client.get(reverse('index'))
+        self.client.get(reverse('libros'))
+
+        resumen = registro.resumen()
+        self.assertEqual(resumen['index']['total_ms']['n'], 3)
+        self.assertEqual(resumen['index']['plantilla_ms']['n'], 3)
+        self.assertGreater(resumen['libros']['consultas']['max'], 0)
+        self.assertGreater(resumen['libros']['bytes']['p50'], 0)
+
+    async def test_peticiones_asincronas(self):
+        async def vista(request):
+            return None
+
+        # Con una cadena asíncrona el middleware es asíncrono: Django no lo adapta con sync_to_async
+        self.assertTrue(iscoroutinefunction(MetricasRendimientoMiddleware(vista)))
+        respuesta = await self.async_client.get(reverse('api-libros'))
+        self.assertRegex(respuesta['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* consultas"')
+        self.assertEqual(registro.resumen()['api-libros']['total_ms']['n'], 1)
+
+    def test_endpoint_solo_para_staff(self):
+        url = reverse('metricas-rendimiento')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        User.objects.create_user(username='staff', password='clave-staff-1', is_staff=True)
+        self.client.login(username='staff', password='clave-staff-1')
+        self.client.get(reverse('libros'))
+        datos = self.client.get(url).json()
+        self.assertIn('p95', datos['vistas']['libros']['total_ms'])
+
+
+class TestMetricasDesactivadas(TestCase):
+    @override_settings(CATALOGO_METRICAS_MUESTREO=0)
+    def test_sin_muestreo_no_mide(self):
+        registro.reiniciar()
+        respuesta = self.client.get(reverse('index'))
+        self.assertNotIn('Server-Timing', respuesta)
+        self.assertEqual(registro.resumen(), {})
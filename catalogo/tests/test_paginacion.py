@@ -0,0 +1,91 @@
+import datetime
+
+from django.contrib.auth.models import Permission, User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalogo.models import Autor, Libro, PeticionesLibro
+from catalogo.paginacion import PaginadorCursor
+
+
+class TestPaginadorCursor(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        libro = Libro.objects.create(titulo='Pedro Páramo', descripcion='Novela', isbn='9788437604183')
+        hoy = datetime.date.today()
+        # Fechas repetidas y nulas para probar el desempate por id y el orden de los NULL
+        for numero in range(23):
+            devolucion = None if numero % 7 == 0 else hoy + datetime.timedelta(days=numero % 4)
+            PeticionesLibro.objects.create(libro=libro, editorial='Cátedra', status='p', devolucion=devolucion)
+
+    def esperado(self):
+        copias = list(PeticionesLibro.objects.all())
+        return sorted(copias, key=lambda c: (c.devolucion is None, c.devolucion or datetime.date.min, c.id))
+
+    def test_recorre_todas_las_paginas_hacia_adelante_y_atras(self):
+        paginador = PaginadorCursor(PeticionesLibro.objects.all(), 5, ('devolucion', 'id'))
+
+        paginas = [paginador.page()]
+        self.assertFalse(paginas[0].has_previous())
+        while paginas[-1].has_next():
+            paginas.append(paginador.page(paginas[-1].cursor_siguiente))
+        self.assertEqual([c for pagina in paginas for c in pagina], self.esperado())
+        self.assertEqual(len(paginas), 5)
+
+        regreso = [paginas[-1]]
+        while regreso[-1].has_previous():
+            regreso.append(paginador.page(regreso[-1].cursor_anterior))
+        self.assertEqual([list(p) for p in reversed(regreso)], [list(p) for p in paginas])
+
+    def test_orden_descendente(self):
+        paginador = PaginadorCursor(PeticionesLibro.objects.all(), 4, ('-id',))
+        vistos = []
+        pagina = paginador.page()
+        vistos.extend(pagina)
+        while pagina.has_next():
+            pagina = paginador.page(pagina.cursor_siguiente)
+            vistos.extend(pagina)
+        self.assertEqual([c.id for c in vistos], sorted((c.id for c in self.esperado()), reverse=True))
+
+
+class TestPaginacionCursorEnVistas(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for numero in range(5):
+            Autor.objects.create(nombre='Nombre %d' % numero, apellido='Apellido')
+
+        usuario = User.objects.create_user(username='bibliotecario', password='12345')
+        usuario.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        libro = Libro.objects.create(titulo='Aura', descripcion='Novela', isbn='9789684110107')
+        for dias in range(25):
+            PeticionesLibro.objects.create(libro=libro, editorial='Era', status='p', prestatario=usuario,
+                                           devolucion=datetime.date.today() + datetime.timedelta(days=dias))
+
+    def test_siguiente_pagina_con_cursor(self):
+        respuesta = self.client.get(reverse('autores'))
+        pagina = respuesta.context['page_obj']
+        self.assertTrue(respuesta.context['is_paginated'])
+        self.assertTrue(pagina.has_next())
+
+        respuesta = self.client.get(reverse('autores'), {'cursor': pagina.cursor_siguiente})
+        self.assertEqual([a.nombre for a in respuesta.context['autor_list']], ['Nombre 2', 'Nombre 3'])
+
+    def test_urls_con_page_siguen_funcionando(self):
+        respuesta = self.client.get(reverse('autores') + '?page=3')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([a.nombre for a in respuesta.context['autor_list']], ['Nombre 4'])
+
+    def test_cursor_invalido_devuelve_404(self):
+        respuesta = self.client.get(reverse('autores'), {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(respuesta.status_code, 404)
+
+    def test_prestamos_sin_count(self):
+        self.client.login(username='bibliotecario', password='12345')
+        respuesta = self.client.get(reverse('lista-prestamos'))
+        cursor = respuesta.context['page_obj'].cursor_siguiente
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('lista-prestamos'), {'cursor': cursor})
+        self.assertEqual(len(respuesta.context['peticioneslibro_list']), 10)
+        self.assertFalse([c['sql'] for c in consultas if 'COUNT(' in c['sql']])
@@ -0,0 +1,231 @@
+import datetime
+import threading
+
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalogo import fragmentos, prestamos
+from catalogo.estadisticas import obtener_estadisticas
+from catalogo.models import Autor, Libro, PeticionesLibro, Reserva
+
+
+def crear_libro():
+    autor = Autor.objects.create(nombre='Juan', apellido='Rulfo')
+    return Libro.objects.create(titulo='Pedro Páramo', descripcion='Novela', isbn='9788437604183', autor=autor)
+
+
+class TestServicioPrestamos(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.lector = User.objects.create_user(username='lector', password='clave-lector-1')
+        self.libro = crear_libro()
+        self.copia = PeticionesLibro.objects.create(libro=self.libro, editorial='FCE', status='d')
+
+    def test_prestar_y_devolver(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            copia = prestamos.prestar(self.copia.pk, self.lector)
+        self.assertEqual(copia.status, 'p')
+        self.assertEqual(copia.prestatario, self.lector)
+        self.assertEqual(copia.devolucion, datetime.date.today() + prestamos.PLAZO_PRESTAMO)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            copia = prestamos.devolver(self.copia.pk)
+        self.assertEqual((copia.status, copia.prestatario, copia.devolucion), ('d', None, None))
+
+    def test_no_presta_dos_veces(self):
+        prestamos.prestar(self.copia.pk, self.lector)
+        otro = User.objects.create_user(username='otro', password='clave-otro-1')
+        with self.assertRaises(prestamos.CopiaNoDisponible):
+            prestamos.prestar(self.copia.pk, otro)
+        self.assertEqual(PeticionesLibro.objects.get(pk=self.copia.pk).prestatario, self.lector)
+
+    def test_no_renueva_ni_devuelve_una_copia_disponible(self):
+        with self.assertRaises(prestamos.CopiaNoPrestada):
+            prestamos.renovar(self.copia.pk, datetime.date.today())
+        with self.assertRaises(prestamos.CopiaNoPrestada):
+            prestamos.devolver(self.copia.pk)
+
+    def test_renovar_solo_escribe_la_fecha(self):
+        prestamos.prestar(self.copia.pk, self.lector)
+        fecha = datetime.date.today() + datetime.timedelta(days=10)
+        with CaptureQueriesContext(connection) as consultas:
+            prestamos.renovar(self.copia.pk, fecha)
+        update = next(consulta['sql'] for consulta in consultas if consulta['sql'].startswith('UPDATE'))
+        self.assertIn('"devolucion"', update)
+        self.assertNotIn('"editorial"', update)
+        self.assertNotIn('"prestatario_id" =', update)
+
+    def test_actualiza_contadores_y_fragmentos_al_confirmar(self):
+        disponibles = obtener_estadisticas()['num_instances_available']
+        version = fragmentos.versiones(copias=self.libro.pk)['copias']
+        with self.captureOnCommitCallbacks(execute=True):
+            prestamos.prestar(self.copia.pk, self.lector)
+        self.assertEqual(obtener_estadisticas()['num_instances_available'], disponibles - 1)
+        self.assertNotEqual(fragmentos.versiones(copias=self.libro.pk)['copias'], version)
+
+
+class TestEndpointsPrestamos(TestCase):
+    def setUp(self):
+        self.lector = User.objects.create_user(username='lector', password='clave-lector-1')
+        bibliotecario = User.objects.create_user(username='bibliotecario', password='clave-biblio-1')
+        bibliotecario.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.copia = PeticionesLibro.objects.create(libro=crear_libro(), editorial='FCE', status='d')
+        self.client.login(username='bibliotecario', password='clave-biblio-1')
+
+    def test_prestar_devolver_renovar(self):
+        respuesta = self.client.post(reverse('api-prestar', args=[self.copia.pk]), {'prestatario': 'lector'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['prestatario'], 'lector')
+
+        self.assertEqual(self.client.post(reverse('api-prestar', args=[self.copia.pk]), {'prestatario': 'lector'}).status_code, 409)
+
+        fecha = datetime.date.today() + datetime.timedelta(days=7)
+        respuesta = self.client.post(reverse('api-renovar', args=[self.copia.pk]), {'fecha_renovacion': fecha})
+        self.assertEqual(respuesta.json()['devolucion'], fecha.isoformat())
+
+        respuesta = self.client.post(reverse('api-devolver', args=[self.copia.pk]))
+        self.assertEqual(respuesta.json()['status'], 'd')
+
+    def test_errores(self):
+        self.assertEqual(self.client.get(reverse('api-devolver', args=[self.copia.pk])).status_code, 405)
+        self.assertEqual(self.client.post(reverse('api-prestar', args=[self.copia.pk]), {'prestatario': 'nadie'}).status_code, 400)
+        self.assertEqual(self.client.post(reverse('api-devolver', args=['00000000-0000-0000-0000-000000000000'])).status_code, 404)
+
+        self.client.login(username='lector', password='clave-lector-1')
+        self.assertEqual(self.client.post(reverse('api-devolver', args=[self.copia.pk])).status_code, 403)
+
+
+class TestOperacionesEnLote(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bibliotecario = User.objects.create_superuser(username='bibliotecario', password='clave-biblio-1')
+        self.lector = User.objects.create_user(username='lector', password='clave-lector-1')
+        self.libro = crear_libro()
+        self.vence = datetime.date.today() + datetime.timedelta(days=2)
+        self.prestadas = [
+            PeticionesLibro.objects.create(libro=self.libro, editorial='FCE', status='p', prestatario=self.lector, devolucion=self.vence)
+            for _ in range(5)
+        ]
+        self.disponible = PeticionesLibro.objects.create(libro=self.libro, editorial='FCE', status='d')
+        self.todas = [copia.pk for copia in self.prestadas] + [self.disponible.pk]
+
+    def contadores(self):
+        return Libro.objects.values_list('copias_disponibles', 'copias_prestadas', 'copias_mantenimiento').get(pk=self.libro.pk)
+
+    def test_renovar_en_lote_con_un_update(self):
+        nueva = datetime.date.today() + datetime.timedelta(weeks=2)
+        with CaptureQueriesContext(connection) as consultas, self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(prestamos.renovar_en_lote(self.todas, nueva), 5)
+        self.assertEqual(sum(consulta['sql'].startswith('UPDATE "catalogo_peticioneslibro"') for consulta in consultas.captured_queries), 1)
+        self.assertEqual(set(PeticionesLibro.objects.filter(status='p').values_list('devolucion', flat=True)), {nueva})
+        self.assertIsNone(PeticionesLibro.objects.get(pk=self.disponible.pk).devolucion)
+
+    def test_devolver_y_mantenimiento_ajustan_contadores(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(prestamos.devolver_en_lote(PeticionesLibro.objects.filter(pk__in=self.todas[:3])), 3)
+        self.assertEqual(self.contadores(), (4, 2, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(prestamos.enviar_a_mantenimiento(self.todas), 4)
+        self.assertEqual(self.contadores(), (0, 2, 4))
+
+    def test_devolver_en_lote_atiende_las_reservas(self):
+        reserva = prestamos.reservar(self.libro.pk, User.objects.create_user(username='otro'))
+        self.assertEqual(Reserva.objects.get(pk=reserva.pk).estado, 'a')
+        segunda = prestamos.reservar(self.libro.pk, User.objects.create_user(username='tercero'))
+        prestamos.devolver_en_lote(self.todas)
+        self.assertEqual(Reserva.objects.get(pk=segunda.pk).estado, 'a')
+        self.assertEqual(self.contadores(), (4, 0, 0))
+
+    def test_acciones_del_admin(self):
+        self.client.login(username='bibliotecario', password='clave-biblio-1')
+        url = reverse('admin:catalogo_peticioneslibro_changelist')
+        datos = {'action': 'renovar_prestamos', 'select_across': '0', 'index': '0', '_selected_action': self.todas}
+        respuesta = self.client.post(url, datos)
+        self.assertContains(respuesta, 'fecha_renovacion')
+
+        nueva = datetime.date.today() + datetime.timedelta(weeks=4)
+        datos = {'action': 'renovar_prestamos', 'select_across': '0', 'post': 'yes', '_selected_action': self.todas}
+        self.client.post(url, dict(datos, fecha_renovacion=(nueva + datetime.timedelta(days=1)).isoformat()))
+        self.assertFalse(PeticionesLibro.objects.filter(devolucion=nueva + datetime.timedelta(days=1)).exists())
+        self.assertRedirects(self.client.post(url, dict(datos, fecha_renovacion=nueva.isoformat())), url)
+        self.assertEqual(PeticionesLibro.objects.filter(devolucion=nueva).count(), 5)
+
+        self.client.post(url, {'action': 'marcar_devueltas', 'select_across': '1', 'index': '0', '_selected_action': self.todas[:1]})
+        self.assertFalse(PeticionesLibro.objects.filter(status='p').exists())
+
+    def test_pagina_de_renovacion_del_bibliotecario(self):
+        self.client.login(username='bibliotecario', password='clave-biblio-1')
+        nueva = datetime.date.today() + datetime.timedelta(weeks=3)
+        respuesta = self.client.post(reverse('renovar-prestamos'), {
+            'fecha_renovacion': nueva.isoformat(), 'copias': [str(pk) for pk in self.todas[:2]],
+        })
+        self.assertRedirects(respuesta, reverse('lista-prestamos'), fetch_redirect_response=False)
+        self.assertEqual(PeticionesLibro.objects.filter(devolucion=nueva).count(), 2)
+        self.assertContains(self.client.get(reverse('lista-prestamos')), '2 préstamos renovados')
+
+        respuesta = self.client.post(reverse('renovar-prestamos'), {'fecha_renovacion': nueva.isoformat(), 'vencen_hasta': self.vence.isoformat()})
+        self.assertRedirects(respuesta, reverse('lista-prestamos'))
+        self.assertEqual(PeticionesLibro.objects.filter(devolucion=nueva).count(), 5)
+
+        # Con vencen_hasta no se adelanta ninguna devolución
+        anterior = datetime.date.today() + datetime.timedelta(days=1)
+        respuesta = self.client.post(reverse('renovar-prestamos'), {'fecha_renovacion': anterior.isoformat(), 'vencen_hasta': nueva.isoformat()})
+        self.assertContains(respuesta, 'Debe ser anterior a la fecha de renovación.')
+        self.assertEqual(PeticionesLibro.objects.filter(devolucion=nueva).count(), 5)
+
+        respuesta = self.client.post(reverse('renovar-prestamos'), {'fecha_renovacion': (nueva - datetime.timedelta(weeks=5)).isoformat(), 'copias': [str(self.todas[0])]})
+        self.assertContains(respuesta, 'renovación en el pasado')
+        self.assertEqual(self.client.post(reverse('renovar-prestamos'), {'fecha_renovacion': nueva.isoformat()}).status_code, 200)
+
+
+class TestPrestamosConcurrentes(TransactionTestCase):
+    """
+    Varios hilos (cada uno con su propia conexión) intentan prestar las mismas copias a la vez.
+    """
+
+    hilos = 8
+
+    def test_cada_copia_se_presta_una_sola_vez(self):
+        libro = crear_libro()
+        copias = [PeticionesLibro.objects.create(libro=libro, editorial='FCE', status='d').pk for _ in range(3)]
+        lectores = [User.objects.create_user(username='lector%d' % numero) for numero in range(self.hilos)]
+
+        barrera = threading.Barrier(self.hilos)
+        exitos = []
+        fallos = []
+
+        def mostrador(lector):
+            try:
+                barrera.wait()
+                for pk in copias:
+                    while True:
+                        try:
+                            prestamos.prestar(pk, lector)
+                            exitos.append((pk, lector.pk))
+                        except prestamos.CopiaNoDisponible:
+                            fallos.append(pk)
+                        except OperationalError as error:
+                            # La base de pruebas SQLite en memoria (caché compartida) no espera al
+                            # bloqueo como busy_timeout: responde "table is locked" y se reintenta.
+                            if 'locked' not in str(error):
+                                raise
+                            continue
+                        break
+            finally:
+                connection.close()
+
+        trabajadores = [threading.Thread(target=mostrador, args=(lector,)) for lector in lectores]
+        for hilo in trabajadores:
+            hilo.start()
+        for hilo in trabajadores:
+            hilo.join()
+
+        self.assertEqual(sorted(pk for pk, _ in exitos), sorted(copias))
+        self.assertEqual(len(fallos), len(copias) * (self.hilos - 1))
+        for pk, lector in exitos:
+            copia = PeticionesLibro.objects.get(pk=pk)
+            self.assertEqual((copia.status, copia.prestatario_id), ('p', lector))
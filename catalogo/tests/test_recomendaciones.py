@@ -0,0 +1,92 @@
+import random
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from catalogo import prestamos, recomendaciones
+from catalogo.models import Autor, Libro, PeticionesLibro, Recomendacion
+
+
+class TestCalculoRecomendaciones(SimpleTestCase):
+    def test_coocurrencia_normalizada(self):
+        # A y B comparten dos lectores; A y C, uno
+        pares = [(1, 'A'), (1, 'B'), (2, 'A'), (2, 'B'), (2, 'C'), (3, 'C')]
+        pares = [(usuario, ord(libro)) for usuario, libro in pares]
+        popularidad, vecinos = recomendaciones.calcular(pares, usar_numpy=False)
+        self.assertEqual(popularidad, {ord('A'): 2, ord('B'): 2, ord('C'): 2})
+        self.assertEqual(vecinos[ord('A')], [(ord('B'), 2, 1.0), (ord('C'), 1, 0.5)])
+
+    def test_numpy_y_python_coinciden(self):
+        aleatorio = random.Random(7)
+        pares = [(aleatorio.randrange(60), aleatorio.randrange(40)) for _ in range(600)]
+        pares += [(99, libro) for libro in range(10)]
+        with mock.patch.object(recomendaciones, 'MAX_LIBROS_POR_LECTOR', 9):
+            con_numpy = recomendaciones.calcular(pares, vecinos=4, usar_numpy=True)
+            sin_numpy = recomendaciones.calcular(pares, vecinos=4, usar_numpy=False)
+            todos = recomendaciones.calcular(pares, vecinos=100)[1]
+            sin_lector_99 = recomendaciones.calcular(pares[:-10], vecinos=100)[1]
+        self.assertEqual(con_numpy, sin_numpy)
+        # El lector 99 (10 libros) cuenta para la popularidad, pero no aporta lectores en común
+        comunes = lambda listas: {(libro, otro, cantidad) for libro, lista in listas.items() for otro, cantidad, _ in lista}
+        self.assertEqual(comunes(todos), comunes(sin_lector_99))
+
+
+class TestRecomendacionesGuardadas(TestCase):
+    def setUp(self):
+        cache.clear()
+        autor = Autor.objects.create(nombre='Elena', apellido='Garro')
+        self.libros = [
+            Libro.objects.create(titulo=titulo, descripcion='-', isbn='978607160000%d' % i, autor=autor)
+            for i, titulo in enumerate(['Los recuerdos del porvenir', 'La semana de colores', 'Testimonios sobre Mariana'])
+        ]
+        self.lectores = [User.objects.create_user(username='lector%d' % i) for i in range(3)]
+
+    def prestar(self, lector, libro):
+        copia = PeticionesLibro.objects.create(libro=libro, editorial='Joaquín Mortiz', status='d')
+        prestamos.prestar(copia.pk, lector)
+        prestamos.devolver(copia.pk)
+
+    def recalcular(self):
+        salida = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('recalcular_recomendaciones', stdout=salida)
+        return salida.getvalue()
+
+    def test_lista_en_la_pagina_del_libro_y_libros_populares(self):
+        recuerdos, semana, testimonios = self.libros
+        for lector in self.lectores:
+            self.prestar(lector, recuerdos)
+        self.prestar(self.lectores[0], semana)
+        self.prestar(self.lectores[1], semana)
+        self.prestar(self.lectores[2], testimonios)
+
+        self.assertIn('3 libros actualizados', self.recalcular())
+        self.assertEqual(Libro.objects.get(pk=recuerdos.pk).popularidad, 3)
+        self.assertEqual(
+            list(Recomendacion.objects.filter(libro=recuerdos).values_list('recomendado_id', 'posicion', 'lectores')),
+            [(semana.pk, 1, 2), (testimonios.pk, 2, 1)],
+        )
+        respuesta = self.client.get(reverse('libro_detail', args=[semana.pk]))
+        self.assertContains(respuesta, 'tambien pidieron')
+        self.assertContains(respuesta, 'Los recuerdos del porvenir')
+
+        populares = self.client.get(reverse('libros-populares'))
+        self.assertEqual([libro.pk for libro in populares.context['libro_list']], [recuerdos.pk, semana.pk, testimonios.pk])
+        self.assertIn('0 libros actualizados', self.recalcular())
+
+    def test_borrar_un_recomendado_invalida_la_lista(self):
+        recuerdos, semana, _ = self.libros
+        self.prestar(self.lectores[0], recuerdos)
+        self.prestar(self.lectores[0], semana)
+        self.recalcular()
+        url = reverse('libro_detail', args=[recuerdos.pk])
+        self.assertContains(self.client.get(url), 'La semana de colores')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            semana.delete()
+        self.assertNotContains(self.client.get(url), 'La semana de colores')
@@ -0,0 +1,128 @@
+import datetime
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import Permission, User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from catalogo import prestamos, reportes
+from catalogo.models import Autor, Genero, Libro, MovimientoPrestamo, PeticionesLibro, ResumenDiario
+from catalogo.resumenes import actualizar_resumenes, ranking, serie_diaria
+
+
+class TestResumenesDiarios(TestCase):
+    def setUp(self):
+        self.hoy = timezone.localdate()
+        self.lector = User.objects.create_user(username='lector')
+        self.autor = Autor.objects.create(nombre='Rosario', apellido='Castellanos')
+        self.novela = Genero.objects.create(nombre='Novela')
+        self.libro = Libro.objects.create(titulo='Balún Canán', descripcion='-', isbn='9786071600002', autor=self.autor)
+        self.libro.genero.add(self.novela)
+        self.copias = [PeticionesLibro.objects.create(libro=self.libro, editorial='FCE', status='d') for _ in range(3)]
+
+    def resumen(self, dimension='t', clave=0, fecha=None):
+        return ResumenDiario.objects.values_list('prestamos', 'devoluciones', 'vencidos').get(
+            dimension=dimension, clave=clave, fecha=fecha or self.hoy,
+        )
+
+    def test_prestamos_y_devoluciones_quedan_registrados(self):
+        for copia in self.copias:
+            prestamos.prestar(copia.pk, self.lector)
+        prestamos.devolver(self.copias[0].pk)
+        prestamos.devolver_en_lote([self.copias[1].pk])
+        prestamos.enviar_a_mantenimiento([self.copias[0].pk])
+        # Un cambio de status hecho guardando la copia (como en el admin)
+        copia = PeticionesLibro.objects.get(pk=self.copias[2].pk)
+        copia.status = 'd'
+        copia.save()
+
+        tipos = sorted(MovimientoPrestamo.objects.values_list('tipo', flat=True))
+        self.assertEqual(tipos, ['d', 'd', 'd', 'p', 'p', 'p'])
+        self.assertEqual(set(MovimientoPrestamo.objects.values_list('libro_id', flat=True)), {self.libro.pk})
+
+    def test_actualizacion_incremental(self):
+        ayer = self.hoy - datetime.timedelta(days=1)
+        prestamos.prestar(self.copias[0].pk, self.lector, devolucion=ayer)
+        prestamos.prestar(self.copias[1].pk, self.lector)
+        MovimientoPrestamo.objects.filter(copia=self.copias[0]).update(fecha=ayer)
+
+        self.assertEqual(actualizar_resumenes()[0], ayer)
+        self.assertEqual(self.resumen(fecha=ayer), (1, 0, 0))
+        self.assertEqual(self.resumen(), (1, 0, 1))
+        self.assertEqual(self.resumen('g', self.novela.pk), (1, 0, 1))
+        self.assertEqual(self.resumen('a', self.autor.pk), (1, 0, 1))
+
+        # La segunda vez solo se recuenta desde el último día resumido, sin duplicar
+        prestamos.devolver(self.copias[1].pk)
+        self.assertEqual(actualizar_resumenes()[0], self.hoy)
+        self.assertEqual(self.resumen(fecha=ayer), (1, 0, 0))
+        self.assertEqual(self.resumen(), (1, 1, 1))
+
+    def test_series_y_ranking_desde_los_resumenes(self):
+        prestamos.prestar(self.copias[0].pk, self.lector)
+        actualizar_resumenes()
+        desde = self.hoy - datetime.timedelta(days=2)
+
+        with self.assertNumQueries(1):
+            fechas, series = serie_diaria(desde, self.hoy)
+        self.assertEqual(fechas[0], desde)
+        self.assertEqual(series['prestamos'], [0, 0, 1])
+        self.assertEqual(ranking('g', desde, self.hoy), [('Novela', 1)])
+        self.assertEqual(ranking('a', desde, self.hoy), [('Castellanos, Rosario', 1)])
+
+
+class TestGraficos(SimpleTestCase):
+    def test_grafico_en_png(self):
+        self.assertTrue(reportes.grafico_barras(['d', 'p'], [3, 1], titulo='Copias').startswith(b'\x89PNG'))
+
+
+class TestGraficosCirculacion(TestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        configuracion = override_settings(CATALOGO_REPORTES_DIR=directorio.name)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        self.directorio = directorio.name
+
+        self.bibliotecario = User.objects.create_user(username='bibliotecario', password='clave-biblio-1')
+        self.bibliotecario.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        libro = Libro.objects.create(titulo='Oficio de tinieblas', descripcion='-', isbn='9786071600003')
+        prestamos.prestar(PeticionesLibro.objects.create(libro=libro, editorial='FCE', status='d').pk, self.bibliotecario)
+
+    def test_actualizar_resumenes_genera_los_graficos(self):
+        # Uno anterior que se reemplaza y otro de un periodo que ya no se dibuja
+        for nombre in ('circulacion-%d.png' % reportes.PERIODO_PREDETERMINADO, 'circulacion-7.png'):
+            with open(os.path.join(self.directorio, nombre), 'wb') as archivo:
+                archivo.write(b'viejo')
+
+        salida = StringIO()
+        call_command('actualizar_resumenes', stdout=salida)
+        total = len(reportes.GRAFICOS) * len(reportes.PERIODOS) * len(reportes.FORMATOS)
+        self.assertIn('%d gráficos generados' % total, salida.getvalue())
+        self.assertEqual(len(os.listdir(self.directorio)), total)
+        with open(reportes.ruta_grafico('circulacion', reportes.PERIODO_PREDETERMINADO, 'png'), 'rb') as archivo:
+            self.assertTrue(archivo.read().startswith(b'\x89PNG'))
+        with open(reportes.ruta_grafico('autores', 30, 'svg'), 'rb') as archivo:
+            self.assertIn(b'<svg', archivo.read())
+
+    def test_vista_de_graficos_solo_para_bibliotecarios(self):
+        url = reverse('reporte-grafico', args=['circulacion', 'svg'])
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.login(username='bibliotecario', password='clave-biblio-1')
+        self.assertContains(self.client.get(reverse('reportes')), 'Géneros más prestados')
+        respuesta = self.client.get(url, {'dias': 3650})
+        self.assertEqual(respuesta['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', b''.join(respuesta.streaming_content))
+        self.assertTrue(os.path.exists(reportes.ruta_grafico('circulacion', 3650, 'svg')))
+
+        respuesta = self.client.get(url, {'dias': 3650}, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(self.client.get(url, {'dias': 7}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('reporte-grafico', args=['otro', 'png'])).status_code, 404)
@@ -0,0 +1,114 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalogo import prestamos
+from catalogo.models import Autor, Libro, PeticionesLibro, Reserva
+
+
+class TestColaDeReservas(TestCase):
+    def setUp(self):
+        autor = Autor.objects.create(nombre='Juan', apellido='Rulfo')
+        self.libro = Libro.objects.create(titulo='Pedro Páramo', descripcion='Novela', isbn='9788437604183', autor=autor)
+        self.lectores = [
+            User.objects.create_user(username='lector%d' % numero, email='lector%d@example.com' % numero)
+            for numero in range(3)
+        ]
+        self.prestatario = User.objects.create_user(username='prestatario')
+        self.copia = PeticionesLibro.objects.create(libro=self.libro, editorial='FCE', status='d')
+        prestamos.prestar(self.copia.pk, self.prestatario)
+
+    def copia_actual(self):
+        return PeticionesLibro.objects.get(pk=self.copia.pk)
+
+    def test_devolucion_aparta_la_copia_para_la_reserva_mas_antigua(self):
+        reservas = [prestamos.reservar(self.libro.pk, lector) for lector in self.lectores]
+        self.assertEqual([prestamos.posicion_en_cola(reserva) for reserva in reservas], [1, 2, 3])
+
+        prestamos.devolver(self.copia.pk)
+        copia = self.copia_actual()
+        self.assertEqual((copia.status, copia.prestatario), ('r', self.lectores[0]))
+        self.assertEqual(copia.devolucion, datetime.date.today() + prestamos.PLAZO_RECOGIDA)
+        self.assertEqual(Reserva.objects.get(pk=reservas[0].pk).estado, 'a')
+        self.assertEqual(prestamos.posicion_en_cola(reservas[1]), 1)
+
+    def test_solo_el_titular_de_la_reserva_puede_llevarse_la_copia_apartada(self):
+        reserva = prestamos.reservar(self.libro.pk, self.lectores[0])
+        prestamos.devolver(self.copia.pk)
+
+        with self.assertRaises(prestamos.CopiaNoDisponible):
+            prestamos.prestar(self.copia.pk, self.lectores[1])
+        prestamos.prestar(self.copia.pk, self.lectores[0])
+        self.assertEqual(self.copia_actual().status, 'p')
+        self.assertEqual(Reserva.objects.get(pk=reserva.pk).estado, 't')
+
+    def test_una_reserva_activa_por_usuario_y_libro(self):
+        prestamos.reservar(self.libro.pk, self.lectores[0])
+        with self.assertRaises(prestamos.ReservaInvalida):
+            prestamos.reservar(self.libro.pk, self.lectores[0])
+
+    def test_cancelar_o_vencer_pasa_la_copia_al_siguiente(self):
+        primera = prestamos.reservar(self.libro.pk, self.lectores[0])
+        prestamos.reservar(self.libro.pk, self.lectores[1])
+        prestamos.reservar(self.libro.pk, self.lectores[2])
+        prestamos.devolver(self.copia.pk)
+
+        self.assertEqual(prestamos.cancelar_reserva(primera.pk, self.lectores[0]).estado, 'c')
+        self.assertEqual(self.copia_actual().prestatario, self.lectores[1])
+
+        vencimiento = datetime.date.today() + prestamos.PLAZO_RECOGIDA + datetime.timedelta(days=1)
+        self.assertEqual(prestamos.vencer_reservas(vencimiento), 1)
+        self.assertEqual(self.copia_actual().prestatario, self.lectores[2])
+
+        prestamos.vencer_reservas(vencimiento)
+        copia = self.copia_actual()
+        self.assertEqual((copia.status, copia.prestatario), ('d', None))
+
+    def test_reserva_con_copia_disponible_se_asigna_de_inmediato(self):
+        PeticionesLibro.objects.create(libro=self.libro, editorial='Cátedra', status='d')
+        reserva = prestamos.reservar(self.libro.pk, self.lectores[0])
+        self.assertEqual(reserva.estado, 'a')
+
+    def test_devolucion_no_recorre_la_cola(self):
+        Reserva.objects.bulk_create(Reserva(libro=self.libro, usuario=User.objects.create_user(username='u%d' % numero)) for numero in range(200))
+        with CaptureQueriesContext(connection) as consultas:
+            prestamos.devolver(self.copia.pk)
+        lecturas = [c['sql'] for c in consultas if c['sql'].startswith('SELECT') and 'FROM "catalogo_reserva"' in c['sql']]
+        self.assertTrue(lecturas)
+        for sql in lecturas:
+            self.assertIn('LIMIT 1', sql)
+
+    def test_notificar_reservas_en_lote(self):
+        for lector in self.lectores:
+            prestamos.reservar(self.libro.pk, lector)
+        for numero in range(2):
+            copia = PeticionesLibro.objects.create(libro=self.libro, editorial='FCE', status='p', prestatario=self.prestatario)
+            prestamos.devolver(copia.pk)
+        prestamos.devolver(self.copia.pk)
+
+        call_command('notificar_reservas', lote=2, stdout=StringIO())
+        self.assertEqual(sorted(mensaje.to[0] for mensaje in mail.outbox), ['lector%d@example.com' % n for n in range(3)])
+        self.assertFalse(Reserva.objects.filter(estado='a', notificada__isnull=True).exists())
+
+        call_command('notificar_reservas', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_endpoints(self):
+        self.client.force_login(self.lectores[0])
+        respuesta = self.client.post(reverse('api-reservar', args=[self.libro.pk]))
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.json()['posicion'], 1)
+        self.assertEqual(self.client.post(reverse('api-reservar', args=[self.libro.pk])).status_code, 409)
+
+        reserva = respuesta.json()['id']
+        self.client.force_login(self.lectores[1])
+        self.assertEqual(self.client.post(reverse('api-cancelar-reserva', args=[reserva])).status_code, 409)
+        self.client.force_login(self.lectores[0])
+        self.assertEqual(self.client.post(reverse('api-cancelar-reserva', args=[reserva])).json()['estado'], 'c')
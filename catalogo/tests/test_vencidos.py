@@ -0,0 +1,65 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import Permission, User
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from catalogo.models import Libro, PeticionesLibro
+
+
+class TestPrestamosVencidos(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        hoy = datetime.date.today()
+        cls.bibliotecario = User.objects.create_user(username='bibliotecario', password='12345')
+        cls.bibliotecario.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        ana = User.objects.create_user(username='ana', password='12345', email='ana@example.com')
+        luis = User.objects.create_user(username='luis', password='12345', email='luis@example.com')
+        sin_correo = User.objects.create_user(username='sincorreo', password='12345')
+        libro = Libro.objects.create(titulo='Los de abajo', descripcion='Novela', isbn='9788437607894')
+
+        def copia(prestatario, dias, status='p'):
+            PeticionesLibro.objects.create(libro=libro, editorial='Cátedra', status=status, prestatario=prestatario,
+                                           devolucion=hoy + datetime.timedelta(days=dias))
+
+        copia(ana, -10)
+        copia(ana, -1)
+        copia(luis, -3)
+        copia(sin_correo, -2)
+        copia(luis, 0)
+        copia(luis, 5)
+        copia(ana, 9)
+        copia(ana, -20, status='m')
+
+    def test_overdue_y_due_within_en_la_base_de_datos(self):
+        self.assertEqual(PeticionesLibro.objects.overdue().count(), 4)
+        self.assertEqual(PeticionesLibro.objects.due_within(5).count(), 2)
+        for copia in PeticionesLibro.objects.overdue():
+            self.assertTrue(copia.es_retraso)
+
+    def test_vista_de_vencidos_con_conteo_por_prestatario(self):
+        self.client.login(username='bibliotecario', password='12345')
+        respuesta = self.client.get(reverse('prestamos-vencidos'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['total_vencidos'], 4)
+        self.assertEqual(
+            [(fila['prestatario__username'], fila['total']) for fila in respuesta.context['vencidos_por_prestatario']],
+            [('ana', 2), ('luis', 1), ('sincorreo', 1)],
+        )
+        devoluciones = [copia.devolucion for copia in respuesta.context['peticioneslibro_list']]
+        self.assertEqual(devoluciones, sorted(devoluciones))
+
+    def test_vista_requiere_permiso(self):
+        User.objects.create_user(username='lector', password='12345')
+        self.client.login(username='lector', password='12345')
+        respuesta = self.client.get(reverse('prestamos-vencidos'))
+        self.assertEqual(respuesta.status_code, 403)
+
+    def test_resumen_diario_un_correo_por_prestatario(self):
+        call_command('resumen_vencidos', lote=1, stdout=StringIO())
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['ana@example.com', 'luis@example.com'])
+        correo_ana = next(m for m in mail.outbox if m.to == ['ana@example.com'])
+        self.assertIn('2 libros', correo_ana.body)
@@ -0,0 +1,50 @@
+import tempfile
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+@override_settings(CATALOGO_VISITAS_LOTE=3, CATALOGO_VISITAS_INTERVALO=300)
+class TestContadorVisitas(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def visitar(self, veces):
+        """
+        Devuelve el contador que mostró cada visita y cuántas veces se escribió django_session.
+        """
+        with CaptureQueriesContext(connection) as consultas:
+            mostrados = [self.client.get(reverse('index')).context['numero_visitas'] for _ in range(veces)]
+        escrituras = [
+            consulta['sql'] for consulta in consultas.captured_queries
+            if consulta['sql'].startswith(('INSERT', 'UPDATE')) and 'django_session' in consulta['sql']
+        ]
+        return mostrados, len(escrituras)
+
+    def test_la_sesion_se_guarda_por_lotes(self):
+        # La primera visita crea la sesión; después, una escritura cada 3 visitas
+        self.assertEqual(self.visitar(7), (list(range(7)), 3))
+        self.assertEqual(self.client.session['numero_visitas'], 7)
+
+    @override_settings(CATALOGO_VISITAS_LOTE=1)
+    def test_lote_de_una_visita_escribe_siempre(self):
+        self.assertEqual(self.visitar(4), ([0, 1, 2, 3], 4))
+
+    @override_settings(CATALOGO_VISITAS_INTERVALO=0)
+    def test_intervalo_vencido_guarda_la_sesion(self):
+        self.assertEqual(self.visitar(3), ([0, 1, 2], 3))
+
+    def test_cache_en_archivos_escribe_siempre(self):
+        # Su incr no es atómico entre procesos: no se acumulan visitas pendientes
+        with tempfile.TemporaryDirectory() as directorio:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directorio,
+            }}):
+                self.assertEqual(self.visitar(3), ([0, 1, 2], 3))
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_sesion_en_cookie_sin_escrituras(self):
+        self.assertEqual(self.visitar(3), ([0, 1, 2], 0))
@@ -0,0 +1,30 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class ConsultasConstantesMixin:
+    """
+    Mixin para TestCase que verifica que el costo de una página no crece con el número de filas.
+    """
+
+    def contar_consultas(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return consultas
+
+    def assertConsultasConstantes(self, url, agregar_filas, num=None):
+        """
+        Solicita ``url``, llama a ``agregar_filas()`` y la solicita de nuevo: ambas respuestas deben
+        hacer el mismo número de consultas (y exactamente ``num``, si se indica).
+        """
+        antes = self.contar_consultas(url)
+        # Las versiones de los fragmentos cambian al confirmar, como entre dos peticiones reales
+        with self.captureOnCommitCallbacks(execute=True):
+            agregar_filas()
+        despues = self.contar_consultas(url)
+
+        detalle = '\n'.join(consulta['sql'] for consulta in despues.captured_queries)
+        self.assertEqual(len(antes), len(despues), 'El número de consultas creció con las filas:\n%s' % detalle)
+        if num is not None:
+            self.assertEqual(len(despues), num, detalle)
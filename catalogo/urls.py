@@ -1,11 +1,13 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('libros/', views.LibroListView.as_view(), name='libros'),
+    path('libros/populares/', views.LibrosPopularesListView.as_view(), name='libros-populares'),
     path('libros/<pk>', views.DetalleLibroView.as_view(), name='libro_detail'),
+    path('buscar/', views.BusquedaLibrosView.as_view(), name='buscar'),
     path('autores/', views.AutorListView.as_view(), name='autores'),
     path('autores/<pk>', views.DetalleAutorView.as_view(), name='autor_detail'),
 ]
@@ -13,10 +15,19 @@ urlpatterns = [
 urlpatterns += [
     path('mislibros/', views.LibrosAlquiladosPorUsuarioListView.as_view(), name='mis-prestamos'),
     path('prestamos/', views.TodosLibrosPrestadosListView.as_view(), name='lista-prestamos'),
+    path('prestamos/vencidos/', views.PrestamosVencidosListView.as_view(), name='prestamos-vencidos'),
+    path('reportes/', views.reportes_circulacion, name='reportes'),
+    path('reportes/<slug:nombre>.<slug:formato>', views.grafico_circulacion, name='reporte-grafico'),
 ]
 
 urlpatterns += [
     path('libro/<pk>/renovar/', views.renovar_libro_bibliotecario, name='renovar-libro-bibliotecario'),
+    path('prestamos/renovar/', views.renovar_prestamos, name='renovar-prestamos'),
+    path('copias/<uuid:pk>/prestar/', views.api_prestar, name='api-prestar'),
+    path('copias/<uuid:pk>/devolver/', views.api_devolver, name='api-devolver'),
+    path('copias/<uuid:pk>/renovar/', views.api_renovar, name='api-renovar'),
+    path('libros/<int:pk>/reservar/', views.api_reservar, name='api-reservar'),
+    path('reservas/<int:pk>/cancelar/', views.api_cancelar_reserva, name='api-cancelar-reserva'),
 ]
 
 urlpatterns += [
@@ -29,4 +40,24 @@ urlpatterns += [
     path('libro/crear/', views.CrearLibro.as_view(), name='crear_libro'),
     path('libro/<pk>/actualizar/', views.ActualizarLibro.as_view(), name='actualizar_libro'),
     path('libro/<pk>/eliminar/', views.BorrarLibro.as_view(), name='eliminar_libro'),
-]
\ No newline at end of file
+]
+
+urlpatterns += [
+    path('export/', views.exportar_catalogo, name='exportar_catalogo'),
+]
+
+urlpatterns += [
+    path('metricas/', views.metricas_rendimiento, name='metricas-rendimiento'),
+]
+
+# API de solo lectura con vistas asíncronas
+urlpatterns += [
+    path('api/libros/', api.libros, name='api-libros'),
+    path('api/libros/<int:pk>/', api.libro, name='api-libro'),
+    path('api/libros/<int:pk>/disponibilidad/', api.disponibilidad, name='api-disponibilidad'),
+    path('api/autores/', api.autores, name='api-autores'),
+    path('api/autores/<int:pk>/', api.autor, name='api-autor'),
+    path('api/buscar/', api.buscar, name='api-buscar'),
+    path('api/autocompletar/<slug:tipo>/', api.autocompletar, name='api-autocompletar'),
+    path('api/disponibilidad/', views.disponibilidad_libros, name='api-disponibilidad-lote'),
+]
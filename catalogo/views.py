@@ -1,73 +1,134 @@
-from turtle import title
-from django.shortcuts import render
+from django.template.response import TemplateResponse
 
 from .models import Libro, Autor, PeticionesLibro, Genero
+from .estadisticas import obtener_estadisticas
+from .busqueda import buscar_libros
+from . import fragmentos, visitas
 
 def index(request):
     """
     Función vista para la página inicio del sitio.
     """
-    # Genera contadores de algunos de los objetos principales
-    num_books=Libro.objects.all().count()
-    num_instances=PeticionesLibro.objects.all().count()
-    # Libros disponibles (status = 'd')
-    num_instances_available=PeticionesLibro.objects.filter(status__exact='d').count()
-    num_authors=Autor.objects.count()  # El 'all()' esta implícito por defecto.
-    num_generos=Genero.objects.count() # Cuenta Generos
-    filtro=Libro.objects.filter(titulo__icontains='anillo').count()
-
-    numero_visitas = request.session.get('numero_visitas', 0)
-    request.session['numero_visitas'] = numero_visitas + 1
-
-    context = {
-        'num_books':num_books,
-        'num_instances':num_instances,
-        'num_instances_available':num_instances_available,
-        'num_authors':num_authors,
-        'numero_visitas':numero_visitas,
-        'num_generos':num_generos,
-        'filtro':filtro
-    } 
+    # Contadores de los objetos principales (una consulta agregada, servida desde la caché)
+    estadisticas = obtener_estadisticas()
+
+    # Se guarda en la sesión por lotes de visitas, no en cada petición (catalogo.visitas)
+    numero_visitas = visitas.registrar(request)
+
+    context = dict(estadisticas, numero_visitas=numero_visitas)
 
     # Renderiza la plantilla HTML index.html con los datos en la variable contexto
-    return render(
+    # (TemplateResponse difiere el renderizado para que el middleware de métricas pueda medirlo)
+    return TemplateResponse(
         request,
         'index.html',
         context=context
     )
 
 from django.views import generic
+from django.db.models import Count, Min
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .paginacion import PaginacionCursorMixin
+from . import condicional
 
-class LibroListView(generic.ListView):
+@method_decorator(condition(condicional.etag_libros, condicional.ultima_modificacion_libros), name='dispatch')
+class LibroListView(PaginacionCursorMixin, generic.ListView):
     model = Libro
     paginate_by = 2
+    queryset = Libro.objects.select_related('autor').order_by('pk')
+    paginacion = 'cursor'
+    orden_cursor = ('pk',)
 
+@method_decorator(condition(condicional.etag_libro, condicional.ultima_modificacion_libro), name='dispatch')
 class DetalleLibroView(generic.DetailView):
     model = Libro
+    # Los géneros y las copias se leen dentro de fragmentos en caché, solo cuando el fragmento no está en caché
+    queryset = Libro.objects.select_related('autor', 'idioma')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        libro = self.object
+        context['versiones'] = fragmentos.versiones(
+            libro=libro.pk, copias=libro.pk, autor=libro.autor_id,
+            generos=fragmentos.GLOBAL, idiomas=fragmentos.GLOBAL, recomendaciones=libro.pk,
+        )
+        context['ttl_fragmentos'] = fragmentos.ttl_fragmentos()
+        # Lista precalculada por catalogo.recomendaciones; solo se lee si su fragmento no está en caché
+        context['recomendaciones'] = libro.recomendaciones.select_related('recomendado__autor')
+        return context
+
+@method_decorator(condition(condicional.etag_libros, condicional.ultima_modificacion_libros), name='dispatch')
+class LibrosPopularesListView(PaginacionCursorMixin, generic.ListView):
+    """
+    Libros con más lectores distintos (Libro.popularidad, recalculada por lotes).
+    """
+    template_name = 'catalogo/libros_populares.html'
+    context_object_name = 'libro_list'
+    paginate_by = 10
+    queryset = Libro.objects.filter(popularidad__gt=0).select_related('autor').order_by('-popularidad', 'pk')
+    paginacion = 'cursor'
+    orden_cursor = ('-popularidad', 'pk')
 
-class AutorListView(generic.ListView):
+class BusquedaLibrosView(generic.ListView):
+    """
+    Búsqueda de texto completo de libros por título, descripción, ISBN, autor y género.
+    """
+    template_name = 'catalogo/libro_busqueda.html'
+    context_object_name = 'libro_list'
+    paginate_by = 10
+
+    def get_queryset(self):
+        self.consulta = self.request.GET.get('q', '').strip()
+        if not self.consulta:
+            return []
+        return buscar_libros(self.consulta)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['consulta'] = self.consulta
+        return context
+
+@method_decorator(condition(condicional.etag_autores, condicional.ultima_modificacion_autores), name='dispatch')
+class AutorListView(PaginacionCursorMixin, generic.ListView):
     model = Autor
     paginate_by = 2
+    queryset = Autor.objects.order_by('apellido', 'nombre', 'pk')
+    paginacion = 'cursor'
+    orden_cursor = ('apellido', 'nombre', 'pk')
 
+@method_decorator(condition(condicional.etag_autor, condicional.ultima_modificacion_autor), name='dispatch')
 class DetalleAutorView(generic.DetailView):
     model = Autor
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Los libros del autor con sus contadores de copias, en una sola consulta que solo se
+        # ejecuta si la bibliografía no está en caché
+        context['libros'] = self.object.libro_set.all()
+        context['versiones'] = fragmentos.versiones(bibliografia=self.object.pk)
+        context['ttl_fragmentos'] = fragmentos.ttl_fragmentos()
+        return context
+
 from django.contrib.auth.mixins import LoginRequiredMixin
 
-class LibrosAlquiladosPorUsuarioListView(LoginRequiredMixin,generic.ListView):
+class LibrosAlquiladosPorUsuarioListView(LoginRequiredMixin, PaginacionCursorMixin, generic.ListView):
     """
     Generic class-based view listing books on loan to current user.
     """
     model = PeticionesLibro
     template_name ='catalogo/lista_libros_prestados_usuario.html'
     paginate_by = 10
+    paginacion = 'cursor'
+    orden_cursor = ('devolucion', 'id')
 
     def get_queryset(self):
-        return PeticionesLibro.objects.filter(prestatario=self.request.user).filter(status__exact='p').order_by('devolucion')
+        return PeticionesLibro.objects.filter(prestatario=self.request.user).filter(status__exact='p').select_related('libro').order_by('devolucion', 'id')
 
 from django.contrib.auth.mixins import PermissionRequiredMixin
 
-class TodosLibrosPrestadosListView(PermissionRequiredMixin, generic.ListView):
+class TodosLibrosPrestadosListView(PermissionRequiredMixin, PaginacionCursorMixin, generic.ListView):
     """
     Generic class-based view listing all books on loan.
     Only visible to users with can_mark_returned permission.
@@ -76,9 +137,45 @@ class TodosLibrosPrestadosListView(PermissionRequiredMixin, generic.ListView):
     permission_required = 'catalogo.can_mark_returned'
     template_name = 'catalogo/lista_todos_prestamos.html'
     paginate_by = 10
+    paginacion = 'cursor'
+    orden_cursor = ('devolucion', 'id')
 
     def get_queryset(self):
-        return PeticionesLibro.objects.filter(status__exact='p').order_by('devolucion')
+        return PeticionesLibro.objects.filter(status__exact='p').select_related('libro', 'prestatario').order_by('devolucion', 'id')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Formulario de renovación de los préstamos marcados en la lista
+        context['form_renovacion'] = RenovarPrestamosForm(initial={'fecha_renovacion': datetime.date.today() + prestamos.PLAZO_PRESTAMO})
+        return context
+
+class PrestamosVencidosListView(PermissionRequiredMixin, PaginacionCursorMixin, generic.ListView):
+    """
+    Préstamos vencidos, del más antiguo al más reciente, con el número de vencidos por prestatario.
+    Solo visible para usuarios con el permiso can_mark_returned.
+    """
+    model = PeticionesLibro
+    permission_required = 'catalogo.can_mark_returned'
+    template_name = 'catalogo/lista_prestamos_vencidos.html'
+    paginate_by = 20
+    paginacion = 'cursor'
+    orden_cursor = ('devolucion', 'id')
+    max_prestatarios = 20
+
+    def get_queryset(self):
+        return PeticionesLibro.objects.overdue().select_related('libro', 'prestatario').order_by('devolucion', 'id')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        vencidos = PeticionesLibro.objects.overdue()
+        context['total_vencidos'] = vencidos.count()
+        context['vencidos_por_prestatario'] = (
+            vencidos.order_by()
+            .values('prestatario__username')
+            .annotate(total=Count('id'), mas_antiguo=Min('devolucion'))
+            .order_by('-total', 'mas_antiguo')[:self.max_prestatarios]
+        )
+        return context
 
 from django.contrib.auth.decorators import permission_required
 
@@ -87,14 +184,15 @@ from django.http import HttpResponseRedirect
 from django.urls import reverse
 import datetime
 
-from .forms import RenovarLibroForm
+from .forms import LibroForm, RenovarLibroForm, RenovarPrestamosForm, PrestarCopiaForm
+from . import prestamos
 
 @permission_required('catalogo.can_mark_returned')
 def renovar_libro_bibliotecario(request, pk):
     """
     View function for renewing a specific BookInstance by librarian
     """
-    pet_libro=get_object_or_404(PeticionesLibro, pk = pk)
+    pet_libro=get_object_or_404(PeticionesLibro.objects.select_related('libro', 'prestatario'), pk = pk)
 
     # If this is a POST request then process the Form data
     if request.method == 'POST':
@@ -104,19 +202,48 @@ def renovar_libro_bibliotecario(request, pk):
 
         # Check if the form is valid:
         if form.is_valid():
-            # process the data in form.cleaned_data as required (here we just write it to the model due_back field)
-            pet_libro.devolucion = form.cleaned_data['fecha_renovacion']
-            pet_libro.save()
-
-            # redirect to a new URL:
-            return HttpResponseRedirect(reverse('lista-prestamos') )
+            # Solo se actualiza la fecha de devolución, y solo si la copia sigue prestada
+            try:
+                prestamos.renovar(pet_libro.pk, form.cleaned_data['fecha_renovacion'])
+            except prestamos.ErrorPrestamo as error:
+                form.add_error(None, str(error))
+            else:
+                # redirect to a new URL:
+                return HttpResponseRedirect(reverse('lista-prestamos') )
 
     # If this is a GET (or any other method) create the default form.
     else:
         fecha_renovacion_propuesta = datetime.date.today() + datetime.timedelta(weeks=3)
         form = RenovarLibroForm(initial={'fecha_renovacion': fecha_renovacion_propuesta,})
 
-    return render(request, 'catalogo/renovar_libro_bibliotecario.html', {'form': form, 'pet_libro':pet_libro})
+    return TemplateResponse(request, 'catalogo/renovar_libro_bibliotecario.html', {'form': form, 'pet_libro':pet_libro})
+
+from django.contrib import messages
+from django.template.defaultfilters import pluralize
+from django.utils.formats import date_format
+
+@permission_required('catalogo.can_mark_returned')
+def renovar_prestamos(request):
+    """
+    Renovación de muchos préstamos en una petición: los marcados en la lista de préstamos, o
+    todos los que vencen hasta una fecha, con un solo UPDATE.
+    """
+    if request.method == 'POST':
+        form = RenovarPrestamosForm(request.POST)
+        if form.is_valid():
+            fecha = form.cleaned_data['fecha_renovacion']
+            copias = form.cleaned_data['copias'] or PeticionesLibro.objects.prestados().filter(
+                devolucion__lte=form.cleaned_data['vencen_hasta'], devolucion__lt=fecha,
+            )
+            renovadas = prestamos.renovar_en_lote(copias, fecha)
+            messages.success(request, '%d préstamo%s renovado%s hasta el %s.' % (
+                renovadas, pluralize(renovadas), pluralize(renovadas), date_format(fecha),
+            ))
+            return HttpResponseRedirect(reverse('lista-prestamos'))
+    else:
+        form = RenovarPrestamosForm(initial={'fecha_renovacion': datetime.date.today() + prestamos.PLAZO_PRESTAMO})
+
+    return TemplateResponse(request, 'catalogo/renovar_prestamos.html', {'form': form})
 
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
@@ -139,12 +266,219 @@ from .models import Libro
 
 class CrearLibro(CreateView):
     model = Libro
-    fields = '__all__'
+    form_class = LibroForm
 
 class ActualizarLibro(UpdateView):
     model = Libro
-    fields = '__all__'
+    form_class = LibroForm
 
 class BorrarLibro(DeleteView):
     model = Libro
-    success_url = reverse_lazy('libros')
\ No newline at end of file
+    success_url = reverse_lazy('libros')
+
+from django.contrib.auth.decorators import login_required
+from django.http import StreamingHttpResponse
+
+from .exportacion import exportar, FORMATOS
+
+@login_required
+def exportar_catalogo(request):
+    """
+    Descarga del catálogo completo en CSV o JSONL (?formato=), generada a medida que se envía.
+    """
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS:
+        formato = 'csv'
+    respuesta = StreamingHttpResponse(exportar(formato), content_type=FORMATOS[formato])
+    respuesta['Content-Disposition'] = 'attachment; filename="catalogo.%s"' % formato
+    return respuesta
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from .metricas import registro
+
+@staff_member_required
+def metricas_rendimiento(request):
+    """
+    Percentiles de tiempo, consultas y tamaño por vista medidos en este worker.
+    """
+    return JsonResponse({'vistas': registro.resumen()}, json_dumps_params={'ensure_ascii': False})
+
+from django.views.decorators.http import require_POST
+
+def _copia_json(copia):
+    return {
+        'id': str(copia.pk),
+        'libro': copia.libro_id,
+        'status': copia.status,
+        'prestatario': copia.prestatario.username if copia.prestatario else None,
+        'devolucion': copia.devolucion.isoformat() if copia.devolucion else None,
+    }
+
+def _operacion_prestamo(operacion, *args):
+    """
+    Ejecuta una operación de catalogo.prestamos y la traduce a una respuesta JSON (409 si la copia no está en el estado esperado).
+    """
+    try:
+        copia = operacion(*args)
+    except PeticionesLibro.DoesNotExist as error:
+        return JsonResponse({'error': str(error)}, status=404)
+    except prestamos.ErrorPrestamo as error:
+        return JsonResponse({'error': str(error)}, status=409)
+    return JsonResponse(_copia_json(copia))
+
+@require_POST
+@permission_required('catalogo.can_mark_returned', raise_exception=True)
+def api_prestar(request, pk):
+    form = PrestarCopiaForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errores': form.errors}, status=400)
+    return _operacion_prestamo(prestamos.prestar, pk, form.cleaned_data['prestatario'], form.cleaned_data['devolucion'])
+
+@require_POST
+@permission_required('catalogo.can_mark_returned', raise_exception=True)
+def api_devolver(request, pk):
+    return _operacion_prestamo(prestamos.devolver, pk)
+
+@require_POST
+@permission_required('catalogo.can_mark_returned', raise_exception=True)
+def api_renovar(request, pk):
+    form = RenovarLibroForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errores': form.errors}, status=400)
+    return _operacion_prestamo(prestamos.renovar, pk, form.cleaned_data['fecha_renovacion'])
+
+def _reserva_json(reserva):
+    datos = {
+        'id': reserva.pk,
+        'libro': reserva.libro_id,
+        'estado': reserva.estado,
+        'copia': str(reserva.copia_id) if reserva.copia_id else None,
+    }
+    if reserva.estado == 'e':
+        datos['posicion'] = prestamos.posicion_en_cola(reserva)
+    return datos
+
+@require_POST
+@login_required
+def api_reservar(request, pk):
+    """
+    Pone al usuario en la cola de reservas del libro.
+    """
+    libro = get_object_or_404(Libro.objects.only('pk'), pk=pk)
+    try:
+        reserva = prestamos.reservar(libro.pk, request.user)
+    except prestamos.ErrorPrestamo as error:
+        return JsonResponse({'error': str(error)}, status=409)
+    return JsonResponse(_reserva_json(reserva), status=201)
+
+@require_POST
+@login_required
+def api_cancelar_reserva(request, pk):
+    # El bibliotecario puede cancelar cualquier reserva; el resto solo las propias
+    usuario = None if request.user.has_perm('catalogo.can_mark_returned') else request.user
+    try:
+        reserva = prestamos.cancelar_reserva(pk, usuario)
+    except prestamos.ErrorPrestamo as error:
+        return JsonResponse({'error': str(error)}, status=409)
+    return JsonResponse(_reserva_json(reserva))
+
+import hashlib
+import json
+
+from django.views.decorators.cache import cache_control
+
+from .disponibilidad import disponibilidad_en_lote, MAXIMO_LOTE
+
+def _lista_parametro(request, nombre):
+    # Acepta ?ids=1,2,3 y también ?ids=1&ids=2
+    return [valor.strip() for parametro in request.GET.getlist(nombre) for valor in parametro.split(',') if valor.strip()]
+
+def _libros_pedidos(request):
+    try:
+        ids = sorted({int(pk) for pk in _lista_parametro(request, 'ids')})
+    except ValueError:
+        raise ValueError('Los ids deben ser números enteros.')
+    isbns = sorted(set(_lista_parametro(request, 'isbn')))
+    if not ids and not isbns:
+        raise ValueError('Indica los libros con ?ids= o ?isbn=.')
+    if len(ids) + len(isbns) > MAXIMO_LOTE:
+        raise ValueError('Se pueden consultar hasta %d libros por petición.' % MAXIMO_LOTE)
+    return ids, isbns
+
+def _etag_disponibilidad(request):
+    """
+    Con solo ids, la ETag se arma con las versiones de los libros y sus copias (una lectura de la
+    caché, sin consultar la base de datos). Con ISBN no se sabe qué libros son sin consultar: se
+    calcula la respuesta, se guarda para la vista y la ETag es su hash.
+    """
+    try:
+        ids, isbns = _libros_pedidos(request)
+    except ValueError:
+        return None
+    if isbns:
+        request._disponibilidad = disponibilidad_en_lote(ids, isbns)
+        contenido = json.dumps(request._disponibilidad, sort_keys=True)
+    else:
+        libros = fragmentos.versiones_de('libro', ids)
+        copias = fragmentos.versiones_de('copias', ids)
+        contenido = ','.join('%s:%s:%s' % (pk, libros[pk], copias[pk]) for pk in ids)
+    return hashlib.md5(contenido.encode()).hexdigest()
+
+@cache_control(no_cache=True)
+@condition(etag_func=_etag_disponibilidad)
+def disponibilidad_libros(request):
+    """
+    Disponibilidad de varios libros a la vez (?ids=1,2,3 y/o ?isbn=...), con GET condicional por ETag.
+    """
+    try:
+        ids, isbns = _libros_pedidos(request)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    datos = getattr(request, '_disponibilidad', None) or disponibilidad_en_lote(ids, isbns)
+    return JsonResponse(datos)
+
+import os
+
+from django.http import FileResponse, Http404
+
+from . import reportes
+
+def _periodo_reporte(request):
+    try:
+        dias = int(request.GET.get('dias', reportes.PERIODO_PREDETERMINADO))
+    except ValueError:
+        raise Http404('Periodo no válido.')
+    if dias not in reportes.PERIODOS:
+        raise Http404('Periodo no válido.')
+    return dias
+
+@permission_required('catalogo.can_mark_returned')
+def reportes_circulacion(request):
+    """
+    Gráficos de circulación para bibliotecarios, dibujados a partir de los resúmenes diarios.
+    """
+    return TemplateResponse(request, 'catalogo/reportes.html', {
+        'graficos': [(nombre, titulo) for nombre, (titulo, _) in reportes.GRAFICOS.items()],
+        'periodos': reportes.PERIODOS,
+        'dias': _periodo_reporte(request),
+    })
+
+def _modificacion_grafico(request, nombre, formato):
+    try:
+        ruta = reportes.ruta_grafico(nombre, _periodo_reporte(request), formato)
+        return datetime.datetime.fromtimestamp(os.path.getmtime(ruta), tz=datetime.timezone.utc)
+    except (Http404, OSError):
+        return None
+
+@permission_required('catalogo.can_mark_returned')
+@condition(last_modified_func=_modificacion_grafico)
+def grafico_circulacion(request, nombre, formato):
+    """
+    Sirve el archivo del gráfico ya generado (lo dibuja solo si falta), con GET condicional por Last-Modified.
+    """
+    if nombre not in reportes.GRAFICOS or formato not in reportes.FORMATOS:
+        raise Http404('No existe el gráfico.')
+    ruta = reportes.obtener_grafico(nombre, _periodo_reporte(request), formato)
+    return FileResponse(open(ruta, 'rb'), content_type=reportes.FORMATOS[formato])
@@ -0,0 +1,86 @@
+"""
+Contador de visitas a la página de inicio de cada visitante.
+
+El contador vive en la sesión (``numero_visitas``), pero escribir la sesión en cada visita
+obliga a guardarla en cada petición: con el motor de base de datos es un UPDATE de
+``django_session`` por cada vista de la página de inicio. En su lugar, cada visita incrementa
+un contador pendiente en la caché ``CATALOGO_VISITAS_CACHE``, que se pasa a la sesión (una
+escritura) cada ``CATALOGO_VISITAS_LOTE`` visitas o cuando pasaron
+``CATALOGO_VISITAS_INTERVALO`` segundos desde la última vez.
+
+Los contadores pendientes solo se usan si esa caché incrementa de forma atómica (Redis,
+Memcached o la memoria del proceso). En la caché en archivos ``incr`` lee y vuelve a escribir
+el archivo, así que dos workers a la vez perderían o duplicarían visitas, y cada visitante
+ocuparía una entrada más del límite de la caché: con ella la sesión se escribe en cada visita.
+
+También se escribe de inmediato la primera visita (la sesión aún no tiene clave) y, con el
+motor ``signed_cookies``, todas: la sesión va en la cookie y guardarla no escribe en el servidor.
+Si la caché descarta un contador pendiente se pierden como mucho ``LOTE - 1`` visitas.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import PyLibMCCache, PyMemcacheCache
+from django.core.cache.backends.redis import RedisCache
+
+CLAVE_SESION = 'numero_visitas'
+CLAVE_GUARDADO = 'visitas_guardadas'
+
+# Cachés con incr/decr atómicos (LocMemCache, con un bloqueo dentro de cada proceso)
+CACHES_ATOMICAS = (RedisCache, PyMemcacheCache, PyLibMCCache, LocMemCache)
+
+
+def _clave(session_key):
+    return 'catalogo:visitas:%s' % session_key
+
+
+def _en_cookie():
+    return settings.SESSION_ENGINE == 'django.contrib.sessions.backends.signed_cookies'
+
+
+def _cache_atomica():
+    """
+    La caché de los contadores pendientes, o None si no incrementa de forma atómica.
+    """
+    cache = caches[getattr(settings, 'CATALOGO_VISITAS_CACHE', 'default')]
+    return cache if isinstance(cache, CACHES_ATOMICAS) else None
+
+
+def registrar(request):
+    """
+    Cuenta una visita de la sesión de ``request`` y devuelve cuántas había antes de esta.
+    """
+    sesion = request.session
+    # Leer primero carga la sesión: si la de la cookie ya no existe, session_key pasa a None
+    guardadas = sesion.get(CLAVE_SESION, 0)
+    ahora = int(time.time())
+    lote = getattr(settings, 'CATALOGO_VISITAS_LOTE', 10)
+
+    cache = _cache_atomica()
+    if sesion.session_key is None or lote <= 1 or _en_cookie() or cache is None:
+        sesion[CLAVE_SESION] = guardadas + 1
+        sesion[CLAVE_GUARDADO] = ahora
+        return guardadas
+
+    clave = _clave(sesion.session_key)
+    cache.add(clave, 0, settings.SESSION_COOKIE_AGE)
+    try:
+        pendientes = cache.incr(clave)
+    except ValueError:
+        # La caché lo descartó entre add() e incr()
+        cache.set(clave, 1, settings.SESSION_COOKIE_AGE)
+        pendientes = 1
+
+    intervalo = getattr(settings, 'CATALOGO_VISITAS_INTERVALO', 300)
+    if pendientes >= lote or ahora - sesion.get(CLAVE_GUARDADO, 0) >= intervalo:
+        sesion[CLAVE_SESION] = guardadas + pendientes
+        sesion[CLAVE_GUARDADO] = ahora
+        try:
+            # decr y no delete: conserva las visitas de otra petición simultánea de la misma
+            # sesión (la caché es atómica)
+            cache.decr(clave, pendientes)
+        except ValueError:
+            pass
+    return guardadas + pendientes - 1
@@ -0,0 +1,23 @@
+"""
+Configuración de gunicorn (se carga sola desde el directorio de trabajo).
+
+``DJANGO_SERVIDOR`` elige cómo se sirve la aplicación:
+  'wsgi' (predeterminado): workers síncronos, un hilo por petición (bibliotecalocal.wsgi).
+  'asgi': workers de uvicorn sobre bibliotecalocal.asgi; las vistas asíncronas de
+      catalogo.api atienden muchas conexiones concurrentes por worker.
+      No es asíncrono de punta a punta: WhiteNoiseMiddleware (6.0) solo es síncrono, así que
+      Django ejecuta cada petición a través de él con un salto sync_to_async/async_to_sync.
+      El resto del MIDDLEWARE, incluido MetricasRendimientoMiddleware, admite ambos modos.
+
+El número de workers sale de $WEB_CONCURRENCY (lo fija Heroku según el dyno) o de --workers.
+"""
+import os
+
+servidor = os.environ.get('DJANGO_SERVIDOR', 'wsgi')
+
+if servidor == 'asgi':
+    wsgi_app = 'bibliotecalocal.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'bibliotecalocal.wsgi:application'
+    worker_class = 'sync'
@@ -6,7 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bibliotecalocal.settings')
+    # Las pruebas usan su propia configuración (caché en memoria)
+    configuracion = 'bibliotecalocal.settings_pruebas' if sys.argv[1:2] == ['test'] else 'bibliotecalocal.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', configuracion)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc: